@@ -1,31 +1,352 @@
 import os
-import io
-import tempfile
-import json
 from pathlib import Path
-from dataclasses import dataclass
 from typing import Optional
 
 import streamlit as st
-from moviepy.editor import VideoFileClip
-from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-from openai import OpenAI
 
-# Load environment variables
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Page configuration
-st.set_page_config(
-    page_title="Cryptoriez Shorts Helper", 
-    page_icon="🎬", 
-    layout="wide",
-    initial_sidebar_state="expanded"
+from audio_extraction import DEFAULT_AUDIO_FORMAT, VideoInput, extract_audio
+from cache_config import digest_buffer, digest_file
+from job_queue import Job, JobQueue, JobQueueFull, Reporter
+from logging_config import get_logger
+from media_pool import MediaPoolFull, media_pool
+from metrics import METRICS_PORT, job_timings, record_cache, start_metrics_server, timed
+from progress import ProgressCallback, ProgressEvent, emit
+from shorts_core import (
+    DEFAULT_HASHTAGS, EXTRACTION_ENGINE, PLATFORMS, GenerationRequest, audio_samples, format_usage,
+    index_transcript, lookup_segments, merge_hashtags, parse_hashtag_list, request_generation,
+    shared_flight, transcribe_file, trim_for_transcription,
 )
+from singleflight import coalesce
+from transcript_cache import transcript_cache
+from transcript_compaction import compact_transcript
+from transcription import Transcript, transcribe_segments
+
+logger = get_logger(__name__)
+
+# Hoe vaak de UI de status van een achtergrond job opvraagt (seconden)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+# --------------------------
+# Helper Functions
+# --------------------------
+def report_error(message: str) -> None:
+    """Show an error in the UI and log it (also visible when used headless)"""
+    logger.error(message)
+    st.error(message)
+
+def transcription_key(
+    audio_path: str,
+    language_hint: str = "nl",
+    on_progress: Optional[ProgressCallback] = None,
+    audio_digest: Optional[str] = None
+) -> tuple:
+    """Single-flight key for transcribe_audio; hashes the file only when no digest is passed"""
+    if audio_digest is None:
+        try:
+            audio_digest = digest_file(audio_path)
+        except OSError:
+            # Niet samenvoegen: transcribe_audio meldt de fout zelf
+            return ("transcribe", object())
+    return ("transcribe", audio_digest, language_hint)
+
+# Dezelfde audio tegelijk in twee sessies: één Whisper run, beide wachten erop
+@coalesce(transcription_key, group=shared_flight("transcribe"))
+def transcribe_audio(
+    audio_path: str,
+    language_hint: str = "nl",
+    on_progress: Optional[ProgressCallback] = None,
+    audio_digest: Optional[str] = None
+) -> Transcript:
+    """
+    Transcribe audio using OpenAI Whisper API (chunked and parallel for long audio).
+    audio_digest identifies the audio for coalescing when the caller already hashed it.
+    """
+    try:
+        return transcribe_segments(
+            Path(audio_path),
+            lambda path: transcribe_file(path, language_hint),
+            on_progress=on_progress
+        )
+    except Exception as e:
+        report_error(f"Fout bij transcriberen: {str(e)}")
+        return Transcript("")
+
+def extract_audio_from_video(
+    video_file: VideoInput,
+    as_wav: bool = False,
+    engine: str = EXTRACTION_ENGINE,
+    audio_format: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Path:
+    """
+    Extract audio from a video file or in-memory upload buffer, via the media
+    pool (at most one extraction per available CPU). Raises MediaPoolFull when
+    the queue is full; the queue position is reported as a progress event.
+    """
+    if audio_format is None:
+        audio_format = "wav" if as_wav else DEFAULT_AUDIO_FORMAT
+
+    def on_wait(position: int) -> None:
+        emit(on_progress, "extract", f"In de wachtrij voor audio extractie (positie {position})")
+    
+    def extract() -> Path:
+        # Alleen de extractie zelf, niet de tijd in de wachtrij
+        if isinstance(video_file, (str, Path)):
+            size = os.path.getsize(video_file)
+        else:
+            size = len(memoryview(video_file))
+        with timed("extract", size=size):
+            return extract_audio(
+                video_file,
+                audio_format=audio_format,
+                engine=engine,
+                on_progress=on_progress
+            )
+
+    try:
+        return media_pool.run(extract, on_wait=on_wait)
+    except MediaPoolFull:
+        raise
+    except Exception as e:
+        report_error(f"Fout bij audio extractie: {str(e)}")
+        return None
+
+def transcribe_source(
+    audio_path: Path,
+    audio_digest: str,
+    language_hint: str = "nl",
+    on_progress: Optional[ProgressCallback] = None
+) -> str:
+    """
+    Transcript for extracted audio: from the segment index when it was cut from
+    an already-transcribed source, otherwise trimmed and sent to Whisper (and
+    then indexed for the next clip from the same source).
+    """
+    samples = audio_samples(audio_path)
+    text, hashes = lookup_segments(samples, language_hint)
+    if text:
+        emit(on_progress, "transcribe", "Transcript samengesteld uit een eerder getranscribeerde bron",
+             current=1, total=1, unit="chunks")
+        return text
+
+    trimmed = trim_for_transcription(audio_path, on_progress, samples)
+    upload = trimmed.path if trimmed else audio_path
+    try:
+        with timed("transcribe", size=upload.stat().st_size):
+            transcript = transcribe_audio(
+                str(upload),
+                language_hint=language_hint,
+                on_progress=on_progress,
+                # Ingekort is een andere upload (en tijdlijn) dan het origineel
+                audio_digest=f"{audio_digest}:trimmed" if trimmed else audio_digest
+            )
+    finally:
+        if trimmed:
+            trimmed.path.unlink(missing_ok=True)
+    index_transcript(audio_digest, language_hint, samples, hashes, transcript, trimmed)
+    return transcript.text
+
+def transcribe_video(
+    video: VideoInput,
+    language_hint: str = "nl",
+    on_progress: Optional[ProgressCallback] = None
+) -> tuple[str, bool]:
+    """
+    Extract + transcribe a video file or upload buffer via the transcript cache.
+    Returns (transcript, from_cache); the transcript is empty on failure.
+    """
+    if isinstance(video, (str, Path)):
+        video_digest = digest_file(video)
+    else:
+        video_digest = digest_buffer(video)
+    
+    # Identieke upload: direct uit de transcript cache
+    transcript_text = transcript_cache.get_by_video(video_digest, language_hint)
+    if transcript_text is not None:
+        record_cache("transcript", True)
+        return transcript_text, True
+    
+    audio_path = extract_audio_from_video(video, on_progress=on_progress)
+    if not audio_path or not audio_path.exists():
+        return "", False
+    
+    try:
+        audio_digest = digest_file(audio_path)
+        transcript_text, from_cache = transcript_cache.get_or_transcribe(
+            audio_digest,
+            language_hint,
+            lambda: transcribe_source(audio_path, audio_digest, language_hint, on_progress)
+        )
+        record_cache("transcript", from_cache)
+    finally:
+        # Clean up temp audio
+        audio_path.unlink(missing_ok=True)
+    
+    transcript_cache.store(
+        transcript_text,
+        language_hint,
+        video_digest=video_digest,
+        audio_digest=audio_digest
+    )
+    return transcript_text, from_cache
+
+def generate_title_description(
+    req: GenerationRequest,
+    use_cache: bool = True,
+    usage: Optional[dict] = None,
+    on_progress: Optional[ProgressCallback] = None
+):
+    """
+    Generate title and description using OpenAI GPT-4 (token usage is copied into
+    `usage`; with on_progress the answer is streamed and the title reported early)
+    """
+    try:
+        result = request_generation(req.model_copy(update={
+            "variant_levels": [],
+            "variant_platforms": []
+        }), use_cache, on_progress)
+        if usage is not None and result["usage"]:
+            usage.update(result["usage"])
+        return result["title"], result["description"], result["hashtags"]
+    except Exception as e:
+        report_error(f"Fout bij genereren: {str(e)}")
+        return "Titel kon niet worden gegenereerd", "Beschrijving kon niet worden gegenereerd", []
+
+def generate_variants(req: GenerationRequest, use_cache: bool = True) -> Optional[dict]:
+    """
+    Generate several titles (per clickbait level) and per-platform descriptions
+    in a single round-trip. Returns None on failure.
+    """
+    try:
+        return request_generation(req, use_cache)
+    except Exception as e:
+        report_error(f"Fout bij genereren van varianten: {str(e)}")
+        return None
+
+# --------------------------
+# Background jobs
+# --------------------------
+def job_progress(report: Reporter) -> ProgressCallback:
+    """Forward progress events of the stages to a background job"""
+    def on_progress(event: ProgressEvent) -> None:
+        report(event.message, event.fraction, event.data)
+    return on_progress
+
+def transcription_job(report: Reporter, video: VideoInput, language_hint: str = "nl") -> dict:
+    """Job: extract + transcribe an upload; an upload buffer is released afterwards"""
+    report("Audio extraheren & transcriberen...")
+    try:
+        with job_timings("transcription"):
+            transcript_text, from_cache = transcribe_video(
+                video, language_hint, on_progress=job_progress(report)
+            )
+    finally:
+        if isinstance(video, memoryview):
+            video.release()
+    if not transcript_text:
+        raise RuntimeError("Transcript kon niet worden gegenereerd")
+    return {"transcript": transcript_text, "from_cache": from_cache}
+
+def generation_job(report: Reporter, req: GenerationRequest, use_cache: bool = True) -> dict:
+    """Job: variants (falling back to a single title) or a single title/description"""
+    on_progress = job_progress(report)
+    with job_timings("generation"):
+        if req.is_variant:
+            report("Varianten genereren...")
+            try:
+                return request_generation(req, use_cache, on_progress)
+            except Exception as e:
+                logger.error(f"Fout bij genereren van varianten: {str(e)}")
+        
+        report("Genereren...")
+        return request_generation(req.model_copy(update={
+            "variant_levels": [],
+            "variant_platforms": []
+        }), use_cache, on_progress)
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus /metrics endpoint on METRICS_PORT, once per server process"""
+    if not METRICS_PORT:
+        return None
+    try:
+        return start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint niet gestart: {e}")
+        return None
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """
+    One job queue per server process, shared by all sessions. Pending
+    transcriptions are bounded by what the media pool can run and queue.
+    """
+    return JobQueue(max_pending={"transcribe": media_pool.workers + media_pool.max_queue})
+
+def submit_transcription(video: VideoInput, language_hint: str = "nl") -> Optional[str]:
+    """Submit a transcription job; None (with a warning) when the extraction queue is full"""
+    try:
+        return get_job_queue().submit("transcribe", transcription_job, video, language_hint)
+    except JobQueueFull:
+        # Backpressure: liever nu weigeren dan iedereen laten wachten
+        if isinstance(video, memoryview):
+            video.release()
+        pool = media_pool.stats()
+        st.warning(
+            f"⏳ Server is druk ({pool['running']} extracties bezig, "
+            f"{pool['waiting']} in de wachtrij). Probeer het zo opnieuw."
+        )
+        return None
+
+def take_finished_job(state_key: str) -> Optional[Job]:
+    """Return the job in session_state[state_key] once it's finished (and clear the key)"""
+    job_id = st.session_state.get(state_key)
+    if not job_id:
+        return None
+    
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is not None and not job.finished:
+        return None
+    
+    del st.session_state[state_key]
+    queue.forget(job_id)
+    return job
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(state_key: str, label: str):
+    """Poll a running job without rerunning the whole script; rerun the app once it's done"""
+    job_id = st.session_state.get(state_key)
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None or job.finished:
+        st.rerun()
+    
+    waiting = "in de wachtrij" if job.status == "queued" else "bezig"
+    text = f"⏳ {label}: {job.message or waiting}"
+    if job.progress is not None:
+        st.progress(job.progress, text=text)
+    else:
+        st.info(text)
+    
+    # Deelresultaat: de titel staat er al terwijl de beschrijving nog streamt
+    if job.partial and job.partial.get("title"):
+        st.markdown(f"**📋 Titel:** {job.partial['title']}")
+
+# --------------------------
+# Main UI
+# --------------------------
+def setup_page():
+    """Page configuration and custom CSS (must run before other Streamlit calls)"""
+    # Page configuration
+    st.set_page_config(
+        page_title="Cryptoriez Shorts Helper", 
+        page_icon="🎬", 
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-# Custom CSS for better styling
-st.markdown("""
+    # Custom CSS for better styling
+    st.markdown("""
 <style>
     .main-header {
         background: linear-gradient(90deg, #1f1f1f 0%, #2d2d2d 100%);
@@ -60,155 +381,12 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
-
-# --------------------------
-# Configuration & Constants
-# --------------------------
-PLATFORMS = ["YouTube Shorts", "Instagram Reels", "TikTok", "Alle"]
-DEFAULT_HASHTAGS = ["#crypto", "#bitcoin", "#altcoins", "#forex", "#trading", "#marktupdate", "#technischeanalyse"]
-
-class GenerationRequest(BaseModel):
-    transcript: str
-    language: str = Field(default="nl")
-    topic_hint: Optional[str] = Field(default="Crypto/Forex marktupdate of trade breakdown")
-    clickbait_level: int = Field(ge=0, le=10, default=5)
-    allow_emojis: bool = True
-    include_hashtags: bool = True
-    platforms: list[str] = Field(default_factory=lambda: ["Alle"])
-
-SYSTEM_PROMPT = """Je bent een ervaren Nederlandstalige content-editor voor Cryptoriez (focus: trading, crypto & forex, marktbreakdowns, updates).
-
-Stijl:
-- Duidelijk, concreet, "no nonsense"
-- Geen overbodige vakjargon; leg kort uit voor niet-technische kijkers
-- Houd het geloofwaardig: prikkelende titels zijn oké, maar geen misleiding
-- Zet inhoud voorop; clickbait-intensiteit bepaalt scherpte/urgentie, niet de waarheid
-- Respecteer voorkeuren voor emoji's en hashtags
-
-Taken:
-1) Bedenk 1 sterke, platform-agnostische titel op basis van transcript + topic_hint
-2) Schrijf een beschrijving met:
-   - 2–5 kerninzichten of takeaways
-   - Korte context "wat betekent dit voor markt/risico/sentiment"
-   - Call-to-action (bv. volg voor meer breakdowns)
-3) Voeg optioneel hashtags toe (relevant, 5–10 max)
-
-Uitvoer in JSON met velden: title, description, hashtags (array).
-"""
-
-# --------------------------
-# Helper Functions
-# --------------------------
-def build_user_prompt(req: GenerationRequest) -> str:
-    emoji_rule = "Je mag emoji's gebruiken waar relevant." if req.allow_emojis else "Gebruik geen emoji's."
-    hashtag_rule = "Sluit af met 5–10 relevante hashtags." if req.include_hashtags else "Voeg géén hashtags toe."
-    
-    clickbait_guidance = f"""Clickbait-intensiteit: {req.clickbait_level} op 10.
-- 0–2: informatief, neutraal
-- 3–5: prikkelend, concreet
-- 6–8: urgent, sterk hook
-- 9–10: zeer agressief (maar geloofwaardig, geen sensationalisme/garanties)"""
-
-    return f"""
-Taal: {req.language}
-Platforms: {', '.join(req.platforms)}
-Topic hint: {req.topic_hint}
-
-{emoji_rule}
-{hashtag_rule}
-{clickbait_guidance}
-
-Transcript (ruw, samenvatten & opschonen):
-\"\"\"{req.transcript.strip()}\"\"\"
-"""
-
-def transcribe_audio(audio_path: str, language_hint: str = "nl") -> str:
-    """Transcribe audio using OpenAI Whisper API"""
-    try:
-        with open(audio_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f,
-                language=language_hint
-            )
-        return transcript.text
-    except Exception as e:
-        st.error(f"Fout bij transcriberen: {str(e)}")
-        return ""
-
-def extract_audio_from_video(video_file: Path, as_wav=True) -> Path:
-    """Extract audio from video file using MoviePy"""
-    try:
-        # Controleer of het video bestand bestaat
-        if not video_file.exists():
-            st.error(f"Video bestand niet gevonden: {video_file}")
-            return None
-            
-        # Laad video clip
-        clip = VideoFileClip(str(video_file))
-        
-        # Controleer of de clip audio heeft
-        if clip.audio is None:
-            st.error("Video heeft geen audio track")
-            clip.close()
-            return None
-        
-        # Maak een unieke bestandsnaam
-        suffix = ".wav" if as_wav else ".mp3"
-        temp_name = f"cryptoriez_audio_{os.urandom(8).hex()}{suffix}"
-        out = Path(tempfile.gettempdir()) / temp_name
-        
-        # Schrijf audio naar bestand
-        clip.audio.write_audiofile(str(out), verbose=False, logger=None)
-        
-        # Sluit de clip
-        clip.close()
-        
-        # Controleer of het audio bestand succesvol is aangemaakt
-        if out.exists() and out.stat().st_size > 0:
-            return out
-        else:
-            st.error("Audio bestand kon niet worden aangemaakt")
-            return None
-            
-    except Exception as e:
-        st.error(f"Fout bij audio extractie: {str(e)}")
-        # Probeer clip te sluiten als deze nog open is
-        try:
-            if 'clip' in locals():
-                clip.close()
-        except:
-            pass
-        return None
-
-def generate_title_description(req: GenerationRequest):
-    """Generate title and description using OpenAI GPT-4"""
-    try:
-        user_prompt = build_user_prompt(req)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.7,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        data = json.loads(response.choices[0].message.content)
-        title = data.get("title", "").strip()
-        description = data.get("description", "").strip()
-        hashtags = data.get("hashtags", [])
-        return title, description, hashtags
-    except Exception as e:
-        st.error(f"Fout bij genereren: {str(e)}")
-        return "Titel kon niet worden gegenereerd", "Beschrijving kon niet worden gegenereerd", []
+    """, unsafe_allow_html=True)
 
-# --------------------------
-# Main UI
-# --------------------------
 def main():
+    setup_page()
+    get_metrics_server()
+    
     # Header
     st.markdown("""
     <div class="main-header">
@@ -264,6 +442,24 @@ def main():
             value=", ".join(DEFAULT_HASHTAGS),
             help="Voeg extra hashtags toe aan de gegenereerde content"
         )
+        
+        use_compaction = st.toggle(
+            "✂️ Transcript comprimeren",
+            value=False,
+            help="Verwijder stopwoorden en herhalingen vóór het genereren (sneller en goedkoper bij lange transcripts)"
+        )
+        
+        token_budget = None
+        if use_compaction:
+            token_budget = st.number_input(
+                "Token budget transcript (0 = geen limiet)",
+                min_value=0,
+                value=1500,
+                step=100,
+                help="Bij een langer transcript worden alleen de belangrijkste zinnen meegestuurd"
+            ) or None
+            if token_budget is not None:
+                token_budget = max(int(token_budget), 100)
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -282,35 +478,24 @@ def main():
             st.video(uploaded)
             
             if st.button("🎯 Transcribe & Genereer", type="primary"):
-                with st.spinner("Audio extraheren..."):
-                    # Write temp video
-                    temp_video = Path(tempfile.gettempdir()) / f"cryptoriez_input_{uploaded.name}"
-                    with open(temp_video, "wb") as f:
-                        f.write(uploaded.getbuffer())
-                    
-                    audio_path = extract_audio_from_video(temp_video, as_wav=True)
-                    
-                    if audio_path and audio_path.exists():
-                        # Clean up temp video
-                        temp_video.unlink(missing_ok=True)
-                        
-                        with st.spinner("Transcriberen..."):
-                            transcript_text = transcribe_audio(
-                                str(audio_path), 
-                                language_hint="nl" if language == "nl" else "en"
-                            )
-                        
-                        # Clean up temp audio
-                        audio_path.unlink(missing_ok=True)
-                        
-                        if transcript_text:
-                            st.success("✅ Transcript gereed!")
-                            st.session_state["transcript"] = transcript_text
-                            st.session_state["show_generate"] = True
-                        else:
-                            st.error("❌ Transcript kon niet worden gegenereerd")
-                    else:
-                        st.error("❌ Audio kon niet worden geëxtraheerd")
+                language_hint = "nl" if language == "nl" else "en"
+                # Geef de upload buffer direct door, zonder kopie; de job geeft hem vrij
+                job_id = submit_transcription(uploaded.getbuffer(), language_hint)
+                if job_id:
+                    st.session_state["transcribe_job"] = job_id
+        
+        if "transcribe_job" in st.session_state:
+            job = take_finished_job("transcribe_job")
+            if job is None and "transcribe_job" in st.session_state:
+                show_job_progress("transcribe_job", "Transcriptie")
+            elif job is not None and job.status == "done":
+                result = job.result
+                st.success("✅ Transcript gereed! (uit cache)" if result["from_cache"] else "✅ Transcript gereed!")
+                st.session_state["transcript"] = result["transcript"]
+                st.session_state["show_generate"] = True
+            else:
+                error = job.error if job is not None else "job niet gevonden"
+                st.error(f"❌ Transcript kon niet worden gegenereerd ({error})")
     
     with col2:
         st.header("📝 Transcript")
@@ -324,6 +509,33 @@ def main():
                 help="Bewerk het transcript indien nodig voordat je de titel en beschrijving genereert"
             )
             
+            if use_compaction:
+                compaction = compact_transcript(transcript_text, language, token_budget)
+                st.caption(
+                    f"✂️ Transcript: {compaction.tokens_before} → {compaction.tokens_after} tokens "
+                    f"({compaction.saved_ratio:.0%} kleiner)"
+                )
+            
+            regenerate = st.checkbox(
+                "♻️ Opnieuw genereren (cache overslaan)",
+                value=False,
+                help="Vraag een nieuwe titel en beschrijving aan, ook als dit transcript met deze instellingen al eerder is gegenereerd"
+            )
+            
+            variant_mode = st.toggle(
+                "🔀 Varianten vergelijken",
+                value=False,
+                help="Genereer in één keer titels voor meerdere clickbait-niveaus en een beschrijving per platform"
+            )
+            variant_levels = []
+            if variant_mode:
+                variant_levels = st.multiselect(
+                    "Clickbait-niveaus",
+                    list(range(11)),
+                    default=[2, 5, 8],
+                    help="Voor elk niveau wordt een titel gegenereerd; beschrijvingen volgen de gekozen platforms"
+                )
+            
             if st.button("🚀 Genereer Titel & Beschrijving", type="primary"):
                 req = GenerationRequest(
                     transcript=transcript_text,
@@ -332,34 +544,50 @@ def main():
                     clickbait_level=clickbait_level,
                     allow_emojis=use_emojis,
                     include_hashtags=use_hashtags,
-                    platforms=platforms
+                    platforms=platforms,
+                    variant_levels=variant_levels if variant_mode else [],
+                    variant_platforms=platforms if variant_mode else [],
+                    compact=use_compaction,
+                    token_budget=token_budget
                 )
                 
-                with st.spinner("Genereren..."):
-                    title, description, hashtags = generate_title_description(req)
-                
-                # Process hashtags
-                extra = [h.strip() for h in default_hashtags.split(",") if h.strip()] if use_hashtags else []
-                all_hashtags = []
-                
-                if use_hashtags:
-                    seen = set()
-                    for h in (hashtags + extra):
-                        if not h.startswith("#"):
-                            h = "#" + h
-                        if h.lower() not in seen:
-                            all_hashtags.append(h)
-                            seen.add(h.lower())
-                
-                # Store results in session state
-                st.session_state["generated_title"] = title
-                st.session_state["generated_description"] = description
-                st.session_state["generated_hashtags"] = all_hashtags
+                st.session_state["generate_job"] = get_job_queue().submit(
+                    "generate", generation_job, req, use_cache=not regenerate
+                )
+            
+            if "generate_job" in st.session_state:
+                job = take_finished_job("generate_job")
+                if job is None and "generate_job" in st.session_state:
+                    show_job_progress("generate_job", "Genereren")
+                elif job is not None and job.status == "done":
+                    result = job.result
+                    variants = result if "titles" in result else None
+                    if variants:
+                        # Eerste titel/beschrijving vult ook de standaard resultaten
+                        title = variants["titles"][0]["title"]
+                        description = variants["descriptions"][0]["description"]
+                    else:
+                        title, description = result["title"], result["description"]
+                    
+                    # Process hashtags
+                    extra = parse_hashtag_list(default_hashtags) if use_hashtags else []
+                    all_hashtags = merge_hashtags(result["hashtags"], extra) if use_hashtags else []
+                    
+                    # Store results in session state
+                    st.session_state["generated_title"] = title
+                    st.session_state["generated_description"] = description
+                    st.session_state["generated_hashtags"] = all_hashtags
+                    st.session_state["generated_variants"] = variants
+                    st.session_state["generation_usage"] = result["usage"]
+                else:
+                    error = job.error if job is not None else "job niet gevonden"
+                    report_error(f"Fout bij genereren: {error}")
     
     # Results section
     if "generated_title" in st.session_state:
         st.markdown("---")
         st.header("🎉 Resultaten")
+        st.caption(format_usage(st.session_state.get("generation_usage")))
         
         col1, col2 = st.columns(2)
         
@@ -413,6 +641,26 @@ def main():
                 mime="text/plain"
             )
         
+        variants = st.session_state.get("generated_variants")
+        if variants:
+            st.subheader("🔀 Varianten")
+            for i, item in enumerate(variants["titles"]):
+                st.text_input(
+                    f"Titel (clickbait {item['clickbait_level']})",
+                    item["title"],
+                    key=f"variant_title_{i}"
+                )
+            
+            tabs = st.tabs([item["platform"] for item in variants["descriptions"]])
+            for i, (tab, item) in enumerate(zip(tabs, variants["descriptions"])):
+                with tab:
+                    st.text_area(
+                        f"Beschrijving voor {item['platform']}",
+                        item["description"],
+                        height=200,
+                        key=f"variant_desc_{i}"
+                    )
+        
         # Copy to clipboard buttons
         st.markdown("---")
         st.subheader("📋 Snelle Kopie")
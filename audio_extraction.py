@@ -0,0 +1,539 @@
+"""
+Audio extractie engines voor Cryptoriez Shorts Helper
+
+De ffmpeg engine stuurt ffmpeg direct aan: geen video decode, alleen de audio
+stream wordt gekopieerd of in één keer naar 16 kHz mono Opus/FLAC omgezet.
+MoviePy blijft beschikbaar als fallback.
+
+Een upload kan ook als buffer worden aangeboden; de bytes gaan dan via stdin
+naar ffmpeg of via een memfd / /dev/shm pad, zodat ze nooit naar disk gaan.
+"""
+
+import asyncio
+import importlib.util
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from error_handling import VideoProcessingError
+from metrics import timed
+from progress import ProgressCallback, emit
+
+# Whisper heeft genoeg aan 16 kHz mono
+SAMPLE_RATE = 16000
+CHANNELS = 1
+
+# Blokgrootte waarin een buffer naar ffmpeg's stdin gaat (bij voortgangsmeldingen)
+PIPE_BLOCK_SIZE = 1024 * 1024
+
+# audio_format -> (extensie, ffmpeg codec argumenten)
+AUDIO_FORMATS = {
+    "opus": (".ogg", ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]),
+    "flac": (".flac", ["-c:a", "flac"]),
+    "wav": (".wav", ["-c:a", "pcm_s16le"]),
+    "mp3": (".mp3", ["-c:a", "libmp3lame", "-b:a", "64k"]),
+}
+
+# Bron codecs die zonder transcoderen door Whisper worden geaccepteerd
+COPY_CONTAINERS = {
+    "aac": ".m4a",
+    "mp3": ".mp3",
+    "flac": ".flac",
+    "opus": ".ogg",
+    "vorbis": ".ogg",
+}
+
+DEFAULT_AUDIO_FORMAT = "opus"
+
+# Genoeg bytes om de codec van een streambare buffer te bepalen
+PROBE_BYTES = 4 * 1024 * 1024
+
+VideoInput = Union[str, Path, bytes, bytearray, memoryview]
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Zoek het ffmpeg binary (FFMPEG_BINARY, PATH of imageio-ffmpeg)"""
+    env_binary = os.getenv("FFMPEG_BINARY")
+    if env_binary and env_binary != "auto-detect":
+        return env_binary
+
+    binary = shutil.which("ffmpeg")
+    if binary:
+        return binary
+
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def make_output_path(suffix: str, output_dir: Optional[Path] = None) -> Path:
+    """Maak een unieke bestandsnaam voor geëxtraheerde audio"""
+    directory = Path(output_dir) if output_dir else Path(tempfile.gettempdir())
+    return directory / f"cryptoriez_audio_{os.urandom(8).hex()}{suffix}"
+
+
+def as_buffer(source) -> memoryview:
+    """Geef een memoryview op de bytes zonder ze te kopiëren"""
+    if hasattr(source, "getbuffer"):
+        # io.BytesIO en Streamlit UploadedFile
+        return source.getbuffer()
+    return memoryview(source)
+
+
+def is_streamable(buffer: memoryview) -> bool:
+    """
+    Controleer of ffmpeg de buffer via een pipe kan lezen.
+
+    MP4/MOV kan alleen sequentieel worden gelezen als het 'moov' atom vóór
+    'mdat' staat (faststart); andere containers zijn altijd streambaar.
+    """
+    if bytes(buffer[4:8]) != b"ftyp":
+        return True
+
+    offset = 0
+    total = len(buffer)
+    while offset + 8 <= total:
+        size, kind = struct.unpack(">I4s", buffer[offset:offset + 8])
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            return False
+        if size == 1:
+            if offset + 16 > total:
+                return False
+            size = struct.unpack(">Q", buffer[offset + 8:offset + 16])[0]
+        elif size == 0:
+            return False
+        if size < 8:
+            return False
+        offset += size
+    return False
+
+
+@contextmanager
+def buffer_as_path(buffer: memoryview) -> Iterator[Path]:
+    """
+    Stel een buffer beschikbaar als pad zonder disk I/O.
+
+    Op Linux via een anoniem memfd, anders via een bestand in /dev/shm. Alleen
+    als geen van beide bestaat valt dit terug op de temp directory.
+    """
+    if hasattr(os, "memfd_create") and Path(f"/proc/{os.getpid()}/fd").exists():
+        fd = os.memfd_create("cryptoriez_input")
+        try:
+            with os.fdopen(os.dup(fd), "wb") as f, timed("upload_write", size=len(buffer)):
+                f.write(buffer)
+            yield Path(f"/proc/{os.getpid()}/fd/{fd}")
+        finally:
+            os.close(fd)
+        return
+
+    shm = Path("/dev/shm")
+    directory = shm if shm.is_dir() else Path(tempfile.gettempdir())
+    path = directory / f"cryptoriez_input_{os.urandom(8).hex()}"
+    try:
+        with open(path, "wb") as f, timed("upload_write", size=len(buffer)):
+            f.write(buffer)
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def probe_audio_codec(video: Union[Path, memoryview]) -> Optional[str]:
+    """Bepaal de codec van de eerste audio stream (None als er geen audio is)"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return None
+
+    if isinstance(video, memoryview):
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", "pipe:0"],
+            input=video[:PROBE_BYTES],
+            capture_output=True,
+        )
+        stderr = result.stderr.decode(errors="replace")
+    else:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", str(video)],
+            capture_output=True,
+            text=True,
+            errors="replace",
+        )
+        stderr = result.stderr
+    match = re.search(r"Stream #\S+.*?: Audio: (\w+)", stderr)
+    return match.group(1) if match else None
+
+
+class ExtractionEngine:
+    """Basis class voor audio extractie engines"""
+
+    name = "base"
+    # Kan de engine een buffer direct via stdin lezen?
+    supports_pipe = False
+
+    def available(self) -> bool:
+        return False
+
+    def extract(
+        self,
+        video: Union[Path, memoryview],
+        audio_format: str,
+        output_dir: Optional[Path] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Path:
+        raise NotImplementedError
+
+
+class FFmpegEngine(ExtractionEngine):
+    """Extraheer audio door ffmpeg direct aan te sturen"""
+
+    name = "ffmpeg"
+    supports_pipe = True
+
+    def available(self) -> bool:
+        return find_ffmpeg() is not None
+
+    def build_command(
+        self, video: Union[Path, memoryview], out: Path, audio_format: str
+    ) -> list:
+        """Bouw het ffmpeg commando voor de gevraagde output"""
+        piped = isinstance(video, memoryview)
+        command = [find_ffmpeg(), "-hide_banner"]
+        if not piped:
+            command.append("-nostdin")
+        command += [
+            "-loglevel",
+            "error",
+            "-y",
+            "-i",
+            "pipe:0" if piped else str(video),
+            "-vn",
+            "-sn",
+            "-dn",
+            "-map",
+            "0:a:0",
+        ]
+        if audio_format == "copy":
+            command += ["-c:a", "copy"]
+        else:
+            command += ["-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE)]
+            command += AUDIO_FORMATS[audio_format][1]
+        # Dezelfde audio geeft byte-identieke output (fingerprint voor de cache)
+        command += ["-map_metadata", "-1", "-fflags", "+bitexact"]
+        command += ["-flags:a", "+bitexact"]
+        command.append(str(out))
+        return command
+
+    def prepare(
+        self,
+        video: Union[Path, memoryview],
+        audio_format: str,
+        output_dir: Optional[Path] = None,
+    ) -> tuple[Path, list]:
+        """Bepaal het output pad en het ffmpeg commando"""
+        if audio_format == "copy":
+            codec = probe_audio_codec(video)
+            if codec is None:
+                raise VideoProcessingError("Video heeft geen audio track")
+            suffix = COPY_CONTAINERS.get(codec)
+            if suffix is None:
+                # Codec niet bruikbaar voor Whisper, transcodeer alsnog
+                audio_format = DEFAULT_AUDIO_FORMAT
+                suffix = AUDIO_FORMATS[audio_format][0]
+        else:
+            suffix = AUDIO_FORMATS[audio_format][0]
+
+        out = make_output_path(suffix, output_dir)
+        return out, self.build_command(video, out, audio_format)
+
+    @staticmethod
+    def check_result(out: Path, returncode: int, stderr: bytes) -> Path:
+        """Zet een mislukte ffmpeg run om in een VideoProcessingError"""
+        if returncode == 0:
+            return out
+        out.unlink(missing_ok=True)
+        text = stderr.decode(errors="replace")
+        message = text.strip().splitlines()
+        detail = message[-1] if message else f"exit code {returncode}"
+        if "matches no streams" in text:
+            detail = "Video heeft geen audio track"
+        raise VideoProcessingError(detail)
+
+    @staticmethod
+    def _feed(stdin, video: memoryview, on_progress: ProgressCallback) -> None:
+        """Schrijf een buffer in blokken naar stdin en meld de gelezen bytes"""
+        total = len(video)
+        try:
+            for start in range(0, total, PIPE_BLOCK_SIZE):
+                block = video[start:start + PIPE_BLOCK_SIZE]
+                stdin.write(block)
+                done = start + len(block)
+                emit(
+                    on_progress, "extract",
+                    f"Video gelezen: {done / 1e6:.1f} van {total / 1e6:.1f} MB",
+                    current=done, total=total, unit="bytes",
+                )
+        except (BrokenPipeError, ValueError):
+            # ffmpeg is al gestopt (bijv. geen audio); de exit code vertelt waarom
+            pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def run_with_progress(
+        self, command: list, video: Union[Path, memoryview], on_progress: ProgressCallback
+    ) -> tuple[int, bytes]:
+        """Als subprocess.run, maar met events uit ffmpeg -progress (seconden audio)"""
+        piped = isinstance(video, memoryview)
+        command = command[:2] + ["-progress", "pipe:1", "-nostats"] + command[2:]
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        stderr = []
+        helpers = [threading.Thread(target=lambda: stderr.append(process.stderr.read()))]
+        if piped:
+            helpers.append(
+                threading.Thread(target=self._feed, args=(process.stdin, video, on_progress))
+            )
+        for helper in helpers:
+            helper.start()
+
+        # -progress schrijft blokken key=value regels; out_time_us is de positie in de output
+        for line in process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                seconds = int(value) / 1_000_000
+                emit(
+                    on_progress, "extract", f"{seconds:.0f}s audio geëxtraheerd",
+                    current=seconds, unit="s",
+                )
+
+        returncode = process.wait()
+        for helper in helpers:
+            helper.join()
+        return returncode, b"".join(stderr)
+
+    def extract(
+        self,
+        video: Union[Path, memoryview],
+        audio_format: str,
+        output_dir: Optional[Path] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Path:
+        out, command = self.prepare(video, audio_format, output_dir)
+        if on_progress is not None:
+            returncode, stderr = self.run_with_progress(command, video, on_progress)
+            return self.check_result(out, returncode, stderr)
+        if isinstance(video, memoryview):
+            # communicate() schrijft de memoryview in stukken, zonder kopie
+            result = subprocess.run(command, input=video, capture_output=True)
+        else:
+            result = subprocess.run(
+                command, stdin=subprocess.DEVNULL, capture_output=True
+            )
+        return self.check_result(out, result.returncode, result.stderr)
+
+    async def extract_async(
+        self,
+        video: Union[Path, memoryview],
+        audio_format: str,
+        output_dir: Optional[Path] = None,
+    ) -> Path:
+        """Als extract(), maar met een asyncio subprocess"""
+        out, command = await asyncio.to_thread(
+            self.prepare, video, audio_format, output_dir
+        )
+        piped = isinstance(video, memoryview)
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        _, stderr = await process.communicate(video if piped else None)
+        return self.check_result(out, process.returncode, stderr)
+
+
+class MoviePyEngine(ExtractionEngine):
+    """Extraheer audio via MoviePy (decodeert de volledige clip)"""
+
+    name = "moviepy"
+
+    def available(self) -> bool:
+        # Alleen zoeken, niet importeren: moviepy.editor laadt numpy, imageio, ...
+        return importlib.util.find_spec("moviepy") is not None
+
+    def extract(
+        self,
+        video: Union[Path, memoryview],
+        audio_format: str,
+        output_dir: Optional[Path] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Path:
+        from moviepy.editor import VideoFileClip
+
+        emit(on_progress, "extract", "Audio extraheren met MoviePy...")
+
+        # MoviePy kiest de codec op basis van de extensie
+        suffix = ".mp3" if audio_format == "mp3" else ".wav"
+        out = make_output_path(suffix, output_dir)
+
+        clip = VideoFileClip(str(video))
+        try:
+            if clip.audio is None:
+                raise VideoProcessingError("Video heeft geen audio track")
+            clip.audio.write_audiofile(
+                str(out),
+                fps=SAMPLE_RATE,
+                ffmpeg_params=["-ac", str(CHANNELS)],
+                verbose=False,
+                logger=None,
+            )
+        finally:
+            clip.close()
+        return out
+
+
+ENGINES = {
+    FFmpegEngine.name: FFmpegEngine(),
+    MoviePyEngine.name: MoviePyEngine(),
+}
+
+
+def get_engine(name: str = "auto") -> ExtractionEngine:
+    """Kies een extractie engine; 'auto' geeft de voorkeur aan ffmpeg"""
+    if name != "auto":
+        if name not in ENGINES:
+            raise ValueError(f"Onbekende extractie engine: {name}")
+        return ENGINES[name]
+
+    for engine in ENGINES.values():
+        if engine.available():
+            return engine
+    raise VideoProcessingError("Geen audio extractie engine beschikbaar")
+
+
+def run_engine(
+    engine: ExtractionEngine,
+    video: Union[Path, memoryview],
+    audio_format: str,
+    output_dir: Optional[Path] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Path:
+    """Voer een engine uit; buffers gaan via stdin of via een geheugen-pad"""
+    if isinstance(video, Path):
+        return engine.extract(video, audio_format, output_dir, on_progress)
+    if engine.supports_pipe and is_streamable(video):
+        return engine.extract(video, audio_format, output_dir, on_progress)
+    with buffer_as_path(video) as path:
+        return engine.extract(path, audio_format, output_dir, on_progress)
+
+
+def extract_audio(
+    video: VideoInput,
+    audio_format: str = DEFAULT_AUDIO_FORMAT,
+    engine: str = "auto",
+    output_dir: Optional[Path] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Path:
+    """
+    Extraheer de audio track van een video (pad of buffer) naar een bestand.
+
+    Bij 'auto' wordt eerst ffmpeg geprobeerd en bij een fout MoviePy.
+    on_progress krijgt 'extract' events (bytes gelezen, seconden audio).
+    """
+    if audio_format != "copy" and audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Onbekend audio formaat: {audio_format}")
+
+    if isinstance(video, (str, Path)):
+        video = Path(video)
+        if not video.exists():
+            raise VideoProcessingError(f"Video bestand niet gevonden: {video}")
+    else:
+        video = as_buffer(video)
+        if len(video) == 0:
+            raise VideoProcessingError("Video upload is leeg")
+
+    selected = get_engine(engine)
+    try:
+        out = run_engine(selected, video, audio_format, output_dir, on_progress)
+    except VideoProcessingError as e:
+        fallback = ENGINES[MoviePyEngine.name]
+        no_audio = "geen audio" in str(e)
+        if engine != "auto" or selected is fallback or no_audio:
+            raise
+        if not fallback.available():
+            raise
+        out = run_engine(fallback, video, audio_format, output_dir, on_progress)
+
+    if not out.exists() or out.stat().st_size == 0:
+        out.unlink(missing_ok=True)
+        raise VideoProcessingError("Audio bestand kon niet worden aangemaakt")
+    return out
+
+
+async def extract_audio_async(
+    video: VideoInput,
+    audio_format: str = DEFAULT_AUDIO_FORMAT,
+    engine: str = "auto",
+    output_dir: Optional[Path] = None,
+) -> Path:
+    """
+    Async variant van extract_audio.
+
+    De ffmpeg engine draait als asyncio subprocess, zodat de event loop vrij
+    blijft; MoviePy (en de fallback) draait in een thread.
+    """
+    selected = get_engine(engine)
+    if not isinstance(selected, FFmpegEngine):
+        return await asyncio.to_thread(
+            extract_audio, video, audio_format, engine, output_dir
+        )
+
+    if audio_format != "copy" and audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Onbekend audio formaat: {audio_format}")
+
+    if isinstance(video, (str, Path)):
+        video = Path(video)
+        if not video.exists():
+            raise VideoProcessingError(f"Video bestand niet gevonden: {video}")
+    else:
+        video = as_buffer(video)
+        if len(video) == 0:
+            raise VideoProcessingError("Video upload is leeg")
+
+    try:
+        if isinstance(video, Path) or is_streamable(video):
+            out = await selected.extract_async(video, audio_format, output_dir)
+        else:
+            with buffer_as_path(video) as path:
+                out = await selected.extract_async(path, audio_format, output_dir)
+    except VideoProcessingError as e:
+        if engine != "auto" or "geen audio" in str(e):
+            raise
+        fallback = ENGINES[MoviePyEngine.name]
+        if not fallback.available():
+            raise
+        out = await asyncio.to_thread(
+            run_engine, fallback, video, audio_format, output_dir
+        )
+
+    if not out.exists() or out.stat().st_size == 0:
+        out.unlink(missing_ok=True)
+        raise VideoProcessingError("Audio bestand kon niet worden aangemaakt")
+    return out
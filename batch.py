@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Batch verwerking voor Cryptoriez Shorts Helper
+
+Verwerk een map (of glob) met shorts zonder de Streamlit UI:
+video → transcript → titel + beschrijving + hashtags, weggeschreven als
+JSONL of CSV. Bestanden gaan door de async pipeline, waarin extractie,
+transcriptie en generatie van verschillende clips overlappen. Met --bulk
+wordt eerst alles getranscribeerd en gaat de generatie daarna in één keer
+via de Batch API (goedkoper, maar klaar binnen uren in plaats van seconden).
+
+Gebruik:
+    python batch.py shorts/ -o resultaten.jsonl
+    python batch.py "shorts/*.mp4" -o resultaten.csv --workers 4 --clickbait 7
+    python batch.py achterstand/ -o resultaten.jsonl --bulk
+"""
+
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+from pydantic import ValidationError
+
+from logging_config import setup_logging
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v"}
+OUTPUT_FIELDS = ["file", "title", "description", "hashtags", "transcript", "error"]
+
+logger = logging.getLogger("batch")
+
+
+def collect_videos(inputs: Iterable[str], recursive: bool = False) -> list[Path]:
+    """Verzamel video bestanden uit mappen, globs en losse paden"""
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            candidates = path.glob(pattern)
+        elif path.exists():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        found.extend(
+            p for p in candidates if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+        )
+    # Uniek en in vaste volgorde
+    return sorted(set(found))
+
+
+def job_to_row(job, extra_hashtags: list[str]) -> dict:
+    """Zet een afgeronde pipeline job om in een uitvoer regel"""
+    import shorts_core
+
+    row = {
+        "file": job.name,
+        "title": job.title,
+        "description": job.description,
+        "hashtags": [],
+        "transcript": job.transcript,
+        "error": job.error or "",
+    }
+    if not job.error and job.settings.get("include_hashtags", True):
+        row["hashtags"] = shorts_core.merge_hashtags(job.hashtags, extra_hashtags)
+    return row
+
+
+class ResultWriter:
+    """Schrijf resultaten direct weg (JSONL of CSV), in volgorde van afronden"""
+
+    def __init__(self, path: Path, output_format: str):
+        self.path = path
+        self.format = output_format
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.csv = None
+        if output_format == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row: dict) -> None:
+        if self.csv is not None:
+            self.csv.writerow({**row, "hashtags": " ".join(row["hashtags"])})
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def run_batch_async(
+    videos: list[Path],
+    writer: ResultWriter,
+    settings: dict,
+    extra_hashtags: list[str],
+    workers: int = 2,
+) -> tuple[int, int]:
+    """Stuur alle video's door de async pipeline en schrijf ze weg zodra ze klaar zijn"""
+    from pipeline import AsyncPipeline, PipelineJob
+
+    pipeline = AsyncPipeline(
+        extract_workers=workers,
+        transcribe_workers=workers * 2,
+        generate_workers=workers * 2,
+        on_progress=lambda event: logger.debug(event.message),
+    )
+    jobs = [PipelineJob(video=video, settings=settings, name=str(video)) for video in videos]
+
+    succeeded = failed = 0
+    async for job in pipeline.run(jobs):
+        row = job_to_row(job, extra_hashtags)
+        writer.write(row)
+        if row["error"]:
+            failed += 1
+            logger.error(f"❌ {job.name}: {row['error']}")
+        else:
+            succeeded += 1
+            logger.info(f"✅ {job.name}: {row['title']}")
+    return succeeded, failed
+
+
+async def run_bulk_async(
+    videos: list[Path],
+    writer: ResultWriter,
+    settings: dict,
+    extra_hashtags: list[str],
+    workers: int = 2,
+    poll_seconds: Optional[float] = None,
+) -> tuple[int, int]:
+    """Transcribeer alle video's en genereer daarna alles in één Batch API run"""
+    import shorts_core
+    from bulk_generation import BATCH_POLL_SECONDS, generate_bulk
+    from pipeline import AsyncPipeline, PipelineJob
+
+    pipeline = AsyncPipeline(
+        extract_workers=workers,
+        transcribe_workers=workers * 2,
+        on_progress=lambda event: logger.debug(event.message),
+        transcribe_only=True,
+    )
+    jobs = [PipelineJob(video=video, settings=settings, name=str(video)) for video in videos]
+    transcribed = [job async for job in pipeline.run(jobs)]
+
+    requests = {}
+    for job in transcribed:
+        if job.error:
+            continue
+        try:
+            requests[job.name] = shorts_core.GenerationRequest(transcript=job.transcript, **job.settings)
+        except ValidationError as e:
+            # Eén ongeldige request kost alleen deze clip, niet de hele batch
+            job.error = f"generate: {e}"
+    logger.info(f"📦 {len(requests)} transcript(s) naar de Batch API")
+    results = await asyncio.to_thread(
+        generate_bulk,
+        requests,
+        poll_seconds=BATCH_POLL_SECONDS if poll_seconds is None else poll_seconds,
+        on_progress=lambda event: logger.info(event.message),
+    ) if requests else {}
+
+    succeeded = failed = 0
+    for job in transcribed:
+        item = results.get(job.name)
+        if item is not None and item.error:
+            job.error = f"generate: {item.error}"
+        elif item is not None:
+            job.title = item.result["title"]
+            job.description = item.result["description"]
+            job.hashtags = item.result["hashtags"]
+            job.usage = item.usage
+        row = job_to_row(job, extra_hashtags)
+        writer.write(row)
+        if row["error"]:
+            failed += 1
+            logger.error(f"❌ {job.name}: {row['error']}")
+        else:
+            succeeded += 1
+            logger.info(f"✅ {job.name}: {row['title']}")
+    return succeeded, failed
+
+
+def run_batch(
+    videos: list[Path],
+    output: Path,
+    settings: dict,
+    extra_hashtags: list[str],
+    workers: int = 2,
+    output_format: Optional[str] = None,
+    bulk: bool = False,
+    poll_seconds: Optional[float] = None,
+) -> tuple[int, int]:
+    """Verwerk alle video's (maximaal `workers` extracties tegelijk); geeft (ok, mislukt)"""
+    output_format = output_format or ("csv" if output.suffix.lower() == ".csv" else "jsonl")
+    writer = ResultWriter(output, output_format)
+    try:
+        if bulk:
+            return asyncio.run(
+                run_bulk_async(videos, writer, settings, extra_hashtags, workers, poll_seconds)
+            )
+        return asyncio.run(
+            run_batch_async(videos, writer, settings, extra_hashtags, workers)
+        )
+    finally:
+        writer.close()
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Genereer titels en beschrijvingen voor een map met shorts"
+    )
+    parser.add_argument("inputs", nargs="+", help="Map(pen), glob(s) of video bestanden")
+    parser.add_argument("-o", "--output", required=True, help="Uitvoer bestand (.jsonl of .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Forceer uitvoer formaat")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Zoek ook in submappen")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=2,
+        help="Aantal gelijktijdige extracties (API stages krijgen het dubbele)",
+    )
+    parser.add_argument("--language", choices=["nl", "en"], default="nl")
+    parser.add_argument("--clickbait", type=int, default=5, choices=range(0, 11), metavar="0-10")
+    parser.add_argument("--platforms", nargs="+", default=["Alle"])
+    parser.add_argument("--topic-hint", default="Crypto/Forex marktupdate of trade breakdown")
+    parser.add_argument("--no-emojis", action="store_true")
+    parser.add_argument("--no-hashtags", action="store_true")
+    parser.add_argument("--extra-hashtags", default=None, help="Komma-gescheiden extra hashtags")
+    parser.add_argument("--compact", action="store_true", help="Comprimeer transcripts vóór het prompten")
+    parser.add_argument("--token-budget", type=int, default=None, help="Max tokens transcript (met --compact)")
+    parser.add_argument(
+        "--bulk", action="store_true",
+        help="Genereer via de Batch API: goedkoper, resultaat binnen het completion window (tot 24 uur)",
+    )
+    parser.add_argument("--poll-seconds", type=float, default=None, help="Poll interval van de batch (met --bulk)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = parse_args(argv)
+    setup_logging()
+
+    import shorts_core
+
+    videos = collect_videos(args.inputs, recursive=args.recursive)
+    if not videos:
+        logger.error("Geen video bestanden gevonden")
+        return 1
+
+    unknown = [p for p in args.platforms if p not in shorts_core.PLATFORMS]
+    if unknown:
+        logger.error(f"Onbekende platform(s): {', '.join(unknown)}")
+        return 1
+
+    settings = {
+        "language": args.language,
+        "topic_hint": args.topic_hint,
+        "clickbait_level": args.clickbait,
+        "allow_emojis": not args.no_emojis,
+        "include_hashtags": not args.no_hashtags,
+        "platforms": args.platforms,
+        "compact": args.compact,
+        "token_budget": args.token_budget,
+    }
+    try:
+        # Vóór de extractie en Whisper: een fout in de opties kost anders alle transcripties
+        shorts_core.GenerationRequest(transcript="", **settings)
+    except ValidationError as e:
+        logger.error(f"Ongeldige instellingen: {e}")
+        return 1
+    extra_text = args.extra_hashtags
+    if extra_text is None:
+        extra_text = ", ".join(shorts_core.DEFAULT_HASHTAGS)
+    extra_hashtags = shorts_core.parse_hashtag_list(extra_text)
+
+    logger.info(f"🎬 {len(videos)} video's verwerken met {args.workers} worker(s)")
+    succeeded, failed = run_batch(
+        videos,
+        Path(args.output),
+        settings,
+        extra_hashtags,
+        workers=args.workers,
+        output_format=args.format,
+        bulk=args.bulk,
+        poll_seconds=args.poll_seconds,
+    )
+    logger.info(f"Klaar: {succeeded} gelukt, {failed} mislukt → {args.output}")
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Benchmarks voor Cryptoriez Shorts Helper
+
+Meet de verwerkingsstappen reproduceerbaar op lokaal gegenereerde video's:
+audio extractie per engine, hashtag merge, prompt opbouw, cache operaties
+en transcriptie/generatie tegen de lokale OpenAI stand-in (openai_standin.py)
+met instelbare latency, 429's en fouten. Resultaten (gemiddelde, p50, p95,
+throughput) gaan als JSON naar benchmarks/results/, zodat commits
+vergeleken kunnen worden.
+
+Gebruik:
+    python benchmarks/run.py                         # alle suites
+    python benchmarks/run.py --quick --only extract,cache
+    python benchmarks/run.py --api-latency 0.2 -o nieuw.json
+    python benchmarks/run.py --only api --api-rpm 300 --api-error-rate 0.02
+    python benchmarks/run.py --compare oud.json      # regressies t.o.v. een eerdere run
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from openai_standin import OpenAIStandInServer, StandInConfig
+
+SUITES = ["extract", "hashtags", "prompt", "cache", "api"]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# (duur in seconden, resolutie)
+VIDEOS = [(15, "640x360"), (15, "1280x720"), (60, "1280x720"), (60, "1920x1080")]
+QUICK_VIDEOS = [(5, "640x360"), (15, "1280x720")]
+
+
+# --------------------------
+# Meten
+# --------------------------
+def percentile(samples: list, pct: float) -> float:
+    """Percentiel met lineaire interpolatie"""
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(
+    name: str,
+    samples: list,
+    params: Optional[dict] = None,
+    work: Optional[float] = None,
+    unit: str = "",
+) -> dict:
+    """Statistiek van een reeks metingen; `work` per meting geeft de throughput"""
+    mean = statistics.fmean(samples)
+    result = {
+        "name": name,
+        "params": params or {},
+        "runs": len(samples),
+        "mean_s": mean,
+        "p50_s": percentile(samples, 50),
+        "p95_s": percentile(samples, 95),
+        "min_s": min(samples),
+        "max_s": max(samples),
+    }
+    if work:
+        result["throughput"] = work / mean
+        result["throughput_unit"] = f"{unit}/s"
+    return result
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    runs: int,
+    params: Optional[dict] = None,
+    work: Optional[float] = None,
+    unit: str = "",
+    warmup: int = 1,
+) -> dict:
+    """Voer `func` runs keer uit (na warmup) en vat de tijden samen"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    result = summarize(name, samples, params, work, unit)
+    print(format_result(result), flush=True)
+    return result
+
+
+def format_result(result: dict) -> str:
+    params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+    line = (
+        f"{result['name']:<28} {params:<40} "
+        f"p50 {result['p50_s'] * 1000:9.2f} ms  p95 {result['p95_s'] * 1000:9.2f} ms"
+    )
+    if "throughput" in result:
+        line += f"  {result['throughput']:10.1f} {result['throughput_unit']}"
+    return line
+
+
+# --------------------------
+# Synthetische input
+# --------------------------
+def make_video(path: Path, duration: int, size: str) -> Path:
+    """Testbeeld + toon, snel gecodeerd (de inhoud doet er voor de audio niet toe)"""
+    from audio_extraction import find_ffmpeg
+
+    if not path.exists():
+        subprocess.run([
+            find_ffmpeg(), "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=size={size}:rate=30:duration={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", str(path),
+        ], check=True)
+    return path
+
+
+def make_transcript(chars: int) -> str:
+    sentence = "Bitcoin test de weerstand en altcoins volgen voorzichtig. "
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+# --------------------------
+# Suites
+# --------------------------
+def bench_extract(workdir: Path, videos: list, runs: int) -> list:
+    from audio_extraction import ENGINES, extract_audio
+
+    results = []
+    for duration, size in videos:
+        video = make_video(workdir / f"bench_{duration}s_{size}.mp4", duration, size)
+        for name, engine in ENGINES.items():
+            if not engine.available():
+                print(f"extract: engine {name} niet beschikbaar, overgeslagen")
+                continue
+
+            def extract():
+                extract_audio(video, engine=name).unlink(missing_ok=True)
+
+            params = {
+                "engine": name,
+                "duration_s": duration,
+                "resolution": size,
+                "mb": round(video.stat().st_size / 1e6, 1),
+            }
+            # Throughput in seconden video per seconde (x realtime)
+            results.append(measure("extract_audio", extract, runs, params, duration, "video_s"))
+    return results
+
+
+def bench_hashtags(runs: int) -> list:
+    from shorts_core import merge_hashtags
+
+    results = []
+    batch = 1000
+    for count in (5, 30, 200):
+        generated = [f"crypto{i}" for i in range(count)]
+        extra = [f"#Crypto{i}" for i in range(0, count, 2)] + ["#shorts"]
+
+        def merge():
+            for _ in range(batch):
+                merge_hashtags(generated, extra)
+
+        results.append(measure("merge_hashtags", merge, runs, {"hashtags": count}, batch, "calls"))
+    return results
+
+
+def bench_prompt(runs: int) -> list:
+    from shorts_core import GenerationRequest, build_generation_params
+
+    results = []
+    batch = 100
+    for chars in (1_000, 10_000, 50_000):
+        for variants in (False, True):
+            req = GenerationRequest(
+                transcript=make_transcript(chars),
+                topic_hint="bitcoin",
+                variant_levels=[2, 5, 8] if variants else [],
+                variant_platforms=["Alle"] if variants else [],
+            )
+
+            def build():
+                for _ in range(batch):
+                    build_generation_params(req)
+
+            params = {"transcript_chars": chars, "variants": variants}
+            results.append(measure("build_prompt", build, runs, params, batch, "prompts"))
+    return results
+
+
+def bench_cache(workdir: Path, runs: int) -> list:
+    from cache_config import CacheManager
+    from sqlite_cache import SQLiteCacheManager
+
+    value = {
+        "title": "Bitcoin op weerstand: breekt hij nu door?",
+        "description": make_transcript(600),
+        "hashtags": ["#bitcoin", "#crypto", "#btc"],
+    }
+    backends = {
+        "file": lambda path: CacheManager(cache_dir=str(path)),
+        "file_no_memory": lambda path: CacheManager(cache_dir=str(path), memory_entries=0),
+        "sqlite": lambda path: SQLiteCacheManager(cache_dir=str(path)),
+    }
+
+    results = []
+    batch = 200
+    for name, factory in backends.items():
+        cache = factory(workdir / f"cache_{name}")
+        keys = [f"bench_{i}" for i in range(batch)]
+
+        def write():
+            for key in keys:
+                cache.set(key, value)
+
+        def read():
+            for key in keys:
+                if cache.get(key) is None:
+                    raise RuntimeError(f"Cache miss in {name}")
+
+        def miss():
+            for key in keys:
+                cache.get(f"missing_{key}")
+
+        params = {"backend": name}
+        results.append(measure("cache_set", write, runs, params, batch, "ops"))
+        results.append(measure("cache_get_hit", read, runs, params, batch, "ops"))
+        results.append(measure("cache_get_miss", miss, runs, params, batch, "ops"))
+    return results
+
+
+def bench_api(workdir: Path, server: OpenAIStandInServer, runs: int, concurrency: int) -> list:
+    from audio_extraction import extract_audio
+    from shorts_core import GenerationRequest, request_generation, transcribe_file
+    from transcription import transcribe_segments
+
+    audio = extract_audio(make_video(workdir / "bench_api.mp4", 10, "640x360"))
+    config = server.config
+    params = {"latency_s": config.latency}
+    if config.rpm or config.error_rate or config.rate_limit_rate:
+        params.update(rpm=config.rpm, error_rate=config.error_rate, rate_limit_rate=config.rate_limit_rate)
+    results = []
+
+    # Zoals in de app: een mislukte call (na de retries) telt mee, maar stopt de suite niet
+    def transcribe():
+        try:
+            transcribe_segments(audio, transcribe_file)
+        except Exception as e:
+            print(f"api: transcriptie mislukt: {e}")
+
+    results.append(measure("transcribe_audio", transcribe, runs, params))
+
+    counter = iter(range(10**9))
+
+    def generate(stream: bool = False):
+        # Unieke transcripts: geen coalescing tussen de gelijktijdige calls
+        req = GenerationRequest(transcript=f"Bench {next(counter)}: {make_transcript(2000)}")
+        on_progress = (lambda event: None) if stream else None
+        try:
+            request_generation(req, use_cache=False, on_progress=on_progress)
+        except Exception as e:
+            print(f"api: generatie mislukt: {e}")
+
+    results.append(measure("generate", generate, runs, params))
+    results.append(measure("generate_stream", lambda: generate(stream=True), runs, params))
+
+    def burst():
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(lambda _: generate(), range(concurrency)))
+
+    results.append(measure(
+        "generate_concurrent", burst, runs, {**params, "concurrency": concurrency},
+        concurrency, "requests",
+    ))
+    audio.unlink(missing_ok=True)
+    print(f"api: {server.responses(429)} x 429, {server.responses(500)} x 500 van de stand-in")
+    return results
+
+
+# --------------------------
+# Resultaten
+# --------------------------
+def git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+
+
+def result_key(result: dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Print de verschillen en geef de regressies (p95 of throughput > threshold slechter)"""
+    old = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\nVergelijking met {baseline['meta'].get('commit')} (drempel {threshold:.0%}):")
+    for result in current["results"]:
+        before = old.get(result_key(result))
+        if before is None:
+            continue
+        p95_change = result["p95_s"] / before["p95_s"] - 1
+        marker = ""
+        if p95_change > threshold:
+            marker = "  ⚠️ regressie"
+            regressions.append(result)
+        elif "throughput" in result and result["throughput"] < before["throughput"] * (1 - threshold):
+            marker = "  ⚠️ minder throughput"
+            regressions.append(result)
+        params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(f"  {result['name']:<28} {params:<40} p95 {p95_change:+7.1%}{marker}")
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks voor de verwerkingspipeline")
+    parser.add_argument("--only", help=f"Komma-gescheiden suites ({', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="Kleine video's en minder runs")
+    parser.add_argument("--runs", type=int, help="Metingen per benchmark (default 10, quick 3)")
+    parser.add_argument("--api-latency", type=float, default=0.05,
+                        help="Latency van de OpenAI stand-in in seconden (default: 0.05)")
+    parser.add_argument("--api-rpm", type=int, default=0,
+                        help="Requests per minuut per model op de stand-in (default: onbeperkt)")
+    parser.add_argument("--api-error-rate", type=float, default=0.0,
+                        help="Fractie 500's van de stand-in (default: 0)")
+    parser.add_argument("--api-rate-limit-rate", type=float, default=0.0,
+                        help="Fractie willekeurige 429's van de stand-in (default: 0)")
+    parser.add_argument("--client-rate-limits", default="",
+                        help="OPENAI_RATE_LIMITS van de client, bijv. 'gpt-4o-mini=500:200000' "
+                             "(default: geen eigen limiet)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Gelijktijdige generaties in de burst benchmark (default: 8)")
+    parser.add_argument("-o", "--output", type=Path, help="JSON bestand voor de resultaten")
+    parser.add_argument("--compare", type=Path, help="Eerdere resultaten om mee te vergelijken")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Toegestane verslechtering bij --compare (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    suites = args.only.split(",") if args.only else SUITES
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Onbekende suite(s): {', '.join(sorted(unknown))}")
+    runs = args.runs or (3 if args.quick else 10)
+    videos = QUICK_VIDEOS if args.quick else VIDEOS
+
+    server = OpenAIStandInServer(StandInConfig(
+        latency=args.api_latency,
+        rpm=args.api_rpm,
+        error_rate=args.api_error_rate,
+        rate_limit_rate=args.api_rate_limit_rate,
+        retry_after=0.2,
+        seed=0,
+    )).start()
+    with tempfile.TemporaryDirectory(prefix="cryptoriez_bench_") as tmp:
+        workdir = Path(tmp)
+        # Vóór het importeren van shorts_core: fake API en caches buiten de repo
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+        os.environ["OPENAI_RATE_LIMITS"] = args.client_rate_limits
+        for name in ("GENERATION_CACHE_DIR", "TRANSCRIPT_CACHE_DIR", "JOB_STATE_DIR"):
+            os.environ[name] = str(workdir / name.lower())
+
+        results = []
+        try:
+            if "extract" in suites:
+                results += bench_extract(workdir, videos, runs)
+            if "hashtags" in suites:
+                results += bench_hashtags(runs)
+            if "prompt" in suites:
+                results += bench_prompt(runs)
+            if "cache" in suites:
+                results += bench_cache(workdir, runs)
+            if "api" in suites:
+                results += bench_api(workdir, server, runs, args.concurrency)
+        finally:
+            server.stop()
+
+    from media_pool import available_cpus
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": available_cpus(),
+            "runs": runs,
+            "quick": args.quick,
+            "api_latency_s": args.api_latency,
+            "api_rpm": args.api_rpm,
+            "api_error_rate": args.api_error_rate,
+            "api_rate_limit_rate": args.api_rate_limit_rate,
+            "client_rate_limits": args.client_rate_limits,
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"bench_{report['meta']['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResultaten → {output}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressie(s)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
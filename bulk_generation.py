@@ -0,0 +1,190 @@
+"""
+Bulk generatie via de OpenAI Batch API voor Cryptoriez Shorts Helper
+
+Voor achterstanden die niet interactief hoeven (nachtelijke runs): in plaats
+van één chat completion per clip gaan alle GenerationRequests als JSONL
+bestand naar de Batch API. OpenAI verwerkt die binnen het completion window
+(tot 24 uur) tegen een lagere prijs en buiten de gewone rate limits. De
+resultaten komen via custom_id (de generatie cache key) terug bij de clips.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+import shorts_core
+from logging_config import get_logger
+from metrics import record_cache, record_tokens
+from progress import ProgressCallback, emit
+
+if TYPE_CHECKING:
+    from openai_pool import PooledOpenAI
+
+logger = get_logger(__name__)
+
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+# Limiet van de Batch API per ingediend bestand
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50000"))
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BulkResult:
+    """Resultaat van één request uit een batch: het geparste antwoord of een fout"""
+
+    result: Optional[dict] = None
+    usage: Optional[dict] = None
+    from_cache: bool = False
+    error: Optional[str] = None
+
+
+def batch_line(custom_id: str, req: "shorts_core.GenerationRequest") -> dict:
+    """Eén regel van het invoerbestand (extra_body gaat bij een batch gewoon in de body)"""
+    params = shorts_core.build_generation_params(req)
+    extra_body = params.pop("extra_body", {})
+    body = {**params, **extra_body}
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def build_batch_file(requests: dict[str, "shorts_core.GenerationRequest"]) -> bytes:
+    """JSONL invoer voor de Batch API, één regel per custom_id"""
+    return "".join(
+        json.dumps(batch_line(custom_id, req), ensure_ascii=False) + "\n"
+        for custom_id, req in requests.items()
+    ).encode()
+
+
+def submit_batch(client: "PooledOpenAI", data: bytes, metadata: Optional[dict] = None):
+    """Upload het invoerbestand en start de batch"""
+    upload = client.files.create(file=("generation_batch.jsonl", data), purpose="batch")
+    return client.batches.create(
+        input_file_id=upload.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata=metadata,
+    )
+
+
+def wait_for_batches(
+    client: "PooledOpenAI",
+    batch_ids: list[str],
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    on_progress: Optional[ProgressCallback] = None,
+) -> list:
+    """Poll tot alle batches klaar (of mislukt, verlopen, geannuleerd) zijn"""
+    done: dict = {}
+    while True:
+        batches = [done.get(batch_id) or client.batches.retrieve(batch_id) for batch_id in batch_ids]
+        done = {batch.id: batch for batch in batches if batch.status in TERMINAL_STATUSES}
+
+        counts = [batch.request_counts for batch in batches if batch.request_counts]
+        finished = sum(c.completed + c.failed for c in counts)
+        total = sum(c.total for c in counts)
+        emit(on_progress, "generate", f"Batch: {finished}/{total} requests verwerkt",
+             current=finished, total=total or None, unit="requests")
+        if len(done) == len(batch_ids):
+            return batches
+        time.sleep(poll_seconds)
+
+
+def read_output(client: "PooledOpenAI", file_id: Optional[str]) -> dict[str, dict]:
+    """Regels van een output- of error bestand, per custom_id"""
+    if not file_id:
+        return {}
+    lines = client.files.content(file_id).text.splitlines()
+    return {line["custom_id"]: line for line in map(json.loads, filter(str.strip, lines))}
+
+
+def batch_error(batch) -> str:
+    """Foutmelding voor requests die in een batch zonder antwoord bleven"""
+    errors = getattr(getattr(batch, "errors", None), "data", None) or []
+    if errors:
+        return f"batch {batch.status}: {errors[0].message}"
+    return f"batch {batch.status}"
+
+
+def parse_line(line: dict, req: "shorts_core.GenerationRequest") -> BulkResult:
+    """Eén regel uit het output bestand naar een BulkResult"""
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or body.get("error") or {}
+        return BulkResult(error=error.get("message") or f"HTTP {response.get('status_code')}")
+
+    usage_data = body.get("usage") or {}
+    usage = {
+        "prompt_tokens": usage_data.get("prompt_tokens", 0),
+        "cached_tokens": (usage_data.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+        "completion_tokens": usage_data.get("completion_tokens", 0),
+    }
+    try:
+        content = body["choices"][0]["message"]["content"]
+        result = shorts_core.parse_variants(content, req) if req.is_variant else shorts_core.parse_generation(content)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return BulkResult(usage=usage, error=f"Onleesbaar antwoord: {e}")
+    return BulkResult(result=result, usage=usage)
+
+
+def generate_bulk(
+    requests: dict[str, "shorts_core.GenerationRequest"],
+    client: Optional["PooledOpenAI"] = None,
+    use_cache: bool = True,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    on_progress: Optional[ProgressCallback] = None,
+) -> dict[str, BulkResult]:
+    """
+    Genereer voor veel requests tegelijk via de Batch API.
+
+    `requests` koppelt een eigen sleutel (bijvoorbeeld de clip) aan een
+    GenerationRequest; het resultaat heeft dezelfde sleutels. Cache hits en
+    dubbele requests gaan niet mee in de batch, nieuwe resultaten komen in
+    de generatie cache.
+    """
+    client = client or shorts_core.get_client()
+    cache = shorts_core.get_generation_cache()
+    results: dict[str, BulkResult] = {}
+    # custom_id (cache key) -> request, en welke sleutels erop wachten
+    pending: dict[str, "shorts_core.GenerationRequest"] = {}
+    waiting: dict[str, list[str]] = {}
+
+    for key, req in requests.items():
+        cache_key = shorts_core.generation_cache_key(req)
+        cached = cache.get(cache_key) if use_cache else None
+        if use_cache:
+            record_cache("generation", cached is not None)
+        if cached is not None:
+            results[key] = BulkResult(result=cached, from_cache=True)
+            continue
+        pending.setdefault(cache_key, req)
+        waiting.setdefault(cache_key, []).append(key)
+    if not pending:
+        return results
+
+    custom_ids = list(pending)
+    chunks = [custom_ids[i:i + BATCH_MAX_REQUESTS] for i in range(0, len(custom_ids), BATCH_MAX_REQUESTS)]
+    batches = []
+    for number, chunk in enumerate(chunks, 1):
+        data = build_batch_file({custom_id: pending[custom_id] for custom_id in chunk})
+        batch = submit_batch(client, data, metadata={"source": "shorts-helper", "part": f"{number}/{len(chunks)}"})
+        logger.info(f"Batch {batch.id} ingediend: {len(chunk)} requests")
+        batches.append(batch)
+    emit(on_progress, "generate", f"{len(custom_ids)} requests in {len(batches)} batch(es) ingediend",
+         current=0, total=len(custom_ids), unit="requests")
+
+    finished = wait_for_batches(client, [batch.id for batch in batches], poll_seconds, on_progress)
+    for batch, chunk in zip(finished, chunks):
+        lines = {**read_output(client, batch.error_file_id), **read_output(client, batch.output_file_id)}
+        logger.info(f"Batch {batch.id}: {batch.status}, {len(lines)} antwoorden")
+        for custom_id in chunk:
+            line = lines.get(custom_id)
+            item = parse_line(line, pending[custom_id]) if line else BulkResult(error=batch_error(batch))
+            record_tokens(item.usage)
+            if item.result is not None:
+                cache.set(custom_id, item.result)
+            for key in waiting[custom_id]:
+                results[key] = item
+    return results
@@ -5,17 +5,91 @@ Caching configuratie voor Cryptoriez Shorts Helper
 import hashlib
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path
-from typing import Any, Optional, Dict
-from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Dict, Union
+from datetime import datetime
+
+from singleflight import SingleFlight
+
+# Opslag: 'file' (JSON bestand per key), 'sqlite' (één WAL database per map)
+# of 'redis' (gedeeld tussen replica's, lokale map als L1)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+# Adres van de gedeelde cache (Redis of compatibel) voor CACHE_BACKEND=redis
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+
+# Budget per cache map (0 = onbegrensd) en grootte van de hot tier in het geheugen
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "500")) * 1024 * 1024
+CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "128"))
+
+# Blokgrootte voor het streamend hashen van uploads en audio
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def digest_buffer(buffer, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """SHA-256 van een bytes-achtig object, in blokken en zonder kopie"""
+    view = memoryview(buffer).cast("B")
+    digest = hashlib.sha256()
+    for start in range(0, len(view), chunk_size):
+        digest.update(view[start:start + chunk_size])
+    return digest.hexdigest()
+
+def digest_file(path: Union[str, Path], chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """SHA-256 van een bestand, streamend gelezen"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stable_hash(*parts: Any) -> str:
+    """
+    Stabiele SHA-256 over willekeurige (JSON-serialiseerbare) onderdelen.
+
+    In tegenstelling tot hash() is deze niet gesalt per proces, dus keys
+    blijven geldig na een herstart of op een andere replica.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 class CacheManager:
-    """Cache manager voor de applicatie"""
+    """
+    Cache manager voor de applicatie
+
+    Eén JSON bestand per key, begrensd op aantal entries en bytes (LRU
+    eviction). Een index in het geheugen (schrijftijd uit mtime, grootte)
+    maakt expiry goedkoop, en een kleine hot tier bewaart recent gebruikte
+    waarden zodat een hit niet telkens JSON hoeft te parsen.
+    """
     
-    def __init__(self, cache_dir: str = "cache", max_age_hours: int = 24):
+    def __init__(
+        self,
+        cache_dir: str = "cache",
+        max_age_hours: int = 24,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        memory_entries: Optional[int] = None
+    ):
         self.cache_dir = Path(cache_dir)
         self.max_age_hours = max_age_hours
-        self.cache_dir.mkdir(exist_ok=True)
+        self.max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.memory_entries = CACHE_MEMORY_ENTRIES if memory_entries is None else memory_entries
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        # key -> (schrijftijd, bytes), in LRU volgorde (laatst gebruikt achteraan)
+        self._index: "OrderedDict[str, tuple[float, int]]" = OrderedDict()
+        # key -> schrijftijd, in schrijfvolgorde (voor expiry zonder volledige scan)
+        self._written: "OrderedDict[str, float]" = OrderedDict()
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
     
     def _get_cache_key(self, data: str) -> str:
         """Genereer een cache key voor data"""
@@ -25,31 +99,104 @@ class CacheManager:
         """Krijg het cache bestand pad"""
         return self.cache_dir / f"{key}.json"
     
+    def _load_index(self) -> None:
+        """Bouw de index op uit stat() van de bestanden, zonder ze te lezen"""
+        entries = []
+        for cache_file in self.cache_dir.glob("*.json"):
+            try:
+                stat = cache_file.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, cache_file.stem, stat.st_size))
+        
+        for written_at, key, size in sorted(entries):
+            self._track(key, written_at, size)
+        self._evict()
+    
+    def _track(self, key: str, written_at: float, size: int) -> None:
+        """Neem een entry op in de index (lock moet vastgehouden worden)"""
+        self._forget(key)
+        self._index[key] = (written_at, size)
+        self._written[key] = written_at
+        self._total_bytes += size
+    
+    def _forget(self, key: str) -> None:
+        """Haal een entry uit index en hot tier (lock moet vastgehouden worden)"""
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+        self._written.pop(key, None)
+        self._memory.pop(key, None)
+    
+    def _remove(self, key: str) -> None:
+        """Verwijder een entry uit index en van schijf"""
+        self._forget(key)
+        self._get_cache_path(key).unlink(missing_ok=True)
+    
+    def _remember(self, key: str, data: Any) -> None:
+        """Bewaar een waarde in de hot tier"""
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict(self) -> None:
+        """Verwijder de minst recent gebruikte entries tot we binnen budget zijn"""
+        while self._index and (
+            (self.max_entries and len(self._index) > self.max_entries)
+            or (self.max_bytes and self._total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._index)))
+    
+    def _is_expired(self, written_at: float, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - written_at > self.max_age_hours * 3600
+    
     def get(self, key: str) -> Optional[Any]:
         """Haal data op uit cache"""
         cache_path = self._get_cache_path(key)
         
-        if not cache_path.exists():
-            return None
-        
-        try:
-            with open(cache_path, 'r') as f:
-                cache_data = json.load(f)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                # Mogelijk door een ander proces geschreven
+                try:
+                    stat = cache_path.stat()
+                except FileNotFoundError:
+                    self.misses += 1
+                    return None
+                self._track(key, stat.st_mtime, stat.st_size)
+                entry = self._index[key]
             
             # Check of cache nog geldig is
-            cache_time = datetime.fromisoformat(cache_data['timestamp'])
-            if datetime.now() - cache_time > timedelta(hours=self.max_age_hours):
+            if self._is_expired(entry[0]):
                 # Cache is verlopen, verwijder bestand
-                cache_path.unlink()
+                self._remove(key)
+                self.misses += 1
                 return None
             
-            return cache_data['data']
+            self._index.move_to_end(key)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
         
+        try:
+            with open(cache_path, 'r') as f:
+                data = json.load(f)['data']
         except Exception:
             # Als er iets mis gaat, verwijder het cache bestand
-            if cache_path.exists():
-                cache_path.unlink()
+            with self._lock:
+                self._remove(key)
+                self.misses += 1
             return None
+        
+        with self._lock:
+            if key in self._index:
+                self._remember(key, data)
+            self.hits += 1
+        return data
     
     def set(self, key: str, data: Any) -> None:
         """Sla data op in cache"""
@@ -60,53 +207,118 @@ class CacheManager:
                 'timestamp': datetime.now().isoformat(),
                 'data': data
             }
-            
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-        
+            payload = json.dumps(cache_data)
         except Exception:
             # Als er iets mis gaat, ga door zonder error
-            pass
+            return
+        
+        size = len(payload.encode("utf-8"))
+        if self.max_bytes and size > self.max_bytes:
+            # Past nooit binnen het budget
+            return
+        
+        # Eerst naar een tijdelijk bestand, dan atomair hernoemen: lezers zien
+        # nooit een half geschreven bestand
+        tmp_path = cache_path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, cache_path)
+            written_at = cache_path.stat().st_mtime
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            return
+        
+        with self._lock:
+            self._track(key, written_at, size)
+            self._remember(key, data)
+            self._evict()
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> tuple[Any, bool]:
+        """Haal op of bereken en sla op; geeft (waarde, uit_cache). None wordt niet opgeslagen"""
+        data = self.get(key)
+        if data is not None:
+            return data, True
+        data = compute()
+        if data is not None:
+            self.set(key, data)
+        return data, False
     
     def clear(self) -> None:
         """Leeg alle cache"""
-        for cache_file in self.cache_dir.glob("*.json"):
-            cache_file.unlink()
+        with self._lock:
+            for cache_file in self.cache_dir.glob("*.json"):
+                cache_file.unlink(missing_ok=True)
+            self._index.clear()
+            self._written.clear()
+            self._memory.clear()
+            self._total_bytes = 0
     
     def clear_expired(self) -> None:
-        """Verwijder verlopen cache bestanden"""
-        now = datetime.now()
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                with open(cache_file, 'r') as f:
-                    cache_data = json.load(f)
-                
-                cache_time = datetime.fromisoformat(cache_data['timestamp'])
-                if now - cache_time > timedelta(hours=self.max_age_hours):
-                    cache_file.unlink()
-            
-            except Exception:
-                # Als er iets mis gaat, verwijder het bestand
-                cache_file.unlink()
+        """Verwijder verlopen cache bestanden (oudste eerst, stopt bij de eerste geldige)"""
+        now = time.time()
+        with self._lock:
+            while self._written:
+                key, written_at = next(iter(self._written.items()))
+                if not self._is_expired(written_at, now):
+                    break
+                self._remove(key)
+    
+    def stats(self) -> Dict[str, int]:
+        """Aantal entries, bytes op schijf en hits/misses van dit proces"""
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def create_cache_manager(
+    cache_dir: str = "cache",
+    max_age_hours: int = 24,
+    backend: Optional[str] = None
+):
+    """Cache voor een map met de backend uit CACHE_BACKEND ('file', 'sqlite' of 'redis')"""
+    backend = backend or CACHE_BACKEND
+    if backend == "redis":
+        # Gedeeld tussen replica's; de lokale map dient als L1
+        from remote_cache import RemoteCacheManager
+        return RemoteCacheManager(
+            url=CACHE_URL,
+            namespace="shorts:" + Path(cache_dir).as_posix().replace("/", ":"),
+            max_age_hours=max_age_hours,
+            l1=CacheManager(cache_dir=cache_dir, max_age_hours=max_age_hours)
+        )
+    if backend == "sqlite":
+        from sqlite_cache import SQLiteCacheManager
+        return SQLiteCacheManager(cache_dir=cache_dir, max_age_hours=max_age_hours)
+    if backend != "file":
+        raise ValueError(f"Onbekende cache backend: {backend}")
+    return CacheManager(cache_dir=cache_dir, max_age_hours=max_age_hours)
 
 # Globale cache instance
-cache_manager = CacheManager()
+cache_manager = create_cache_manager()
+
+# Lopende berekeningen van cache_result, gedeeld over alle functies (key bevat de naam)
+_cache_flight = SingleFlight()
 
 def cache_result(func):
     """Decorator voor het cachen van functie resultaten"""
+    @wraps(func)
     def wrapper(*args, **kwargs):
         # Genereer cache key op basis van functie naam en argumenten
-        cache_key = f"{func.__name__}_{hash(str(args) + str(kwargs))}"
-        
-        # Probeer resultaat uit cache te halen
-        cached_result = cache_manager.get(cache_key)
-        if cached_result is not None:
-            return cached_result
-        
-        # Voer functie uit en cache resultaat
-        result = func(*args, **kwargs)
-        cache_manager.set(cache_key, result)
+        cache_key = f"{func.__name__}_{stable_hash(args, kwargs)}"
         
+        # Uit cache, of berekenen; gelijktijdige aanroepen met dezelfde key
+        # wachten op dezelfde berekening
+        result, _ = _cache_flight.do(
+            cache_key,
+            cache_manager.get_or_compute,
+            cache_key,
+            lambda: func(*args, **kwargs)
+        )
         return result
     
     return wrapper
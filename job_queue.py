@@ -0,0 +1,207 @@
+"""
+Achtergrond jobs voor Cryptoriez Shorts Helper
+
+Lange stappen (extractie + Whisper, generatie) draaien buiten de Streamlit
+script thread, in een eigen thread pool per soort job: een korte generatie
+wacht zo nooit achter een rij lange transcripties. main() dient een job in, bewaart het job
+id in st.session_state en pollt de status. De status (voortgang, resultaat
+of fout) gaat via de cache backend, zodat andere processen hem ook zien.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, Dict, Optional
+
+from cache_config import create_cache_manager
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Gelijktijdige jobs per soort (transcriptie, generatie)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", "cache/jobs")
+JOB_STATE_HOURS = int(os.getenv("JOB_STATE_HOURS", "24"))
+# Een job zonder update na zoveel seconden, die niet in dit proces loopt, is weg
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+# Afgeronde jobs die nooit opgehaald worden (tab dicht) blijven hooguit
+# JOB_STATE_HOURS en tot dit aantal in het geheugen; daarna alleen in de store
+JOB_MEMORY_FINISHED = int(os.getenv("JOB_MEMORY_FINISHED", "256"))
+# Voortgang wordt hooguit zo vaak bewaard; statuswijzigingen altijd direct
+JOB_SAVE_INTERVAL = float(os.getenv("JOB_SAVE_INTERVAL", "0.5"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# report(message, progress=None, partial=None): voortgang vanuit een job functie
+Reporter = Callable[..., None]
+
+
+class JobQueueFull(Exception):
+    """Te veel jobs van deze soort bezig of wachtend (backpressure)"""
+
+
+@dataclass
+class Job:
+    """Status van één achtergrond job"""
+
+    id: str
+    kind: str
+    status: str = QUEUED
+    message: str = ""
+    progress: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # Deelresultaat dat al getoond kan worden (bijvoorbeeld de titel)
+    partial: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue:
+    """Thread pool per soort job, met bewaarde job status"""
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        store=None,
+        max_finished: int = JOB_MEMORY_FINISHED,
+        max_pending: Optional[Dict[str, int]] = None,
+    ):
+        self.store = store or create_cache_manager(
+            cache_dir=JOB_STATE_DIR, max_age_hours=JOB_STATE_HOURS
+        )
+        self.max_workers = max(1, max_workers)
+        self.max_finished = max(0, max_finished)
+        # Per soort: hoeveel jobs tegelijk bezig of wachtend mogen zijn (geen limiet als hij ontbreekt)
+        self.max_pending = dict(max_pending or {})
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        # Houdt de writes naar de store op volgorde (zonder _lock vast te houden)
+        self._save_lock = threading.Lock()
+        self._saved_at: Dict[str, float] = {}
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job_{job_id}"
+
+    def _save(self, job: Job) -> None:
+        self.store.set(self._key(job.id), asdict(job))
+
+    def _update(self, job: Job, **changes: Any) -> None:
+        # Eerst bewaren, dan pas zichtbaar: wie een afgeronde job ziet, vindt hem ook in de store
+        with self._save_lock:
+            snapshot = replace(job, **changes, updated_at=time.time())
+            # Snelle voortgang (gestreamde tokens) niet bij elk event wegschrijven
+            save = "status" in changes or (
+                snapshot.updated_at - self._saved_at.get(job.id, 0) >= JOB_SAVE_INTERVAL
+            )
+            if save:
+                self._save(snapshot)
+            with self._lock:
+                for name, value in changes.items():
+                    setattr(job, name, value)
+                job.updated_at = snapshot.updated_at
+                if save and job.finished:
+                    self._saved_at.pop(job.id, None)
+                elif save:
+                    self._saved_at[job.id] = job.updated_at
+
+    def _evict(self) -> None:
+        """Afgeronde jobs uit het geheugen: ouder dan JOB_STATE_HOURS, of de oudste boven max_finished"""
+        cutoff = time.time() - JOB_STATE_HOURS * 3600
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished), key=lambda job: job.updated_at
+        )
+        excess = len(finished) - self.max_finished
+        for index, job in enumerate(finished):
+            if index < excess or job.updated_at < cutoff:
+                del self._jobs[job.id]
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Plan `func(report, *args, **kwargs)` in; geeft het job id terug.
+        Het resultaat moet JSON-serialiseerbaar zijn (het wordt bewaard).
+        Raises JobQueueFull als max_pending voor deze soort bereikt is.
+        """
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        with self._lock:
+            self._evict()
+            limit = self.max_pending.get(kind)
+            pending = sum(1 for other in self._jobs.values() if other.kind == kind and not other.finished)
+            if limit is not None and pending >= limit:
+                raise JobQueueFull(f"{pending} {kind} jobs bezig of wachtend (maximaal {limit})")
+            self._jobs[job.id] = job
+            executor = self._executors.get(kind)
+            if executor is None:
+                executor = self._executors[kind] = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix=f"job-{kind}"
+                )
+        self._save(job)
+        executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        def report(
+            message: str, progress: Optional[float] = None, partial: Optional[dict] = None
+        ) -> None:
+            changes = {"message": message, "progress": progress}
+            if partial is not None:
+                changes["partial"] = partial
+            self._update(job, **changes)
+
+        self._update(job, status=RUNNING)
+        try:
+            result = func(report, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.kind} ({job.id}) mislukt: {e}")
+            self._update(job, status=FAILED, error=str(e))
+        else:
+            self._update(job, status=DONE, result=result, progress=1.0)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Huidige status (een kopie), uit dit proces of uit de bewaarde status"""
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return replace(job)
+
+        data = self.store.get(self._key(job_id))
+        if data is None:
+            return None
+        job = Job(**data)
+        if not job.finished and time.time() - job.updated_at > JOB_STALE_SECONDS:
+            job.status = FAILED
+            job.error = "Job onderbroken (server herstart?)"
+        return job
+
+    def forget(self, job_id: str) -> None:
+        """Vergeet een afgehandelde job in het geheugen (de bewaarde status verloopt vanzelf)"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._saved_at.pop(job_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Aantal jobs per status in dit proces"""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executors = list(self._executors.values())
+        for executor in executors:
+            executor.shutdown(wait=wait)
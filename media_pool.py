@@ -0,0 +1,137 @@
+"""
+Media worker pool voor Cryptoriez Shorts Helper
+
+Audio extractie is CPU-werk in ffmpeg child processen. De pool begrenst
+hoeveel daarvan tegelijk draaien op het aantal CPU's dat de container echt
+mag gebruiken (cgroup quota en CPU affinity), met een begrensde wachtrij:
+als die vol is wordt een nieuwe job direct geweigerd in plaats van de
+latency van iedereen op te laten lopen.
+"""
+
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from error_handling import VideoProcessingError
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> Optional[float]:
+    """CPU quota van de container (cgroup v2 of v1), None als er geen limiet is"""
+    try:
+        # cgroup v2: "<quota> <period>" of "max <period>"
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """Bruikbare CPU's: affinity mask, begrensd door de cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "0")) or available_cpus()
+MEDIA_QUEUE_SIZE = int(os.getenv("MEDIA_QUEUE_SIZE", str(MEDIA_WORKERS * 4)))
+
+
+class MediaPoolFull(VideoProcessingError):
+    """De extractie wachtrij is vol (backpressure)"""
+
+
+class MediaPool:
+    """Begrensde pool: maximaal `workers` tegelijk, maximaal `max_queue` wachtend"""
+
+    def __init__(self, workers: int = MEDIA_WORKERS, max_queue: int = MEDIA_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._condition = threading.Condition()
+        self._running = 0
+        # Tickets in volgorde van binnenkomst (eerlijke, FIFO wachtrij)
+        self._waiting: list = []
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "max_queue": self.max_queue,
+            }
+
+    def is_full(self) -> bool:
+        """True als een nieuwe job geweigerd zou worden"""
+        with self._condition:
+            return self._running >= self.workers and len(self._waiting) >= self.max_queue
+
+    def run(
+        self,
+        func: Callable[..., Any],
+        *args,
+        on_wait: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Voer `func` uit zodra er een worker vrij is. `on_wait(positie)` wordt
+        aangeroepen zolang de job in de wachtrij staat.
+        """
+        ticket = object()
+        with self._condition:
+            if self._running >= self.workers or self._waiting:
+                if len(self._waiting) >= self.max_queue:
+                    raise MediaPoolFull(
+                        f"Server is druk ({self._running} extracties bezig, "
+                        f"{len(self._waiting)} wachtend); probeer het zo opnieuw"
+                    )
+                self._waiting.append(ticket)
+                position = None
+                try:
+                    while self._waiting[0] is not ticket or self._running >= self.workers:
+                        current = self._waiting.index(ticket) + 1
+                        if on_wait is not None and current != position:
+                            position = current
+                            self._condition.release()
+                            try:
+                                on_wait(current)
+                            finally:
+                                self._condition.acquire()
+                            continue
+                        self._condition.wait()
+                finally:
+                    # Ook bij een fout in on_wait (of een interrupt): anders blokkeert de wachtrij
+                    self._waiting.remove(ticket)
+                    # Overige wachtenden schuiven een plek op
+                    self._condition.notify_all()
+            self._running += 1
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+
+# Globale pool voor alle sessies in dit proces
+media_pool = MediaPool()
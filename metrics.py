@@ -0,0 +1,263 @@
+"""
+Metrics voor Cryptoriez Shorts Helper
+
+Lichte instrumentatie zonder extra dependencies: duur, bytes, tokens en
+cache hits per stage (upload, extractie, transcriptie, generatie) als
+Prometheus counters en histogrammen, een /metrics endpoint in een
+achtergrond thread, en per job een log regel met waar de tijd heen ging.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Poort voor het /metrics endpoint; 0 = geen endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Van snelle cache lookups tot lange Whisper calls
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for _, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Oplopende teller per label combinatie"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Verdeling van waarnemingen (cumulatieve buckets, som en aantal)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [aantal per bucket..., som, aantal]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return self._values.get(_labels(labels), [0])[-1]
+
+    def sum(self, **labels) -> float:
+        with self._lock:
+            data = self._values.get(_labels(labels))
+            return data[-2] if data else 0.0
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for labels, data in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, data):
+                    le = (("le", _format_value(bound)),)
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {count}")
+                inf = (("le", "+Inf"),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels, inf)} {data[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(data[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    """Alle metrics van dit proces"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(
+        self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def render(self) -> str:
+        """Alle metrics in Prometheus tekstformaat"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram("shorts_stage_seconds", "Duur per stage in seconden")
+STAGE_ERRORS = registry.counter("shorts_stage_errors_total", "Mislukte stages")
+STAGE_BYTES = registry.counter("shorts_stage_bytes_total", "Verwerkte bytes per stage")
+JOB_SECONDS = registry.histogram("shorts_job_seconds", "Totale duur per job in seconden")
+TOKENS = registry.counter("shorts_tokens_total", "OpenAI tokens per soort")
+CACHE_REQUESTS = registry.counter(
+    "shorts_cache_requests_total", "Cache lookups per cache en resultaat"
+)
+
+
+@dataclass
+class JobTimings:
+    """Tijd per stage binnen één job"""
+
+    kind: str
+    name: str = ""
+    stages: Dict[str, float] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.stages.items())
+        label = f"{self.kind} {self.name}".strip()
+        return f"⏱️ {label}: {stages or 'geen stages'} (totaal {self.total:.2f}s)"
+
+
+# Job van de huidige thread of asyncio task
+_current_job: ContextVar[Optional[JobTimings]] = ContextVar("job_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str, size: Optional[int] = None) -> Iterator[None]:
+    """Meet de duur (en eventueel het aantal bytes) van een stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if size:
+            STAGE_BYTES.inc(size, stage=stage)
+        job = _current_job.get()
+        if job is not None:
+            job.add(stage, seconds)
+
+
+@contextmanager
+def job_timings(kind: str, name: str = "") -> Iterator[JobTimings]:
+    """Verzamel de stage tijden binnen dit blok en log ze als één regel"""
+    timings = JobTimings(kind, name)
+    token = _current_job.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_job.reset(token)
+        JOB_SECONDS.observe(timings.total, kind=kind)
+        logger.info(timings.summary())
+
+
+def record_tokens(usage: Optional[dict]) -> None:
+    """Tel de tokens van een API call (usage_summary formaat)"""
+    if not usage:
+        return
+    for kind in ("prompt", "cached", "completion"):
+        TOKENS.inc(usage.get(f"{kind}_tokens") or 0, kind=kind)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serveer /metrics in een daemon thread (port 0 kiest een vrije poort)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics op http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -10,22 +10,23 @@ import requests
 import subprocess
 from datetime import datetime
 
-def check_openai_api():
-    """Controleer of OpenAI API bereikbaar is"""
+def check_openai_api(base_url=None):
+    """Controleer of OpenAI API (of de stand-in via OPENAI_BASE_URL) bereikbaar is"""
     try:
         from openai import OpenAI
         from dotenv import load_dotenv
         
         load_dotenv()
         api_key = os.getenv("OPENAI_API_KEY")
+        base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
         
         if not api_key:
             return False, "Geen API key gevonden"
         
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=10)
         # Test met een eenvoudige request
         response = client.models.list()
-        return True, "API bereikbaar"
+        return True, f"API bereikbaar ({base_url})" if base_url else "API bereikbaar"
     except Exception as e:
         return False, f"API fout: {str(e)}"
 
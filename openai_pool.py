@@ -0,0 +1,367 @@
+"""
+Gedeelde OpenAI client laag voor Cryptoriez Shorts Helper
+
+Alle sessies, achtergrond jobs en de batch pipeline delen één HTTP
+connection pool (keep-alive) en één set rate limiters: per model een token
+bucket voor requests per minuut en tokens per minuut. Fouten die de moeite
+van opnieuw proberen waard zijn (429, 5xx, time-outs) worden herhaald met
+jitter; een Retry-After van de server gaat voor en pauzeert ook de andere
+aanroepers voor dat model, zodat een 429 niet meteen tot meer 429's leidt.
+
+PooledOpenAI en AsyncPooledOpenAI hebben dezelfde interface als de SDK
+clients voor wat de app gebruikt (chat.completions.create,
+audio.transcriptions.create, models).
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from logging_config import get_logger
+from metrics import registry
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+logger = get_logger(__name__)
+
+# HTTP pool: gedeeld door alle threads; keep-alive scheelt een TLS handshake per call
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "30"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+# HTTP/2 alleen als het h2 pakket er is
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"
+
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_SECONDS", "30"))
+
+# "model=rpm[:tpm],..." (0 = onbeperkt); zet dit iets onder de limieten van het account
+OPENAI_RATE_LIMITS = os.getenv("OPENAI_RATE_LIMITS", "whisper-1=50,gpt-4o-mini=500:200000")
+# Burst: zoveel seconden aan capaciteit mag in één keer
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("OPENAI_RATE_LIMIT_BURST_SECONDS", "6"))
+
+RETRY_STATUS = {408, 409, 429}
+
+RETRIES = registry.counter("shorts_openai_retries_total", "Herhaalde OpenAI calls per model en reden")
+THROTTLED = registry.histogram(
+    "shorts_openai_throttle_seconds", "Wachttijd door de eigen rate limiter per model"
+)
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    rpm: int = 0
+    tpm: int = 0
+
+
+def parse_rate_limits(spec: str) -> Dict[str, ModelLimits]:
+    """'whisper-1=50,gpt-4o-mini=500:200000' -> {model: ModelLimits}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = ModelLimits(int(rpm or 0), int(tpm or 0))
+    return limits
+
+
+class TokenBucket:
+    """
+    Token bucket met reserveringen: een aanroeper reserveert direct en krijgt
+    terug hoe lang hij moet wachten, zodat wachtenden op volgorde doorgaan
+    (bruikbaar vanuit threads en vanuit asyncio).
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = RATE_LIMIT_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Reserveer `amount`; geeft de seconden die eerst gewacht moeten worden"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Een request groter dan de bucket wacht op een volle bucket
+            self.tokens -= min(amount, self.capacity)
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """Token buckets per model voor requests en tokens per minuut"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, ModelLimits]] = None,
+        burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+    ):
+        self.limits = parse_rate_limits(OPENAI_RATE_LIMITS) if limits is None else limits
+        self.burst_seconds = burst_seconds
+        self._buckets: Dict[str, tuple] = {}
+        # model -> monotonic tijd tot wanneer de server geen requests wil
+        self._paused: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> tuple:
+        with self._lock:
+            buckets = self._buckets.get(model)
+            if buckets is None:
+                limits = self.limits.get(model, ModelLimits())
+                buckets = self._buckets[model] = (
+                    TokenBucket(limits.rpm, self.burst_seconds) if limits.rpm else None,
+                    TokenBucket(limits.tpm, self.burst_seconds) if limits.tpm else None,
+                )
+            return buckets
+
+    def reserve(self, model: str, tokens: int = 0) -> float:
+        """Reserveer één request (en `tokens`); geeft de wachttijd in seconden"""
+        requests, token_bucket = self._get(model)
+        wait = requests.reserve(1) if requests else 0.0
+        if token_bucket and tokens:
+            wait = max(wait, token_bucket.reserve(tokens))
+        with self._lock:
+            wait = max(wait, self._paused.get(model, 0.0) - time.monotonic())
+        if wait > 0:
+            THROTTLED.observe(wait, model=model)
+        return wait
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Geen nieuwe requests voor dit model tot `seconds` vanaf nu (server hint)"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._paused[model] = max(self._paused.get(model, 0.0), until)
+
+
+def estimate_tokens(params: dict) -> int:
+    """Grove schatting vooraf (~4 tekens per token) plus de maximale output"""
+    chars = sum(len(str(message.get("content", ""))) for message in params.get("messages", []))
+    return chars // 4 + int(params.get("max_tokens") or params.get("max_completion_tokens") or 0)
+
+
+def retry_hint(error: Exception) -> Optional[float]:
+    """Wachttijd die de server meestuurt (retry-after-ms of Retry-After)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRY_STATUS or error.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, hint: Optional[float]) -> float:
+    """Server hint (met wat jitter zodat wachtenden niet tegelijk terugkomen), anders full jitter"""
+    if hint is not None:
+        return min(hint, RETRY_MAX_SECONDS) * random.uniform(1.0, 1.2)
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class _Retrying:
+    """Gedeelde retry logica voor de sync en async client"""
+
+    def __init__(self, limiter: RateLimiter, max_retries: int):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def _next_delay(self, error: Exception, model: str, attempt: int) -> Optional[float]:
+        """Wachttijd voor de volgende poging, of None als de fout door moet"""
+        if not is_retryable(error):
+            return None
+        delay = backoff_delay(attempt, retry_hint(error))
+        status = getattr(error, "status_code", None)
+        if status == 429:
+            # Ook de andere aanroepers voor dit model even laten wachten
+            self.limiter.pause(model, delay)
+        if attempt >= self.max_retries:
+            return None
+        RETRIES.inc(model=model, reason=str(status or type(error).__name__))
+        logger.warning(
+            f"OpenAI {model}: {status or type(error).__name__}, "
+            f"poging {attempt + 2} over {delay:.1f}s"
+        )
+        return delay
+
+    @staticmethod
+    def _rewind(params: dict) -> None:
+        # Een bestand dat al (deels) verstuurd is, opnieuw vanaf het begin
+        file = params.get("file")
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+class PooledOpenAI(_Retrying):
+    """OpenAI client met gedeelde connection pool, rate limiting en retries"""
+
+    def __init__(self, client: "OpenAI", limiter: RateLimiter, max_retries: int = OPENAI_MAX_RETRIES):
+        super().__init__(limiter, max_retries)
+        self.client = client
+        self.models = client.models
+        # Batch API: de queue aan de kant van OpenAI heeft eigen limieten, geen rate limiting hier
+        self.files = client.files
+        self.batches = client.batches
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transcribe))
+
+    def call(self, model: str, tokens: int, func: Callable[..., Any], params: dict) -> Any:
+        """Voer een API call uit binnen de rate limit, met retries"""
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve(model, tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return func(**params)
+            except Exception as e:
+                delay = self._next_delay(e, model, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            self._rewind(params)
+            attempt += 1
+
+    def _chat(self, **params) -> Any:
+        return self.call(
+            params.get("model", ""), estimate_tokens(params), self.client.chat.completions.create, params
+        )
+
+    def _transcribe(self, **params) -> Any:
+        return self.call(params.get("model", ""), 0, self.client.audio.transcriptions.create, params)
+
+
+class AsyncPooledOpenAI(_Retrying):
+    """Async variant voor de pipeline; deelt de rate limiter met de sync client"""
+
+    def __init__(
+        self, client: "AsyncOpenAI", limiter: RateLimiter, max_retries: int = OPENAI_MAX_RETRIES
+    ):
+        super().__init__(limiter, max_retries)
+        self.client = client
+        self.models = client.models
+        # Batch API zonder rate limiting (zie PooledOpenAI)
+        self.files = client.files
+        self.batches = client.batches
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transcribe))
+
+    async def call(self, model: str, tokens: int, func: Callable[..., Any], params: dict) -> Any:
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve(model, tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await func(**params)
+            except Exception as e:
+                delay = self._next_delay(e, model, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            self._rewind(params)
+            attempt += 1
+
+    async def _chat(self, **params) -> Any:
+        return await self.call(
+            params.get("model", ""), estimate_tokens(params), self.client.chat.completions.create, params
+        )
+
+    async def _transcribe(self, **params) -> Any:
+        return await self.call(
+            params.get("model", ""), 0, self.client.audio.transcriptions.create, params
+        )
+
+
+def _http_classes() -> tuple:
+    """(httpx module, sync client, async client) van de transport die deze openai versie gebruikt"""
+    # openai (en zijn transport) pas laden bij de eerste client: scheelt bij het starten van de app
+    import openai
+
+    if hasattr(openai, "DefaultHttpx2Client"):
+        import httpx2
+
+        return httpx2, openai.DefaultHttpx2Client, openai.DefaultAsyncHttpx2Client
+    import httpx
+
+    return httpx, openai.DefaultHttpxClient, openai.DefaultAsyncHttpxClient
+
+
+def http_client_options() -> dict:
+    """Limits en time-outs voor de gedeelde HTTP connection pool"""
+    httpx, _, _ = _http_classes()
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_SECONDS,
+        ),
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+        "http2": OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None,
+    }
+
+
+# Eén limiter per proces, gedeeld door de sync en async clients
+rate_limiter = RateLimiter()
+
+
+def create_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> PooledOpenAI:
+    """Sync client; de SDK zelf probeert niet opnieuw, dat doet deze laag"""
+    from openai import OpenAI
+
+    _, http_client, _ = _http_classes()
+    client = OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=http_client(**http_client_options()),
+    )
+    return PooledOpenAI(client, limiter or rate_limiter)
+
+
+def create_async_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> AsyncPooledOpenAI:
+    """Async client voor de pipeline (eigen pool, zelfde rate limiter)"""
+    from openai import AsyncOpenAI
+
+    _, _, http_client = _http_classes()
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=http_client(**http_client_options()),
+    )
+    return AsyncPooledOpenAI(client, limiter or rate_limiter)
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Lokale OpenAI stand-in voor Cryptoriez Shorts Helper
+
+Een OpenAI-compatibele server met alleen de endpoints die de app gebruikt
+(Whisper transcriptie als tekst of verbose_json met segmenten, chat
+completions met en zonder streaming, files en batches voor de Batch API,
+models), voor load tests zonder betaalde calls. Latency, rate limits (429 met
+Retry-After) en foutpercentages zijn instelbaar, zodat de throughput
+grens en de concurrency instellingen eerlijk gemeten kunnen worden.
+
+Gebruik:
+    python openai_standin.py --port 8089 --latency 0.5 --rpm 500 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 streamlit run app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Optional, Tuple
+
+TRANSCRIPT = (
+    "Bitcoin test vandaag opnieuw de weerstand rond de zeventigduizend dollar. "
+    "Als die breekt kan het snel gaan, maar let op het volume."
+)
+TITLE = "Bitcoin op weerstand: breekt hij nu door?"
+DESCRIPTION = "Bitcoin test de zeventigduizend. Wat betekent dat voor jou?"
+HASHTAGS = ["#bitcoin", "#crypto", "#btc"]
+
+# De stand-in decodeert geen audio: duur geschat op de Opus bitrate van de app (32 kbit/s)
+AUDIO_BYTES_PER_SECOND = 4000
+
+# Variant-modus in de prompt van shorts_core.build_user_prompt
+VARIANT_LEVELS = re.compile(r"intensiteit in \[([\d,\s]*)\]")
+VARIANT_PLATFORMS = re.compile(r"afgestemd op dat platform: ([^\n]+?)\.\n")
+
+
+@dataclass
+class StandInConfig:
+    """Gedrag van de stand-in; mag tijdens een test aangepast worden"""
+
+    latency: float = 0.0  # seconden per request
+    jitter: float = 0.0  # extra willekeurige latency (0..jitter)
+    transcribe_latency_per_mb: float = 0.0  # Whisper: extra per MB audio
+    token_delay: float = 0.0  # pauze tussen stream chunks
+    rpm: int = 0  # requests per minuut per model (0 = onbeperkt)
+    tpm: int = 0  # tokens per minuut per model (0 = onbeperkt)
+    rate_limit_rate: float = 0.0  # fractie requests die willekeurig een 429 krijgt
+    error_rate: float = 0.0  # fractie requests die een 500 krijgt
+    segment_seconds: float = 4.0  # segmentlengte bij verbose_json transcripties
+    batch_latency: float = 0.0  # verwerkingstijd van een batch (Batch API)
+    retry_after: float = 1.0  # Retry-After bij een willekeurige 429
+    seed: Optional[int] = None
+
+
+class _Limiter:
+    """Sliding window van één minuut per model (requests en tokens)"""
+
+    WINDOW = 60.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows: Dict[str, Deque[Tuple[float, int]]] = {}
+
+    def acquire(self, model: str, tokens: int, rpm: int, tpm: int) -> Tuple[Optional[float], dict]:
+        """(None, headers) als het past, anders (seconden tot het wel past, headers)"""
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.setdefault(model, deque())
+            while window and now - window[0][0] >= self.WINDOW:
+                window.popleft()
+            used_tokens = sum(count for _, count in window)
+
+            wait = None
+            if rpm and len(window) >= rpm:
+                wait = self.WINDOW - (now - window[0][0])
+            elif tpm and used_tokens + tokens > tpm and window:
+                # Wachten tot er genoeg tokens uit het venster vallen
+                freed = used_tokens + tokens - tpm
+                for started, count in window:
+                    freed -= count
+                    if freed <= 0:
+                        wait = self.WINDOW - (now - started)
+                        break
+            if wait is None:
+                window.append((now, tokens))
+                used_tokens += tokens
+
+            headers = {}
+            if rpm:
+                headers["x-ratelimit-limit-requests"] = str(rpm)
+                headers["x-ratelimit-remaining-requests"] = str(max(0, rpm - len(window)))
+            if tpm:
+                headers["x-ratelimit-limit-tokens"] = str(tpm)
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, tpm - used_tokens))
+            return wait, headers
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers en body apart geschreven: zonder dit kost delayed ACK ~40 ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        # Tellen vóór het versturen: de client kan direct na de response de stats lezen
+        self.server.count(self.path, status)
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, kind: str, headers: Optional[dict] = None) -> None:
+        self._send(status, {"error": {"message": message, "type": kind, "code": None}}, headers)
+
+    def _route(self) -> str:
+        return self.path.split("?", 1)[0].rsplit("/v1", 1)[-1].rstrip("/")
+
+    def do_GET(self):
+        route = self._route()
+        if route == "/models":
+            models = [{"id": model, "object": "model", "owned_by": "stand-in"}
+                      for model in ("whisper-1", "gpt-4o-mini")]
+            self._send(200, {"object": "list", "data": models})
+        elif not self._batch_api("GET", route, b""):
+            self._error(404, f"Onbekend pad: {self.path}", "invalid_request_error")
+
+    def _batch_api(self, method: str, route: str, body: bytes) -> bool:
+        """Files en batches endpoints; False als het pad er niet bij hoort"""
+        server = self.server
+        parts = route.strip("/").split("/")
+        if parts[0] not in ("files", "batches"):
+            return False
+
+        if method == "POST" and route == "/files":
+            data = upload_bytes(body)
+            self._send(200, server.add_file(data, form_field(body, "purpose") or "batch"))
+        elif method == "POST" and route == "/batches":
+            request = json.loads(body or b"{}")
+            if request.get("input_file_id") not in server.files:
+                self._error(400, "Onbekend input_file_id", "invalid_request_error")
+            else:
+                self._send(200, server.create_batch(request))
+        elif method == "POST" and len(parts) == 3 and parts[0] == "batches" and parts[2] == "cancel":
+            batch = server.cancel_batch(parts[1])
+            if batch is None:
+                self._error(404, f"Onbekende batch: {parts[1]}", "invalid_request_error")
+            else:
+                self._send(200, batch)
+        elif method == "GET" and parts[0] == "batches" and len(parts) == 2 and parts[1] in server.batches:
+            self._send(200, server.batch(parts[1]))
+        elif method == "GET" and parts[0] == "files" and len(parts) >= 2 and parts[1] in server.files:
+            file = server.files[parts[1]]
+            if len(parts) == 3 and parts[2] == "content":
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(file["data"])))
+                self.end_headers()
+                server.count(self.path, 200)
+                self.wfile.write(file["data"])
+            else:
+                self._send(200, file["meta"])
+        else:
+            self._error(404, f"Onbekend pad: {self.path}", "invalid_request_error")
+        return True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        config = server.config
+
+        # Batch API: geen rate limit per request, wel eigen verwerkingstijd
+        if self._batch_api("POST", self._route(), body):
+            return
+        if self.path.endswith("/audio/transcriptions"):
+            model, tokens = "whisper-1", 0
+            request = None
+        elif self.path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            model = request.get("model", "gpt-4o-mini")
+            # Ruwe schatting zoals de echte API: ~4 tekens per token, plus de output
+            tokens = len(body) // 4 + int(request.get("max_tokens") or 0)
+        else:
+            self._error(404, f"Onbekend pad: {self.path}", "invalid_request_error")
+            return
+
+        wait, limit_headers = server.limiter.acquire(model, tokens, config.rpm, config.tpm)
+        if wait is not None:
+            self._rate_limited(wait, limit_headers)
+            return
+        if server.chance(config.rate_limit_rate):
+            self._rate_limited(config.retry_after, limit_headers)
+            return
+
+        delay = config.latency + (server.uniform(0, config.jitter) if config.jitter else 0)
+        if request is None:
+            delay += config.transcribe_latency_per_mb * len(body) / 1e6
+        time.sleep(delay)
+
+        if server.chance(config.error_rate):
+            self._error(500, "Stand-in server fout", "server_error", limit_headers)
+        elif request is None:
+            self._send(200, transcription_content(body, config.segment_seconds), limit_headers)
+        else:
+            self._chat(request, limit_headers)
+
+    def _rate_limited(self, wait: float, headers: dict) -> None:
+        self._error(429, "Rate limit bereikt (stand-in)", "rate_limit_exceeded", {
+            **headers,
+            "retry-after": str(max(1, round(wait))),
+            "retry-after-ms": str(int(wait * 1000)),
+        })
+
+    def _chat(self, request: dict, headers: dict) -> None:
+        completion = chat_completion(request)
+        if not request.get("stream"):
+            self._send(200, completion, headers)
+            return
+
+        content = completion["choices"][0]["message"]["content"]
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        base["object"] = "chat.completion.chunk"
+        for start in range(0, len(content), 8):
+            delta = {"content": content[start:start + 8]}
+            self._event({**base, "choices": [{"index": 0, "delta": delta}]})
+            if self.server.config.token_delay:
+                time.sleep(self.server.config.token_delay)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._event({**base, "choices": [], "usage": completion["usage"]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+        self.server.count(self.path, 200)
+
+    def _event(self, payload: dict) -> None:
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+
+def chat_completion(request: dict) -> dict:
+    """Chat completion (zonder streaming) met usage, zoals de echte API"""
+    prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+    content = json.dumps(completion_content(prompt), ensure_ascii=False)
+    completion_tokens = len(content) // 4
+    prompt_tokens = len(prompt) // 4
+    return {
+        "id": f"chatcmpl-standin-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o-mini"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            # Zoals bij prompt caching: gecached in blokken van 128 boven 1024 tokens
+            "prompt_tokens_details": {
+                "cached_tokens": prompt_tokens // 128 * 128 if prompt_tokens >= 1024 else 0
+            },
+        },
+    }
+
+
+def form_field(body: bytes, name: str) -> Optional[str]:
+    """Een tekstveld uit een multipart formulier"""
+    match = re.search(rb'name="' + re.escape(name.encode()) + rb'"\r\n\r\n([^\r]*)', body)
+    return match.group(1).decode() if match else None
+
+
+def upload_bytes(body: bytes) -> bytes:
+    """Het bestand uit een multipart upload"""
+    boundary = body.split(b"\r\n", 1)[0]
+    for part in body.split(boundary):
+        head, _, content = part.partition(b"\r\n\r\n")
+        if b"filename=" in head:
+            return content[:-2]
+    return body
+
+
+def transcription_content(body: bytes, segment_seconds: float) -> dict:
+    """Whisper antwoord; bij verbose_json met genummerde segmenten over de geschatte duur"""
+    if form_field(body, "response_format") != "verbose_json":
+        return {"text": TRANSCRIPT}
+
+    duration = max(segment_seconds, len(upload_bytes(body)) / AUDIO_BYTES_PER_SECOND)
+    sentences = [sentence.strip() + "." for sentence in TRANSCRIPT.split(".") if sentence.strip()]
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + segment_seconds)
+        index = len(segments)
+        segments.append({
+            "id": index, "seek": 0, "start": round(start, 3), "end": round(end, 3),
+            "text": f" ({index}) {sentences[index % len(sentences)]}",
+            "tokens": [], "temperature": 0.0, "avg_logprob": -0.2,
+            "compression_ratio": 1.2, "no_speech_prob": 0.01,
+        })
+        start = end
+    return {
+        "task": "transcribe",
+        "language": "dutch",
+        "duration": round(duration, 3),
+        "text": "".join(segment["text"] for segment in segments).strip(),
+        "segments": segments,
+    }
+
+
+def completion_content(prompt: str) -> dict:
+    """Antwoord in het formaat dat de prompt vraagt (enkel of variant-modus)"""
+    levels = VARIANT_LEVELS.search(prompt)
+    platforms = VARIANT_PLATFORMS.search(prompt)
+    if not levels and not platforms:
+        return {"title": TITLE, "description": DESCRIPTION, "hashtags": HASHTAGS}
+    return {
+        "titles": [
+            {"clickbait_level": int(level), "title": f"{TITLE} ({level}/10)"}
+            for level in re.findall(r"\d+", levels.group(1) if levels else "")
+        ],
+        "descriptions": [
+            {"platform": platform.strip(), "description": f"{DESCRIPTION} ({platform.strip()})"}
+            for platform in (platforms.group(1).split(",") if platforms else [])
+        ],
+        "hashtags": HASHTAGS,
+    }
+
+
+class OpenAIStandInServer(ThreadingHTTPServer):
+    """Stand-in in een achtergrond thread; `url` is de OPENAI_BASE_URL"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0
+    ):
+        super().__init__((host, port), _Handler)
+        self.config = config or StandInConfig()
+        self.limiter = _Limiter()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        # (endpoint, status) -> aantal responses
+        self.stats: Dict[Tuple[str, int], int] = {}
+        # Batch API: bestand id -> {"meta", "data"}, batch id -> batch object
+        self.files: Dict[str, dict] = {}
+        self.batches: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def uniform(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def count(self, path: str, status: int) -> None:
+        endpoint = path.rsplit("/v1", 1)[-1]
+        with self._lock:
+            self.stats[(endpoint, status)] = self.stats.get((endpoint, status), 0) + 1
+
+    def responses(self, status: int) -> int:
+        """Aantal responses met deze status, over alle endpoints"""
+        with self._lock:
+            return sum(count for (_, code), count in self.stats.items() if code == status)
+
+    def add_file(self, data: bytes, filename: str = "batch.jsonl", purpose: str = "batch") -> dict:
+        meta = {
+            "id": f"file-standin-{uuid.uuid4().hex[:12]}",
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self.files[meta["id"]] = {"meta": meta, "data": data}
+        return meta
+
+    def create_batch(self, request: dict) -> dict:
+        """Start een batch; de regels worden in een achtergrond thread verwerkt"""
+        batch = {
+            "id": f"batch_standin_{uuid.uuid4().hex[:12]}",
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "validating",
+            "created_at": int(time.time()),
+            "metadata": request.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._run_batch, args=(batch["id"],), daemon=True).start()
+        return dict(batch)
+
+    def batch(self, batch_id: str) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.batches[batch_id]))
+
+    def cancel_batch(self, batch_id: str) -> Optional[dict]:
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch["status"] in ("validating", "in_progress"):
+                batch["status"] = "cancelling"
+                batch["cancelling_at"] = int(time.time())
+        return self.batch(batch_id)
+
+    def _run_batch(self, batch_id: str) -> None:
+        with self._lock:
+            batch = self.batches[batch_id]
+            data = self.files[batch["input_file_id"]]["data"]
+        lines = [json.loads(line) for line in data.decode().splitlines() if line.strip()]
+        with self._lock:
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+                batch["in_progress_at"] = int(time.time())
+            batch["request_counts"]["total"] = len(lines)
+        time.sleep(self.config.batch_latency)
+
+        outputs, errors = [], []
+        for line in lines:
+            if batch["status"] == "cancelling":
+                break
+            result = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line.get("custom_id"), "error": None}
+            request_id = f"req_{uuid.uuid4().hex[:12]}"
+            if line.get("url") != batch["endpoint"]:
+                result["response"] = {"status_code": 400, "request_id": request_id, "body": {
+                    "error": {"message": f"URL moet {batch['endpoint']} zijn", "type": "invalid_request_error"}
+                }}
+                errors.append(result)
+            elif self.chance(self.config.error_rate):
+                result["response"] = {"status_code": 500, "request_id": request_id, "body": {
+                    "error": {"message": "Stand-in server fout", "type": "server_error"}
+                }}
+                errors.append(result)
+            else:
+                result["response"] = {
+                    "status_code": 200, "request_id": request_id, "body": chat_completion(line.get("body", {}))
+                }
+                outputs.append(result)
+
+        def as_file(results: list) -> Optional[str]:
+            if not results:
+                return None
+            content = "".join(json.dumps(result) + "\n" for result in results).encode()
+            return self.add_file(content, f"{batch_id}_output.jsonl", "batch_output")["id"]
+
+        output_file_id, error_file_id = as_file(outputs), as_file(errors)
+        with self._lock:
+            now = int(time.time())
+            batch["status"] = "cancelled" if batch["status"] == "cancelling" else "completed"
+            batch[f"{batch['status']}_at"] = now
+            batch["output_file_id"] = output_file_id
+            batch["error_file_id"] = error_file_id
+            batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+
+    def start(self) -> "OpenAIStandInServer":
+        """Start in een achtergrond thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokale OpenAI stand-in voor load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconden per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra willekeurige latency")
+    parser.add_argument("--transcribe-latency-per-mb", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Pauze tussen stream chunks")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minuut per model")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens per minuut per model")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fractie willekeurige 429's")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fractie 500's")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--segment-seconds", type=float, default=4.0, help="Segmentlengte (verbose_json)")
+    parser.add_argument("--batch-latency", type=float, default=0.0, help="Verwerkingstijd per batch")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    options = {name: value for name, value in vars(args).items() if name not in ("host", "port")}
+    server = OpenAIStandInServer(StandInConfig(**options), args.host, args.port)
+    print(f"OpenAI stand-in op {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,251 @@
+"""
+Async pipeline voor Cryptoriez Shorts Helper
+
+Extractie, transcriptie en generatie zijn aparte stages met elk een eigen
+limiet op gelijktijdigheid. Over meerdere jobs heen overlappen de stages:
+terwijl clip N+1 wordt geëxtraheerd (ffmpeg als asyncio subprocess), wordt
+clip N getranscribeerd en voor clip N-1 de titel gegenereerd (AsyncOpenAI).
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+import shorts_core
+from audio_extraction import VideoInput, extract_audio_async
+from cache_config import digest_buffer, digest_file
+from logging_config import get_logger
+from media_pool import available_cpus
+from metrics import job_timings, record_cache, record_tokens, timed
+from openai_pool import AsyncPooledOpenAI, create_async_client
+from progress import ProgressCallback, emit
+from singleflight import AsyncSingleFlight
+from transcript_cache import transcript_cache
+from transcription import Transcript, transcribe_segments_async
+
+logger = get_logger(__name__)
+
+# Standaard één extractie per CPU die de container echt mag gebruiken
+EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "0")) or available_cpus()
+TRANSCRIBE_WORKERS = int(os.getenv("PIPELINE_TRANSCRIBE_WORKERS", "4"))
+GENERATE_WORKERS = int(os.getenv("PIPELINE_GENERATE_WORKERS", "4"))
+
+
+def get_async_client() -> AsyncPooledOpenAI:
+    """Async OpenAI client voor de pipeline (zelfde rate limits als de app)"""
+    return create_async_client(api_key=os.getenv("OPENAI_API_KEY"), base_url=shorts_core.OPENAI_BASE_URL)
+
+
+@dataclass
+class PipelineJob:
+    """Eén video door de pipeline, inclusief (tussen)resultaten"""
+
+    video: VideoInput
+    settings: dict = field(default_factory=dict)
+    name: str = ""
+    transcript: str = ""
+    from_cache: bool = False
+    title: str = ""
+    description: str = ""
+    hashtags: list = field(default_factory=list)
+    error: Optional[str] = None
+    video_digest: Optional[str] = None
+    audio_digest: Optional[str] = None
+    audio_path: Optional[Path] = None
+    usage: Optional[dict] = None
+
+    @property
+    def language_hint(self) -> str:
+        return "nl" if self.settings.get("language", "nl") == "nl" else "en"
+
+
+class AsyncPipeline:
+    """Begrensde, overlappende pipeline voor veel video's tegelijk"""
+
+    def __init__(
+        self,
+        client: Optional[AsyncPooledOpenAI] = None,
+        extract_workers: int = EXTRACT_WORKERS,
+        transcribe_workers: int = TRANSCRIBE_WORKERS,
+        generate_workers: int = GENERATE_WORKERS,
+        use_cache: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        transcribe_only: bool = False,
+    ):
+        self.client = client
+        self.use_cache = use_cache
+        # Zonder generate stage, bijvoorbeeld voor bulk generatie via de Batch API
+        self.transcribe_only = transcribe_only
+        # Krijgt per job een event bij de start van elke stage (data: {"job": naam})
+        self.on_progress = on_progress
+        self.extract_workers = max(1, extract_workers)
+        self.transcribe_workers = max(1, transcribe_workers)
+        self.generate_workers = max(1, generate_workers)
+        # Dubbele clips/instellingen in één batch: één API call per key
+        self.flight = AsyncSingleFlight()
+
+    def _get_client(self) -> AsyncPooledOpenAI:
+        if self.client is None:
+            self.client = get_async_client()
+        return self.client
+
+    # --------------------------
+    # Stages
+    # --------------------------
+    async def extract(self, job: PipelineJob) -> None:
+        """Fingerprint + cache lookup, anders audio extraheren"""
+        if isinstance(job.video, (str, Path)):
+            job.video_digest = await asyncio.to_thread(digest_file, job.video)
+        else:
+            job.video_digest = digest_buffer(job.video)
+
+        cached = transcript_cache.get_by_video(job.video_digest, job.language_hint)
+        record_cache("transcript", cached is not None)
+        if cached is not None:
+            job.transcript, job.from_cache = cached, True
+            return
+
+        job.audio_path = await extract_audio_async(job.video, engine=shorts_core.EXTRACTION_ENGINE)
+        job.audio_digest = await asyncio.to_thread(digest_file, job.audio_path)
+
+    async def _transcribe_file(self, path: Path, language_hint: str) -> Transcript:
+        data = await asyncio.to_thread(Path(path).read_bytes)
+        response = await self._get_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=(Path(path).name, data),
+            language=language_hint,
+            response_format="verbose_json",
+        )
+        return shorts_core.whisper_transcript(response)
+
+    async def _transcribe_audio(self, audio_path: Path, audio_digest: str, language_hint: str) -> str:
+        """Zoals app.transcribe_source: segment index, anders ingekort naar Whisper"""
+        samples = await asyncio.to_thread(shorts_core.audio_samples, audio_path)
+        text, hashes = await asyncio.to_thread(shorts_core.lookup_segments, samples, language_hint)
+        if text:
+            return text
+
+        trimmed = await asyncio.to_thread(shorts_core.trim_for_transcription, audio_path, None, samples)
+        try:
+            transcript = await transcribe_segments_async(
+                trimmed.path if trimmed else audio_path,
+                lambda path: self._transcribe_file(path, language_hint),
+            )
+        finally:
+            if trimmed:
+                trimmed.path.unlink(missing_ok=True)
+        await asyncio.to_thread(
+            shorts_core.index_transcript, audio_digest, language_hint, samples, hashes, transcript, trimmed
+        )
+        return transcript.text
+
+    async def transcribe(self, job: PipelineJob) -> None:
+        """Transcript cache, segment index of Whisper (ingekort, gechunkt bij lange audio)"""
+        if job.transcript:
+            return
+        try:
+            cached = transcript_cache.get_by_audio(job.audio_digest, job.language_hint)
+            record_cache("transcript", cached is not None)
+            if cached is not None:
+                job.transcript, job.from_cache = cached, True
+            else:
+                job.transcript = await self.flight.do(
+                    ("transcribe", job.audio_digest, job.language_hint),
+                    self._transcribe_audio,
+                    job.audio_path,
+                    job.audio_digest,
+                    job.language_hint,
+                )
+        finally:
+            job.audio_path.unlink(missing_ok=True)
+            job.audio_path = None
+
+        if not job.transcript:
+            raise ValueError("Transcript kon niet worden gegenereerd")
+        transcript_cache.store(
+            job.transcript,
+            job.language_hint,
+            video_digest=job.video_digest,
+            audio_digest=job.audio_digest,
+        )
+
+    async def generate(self, job: PipelineJob) -> None:
+        """Titel, beschrijving en hashtags via de generatie cache of het model"""
+        req = shorts_core.GenerationRequest(transcript=job.transcript, **job.settings)
+        cache_key = shorts_core.generation_cache_key(req)
+
+        result = shorts_core.get_generation_cache().get(cache_key) if self.use_cache else None
+        if self.use_cache:
+            record_cache("generation", result is not None)
+        if result is None:
+            result, job.usage = await self.flight.do(("generate", cache_key), self._complete, req)
+            shorts_core.get_generation_cache().set(cache_key, result)
+
+        job.title = result["title"]
+        job.description = result["description"]
+        job.hashtags = result["hashtags"]
+
+    async def _complete(self, req: "shorts_core.GenerationRequest") -> tuple[dict, Optional[dict]]:
+        response = await self._get_client().chat.completions.create(
+            **shorts_core.build_generation_params(req)
+        )
+        usage = shorts_core.usage_summary(response)
+        record_tokens(usage)
+        return shorts_core.parse_generation(response.choices[0].message.content), usage
+
+    # --------------------------
+    # Orchestration
+    # --------------------------
+    async def _process(self, job: PipelineJob, slots: dict) -> PipelineJob:
+        stages = [
+            ("extract", self.extract),
+            ("transcribe", self.transcribe),
+            ("generate", self.generate),
+        ]
+        if self.transcribe_only:
+            stages = stages[:-1]
+        # Elke task heeft een eigen context, dus ook een eigen timing breakdown
+        async with slots["in_flight"]:
+            with job_timings("pipeline", job.name):
+                for name, stage in stages:
+                    try:
+                        async with slots[name]:
+                            emit(self.on_progress, name, f"{job.name or 'job'}: {name}",
+                                 data={"job": job.name})
+                            with timed(name):
+                                await stage(job)
+                    except Exception as e:
+                        job.error = f"{name}: {e}"
+                        logger.error(f"Pipeline fout voor {job.name or 'job'} ({name}): {e}")
+                        if job.audio_path is not None:
+                            job.audio_path.unlink(missing_ok=True)
+                        break
+        return job
+
+    def _make_slots(self) -> dict:
+        return {
+            "extract": asyncio.Semaphore(self.extract_workers),
+            "transcribe": asyncio.Semaphore(self.transcribe_workers),
+            "generate": asyncio.Semaphore(self.generate_workers),
+            # Begrens het aantal geëxtraheerde bestanden dat op Whisper wacht
+            "in_flight": asyncio.Semaphore(
+                self.extract_workers + self.transcribe_workers + self.generate_workers
+            ),
+        }
+
+    async def run(self, jobs: Iterable[PipelineJob]) -> AsyncIterator[PipelineJob]:
+        """Verwerk alle jobs; levert ze op zodra ze klaar zijn"""
+        slots = self._make_slots()
+        tasks = [asyncio.create_task(self._process(job, slots)) for job in jobs]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def process(self, job: PipelineJob) -> PipelineJob:
+        """Verwerk één job"""
+        return await self._process(job, self._make_slots())
@@ -0,0 +1,48 @@
+"""
+Voortgang voor Cryptoriez Shorts Helper
+
+Stages (extractie, transcriptie, generatie) melden gestructureerde events
+aan een optionele callback: hoeveel bytes gelezen, seconden audio
+geëxtraheerd, chunks getranscribeerd of tokens ontvangen, plus eventuele
+deelresultaten (zoals een titel die al binnen is).
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """Eén voortgangsmelding van een stage"""
+
+    stage: str  # "extract", "transcribe" of "generate"
+    message: str
+    current: Optional[float] = None
+    total: Optional[float] = None
+    unit: str = ""
+    # Deelresultaat, bijvoorbeeld {"title": ...} tijdens het streamen
+    data: Optional[dict] = None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Voortgang tussen 0 en 1, als het totaal bekend is"""
+        if self.current is None or not self.total:
+            return None
+        return max(0.0, min(1.0, self.current / self.total))
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+def emit(callback: Optional[ProgressCallback], stage: str, message: str, **fields) -> None:
+    """Meld een event als er een callback is; fouten in de callback stoppen het werk niet"""
+    if callback is None:
+        return
+    try:
+        callback(ProgressEvent(stage, message, **fields))
+    except Exception as e:
+        logger.debug(f"Progress callback fout: {e}")
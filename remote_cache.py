@@ -0,0 +1,497 @@
+"""
+Gedeelde cache voor Cryptoriez Shorts Helper
+
+Remote cache backend die Redis-protocol (RESP) spreekt, zodat meerdere
+replica's transcripts en generaties delen. Bevat:
+- RespClient: minimale RESP client (geen extra dependency)
+- RemoteCacheManager: CacheManager interface met een lokale L1 ervoor en
+  single-flight via SET NX, zodat maar één replica een key berekent
+- StandInServer: kleine in-process RESP server voor tests en lokaal draaien
+
+Gebruik:
+    python remote_cache.py --port 6379    # lokale stand-in server
+"""
+
+import argparse
+import fnmatch
+import json
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from cache_config import CacheManager
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_URL = "redis://localhost:6379/0"
+SOCKET_TIMEOUT = 5.0
+# Single-flight: hoe lang een lock geldig blijft en hoe lang anderen wachten
+LOCK_SECONDS = 300
+LOCK_WAIT_SECONDS = 300
+LOCK_POLL_SECONDS = 0.2
+# Na een verbindingsfout de server een tijd overslaan (circuit breaker), oplopend tot het maximum
+REMOTE_RETRY_SECONDS = 5.0
+REMOTE_RETRY_MAX_SECONDS = 60.0
+# Lock alleen vrijgeven als hij nog van ons is, in één stap op de server
+RELEASE_LOCK_SCRIPT = (
+    "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+)
+
+
+class RespError(Exception):
+    """Foutantwoord van de server (-ERR ...)"""
+
+
+class RespClient:
+    """Minimale, thread-safe RESP client met één verbinding"""
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = SOCKET_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    @staticmethod
+    def encode(*args: Any) -> bytes:
+        """Commando als RESP array van bulk strings"""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Verbinding met cache server verbroken")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Onverwacht RESP antwoord: {line!r}")
+
+    def _call(self, *args: Any) -> Any:
+        self._sock.sendall(self.encode(*args))
+        return self._read_reply()
+
+    def execute(self, *args: Any) -> Any:
+        """Voer een commando uit; bij een verbroken verbinding één keer opnieuw"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    # Gemaksfuncties voor de gebruikte commando's
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ex: Optional[int] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+    ) -> bool:
+        args = ["SET", key, value]
+        if ex:
+            args += ["EX", ex]
+        if px:
+            args += ["PX", px]
+        if nx:
+            args.append("NX")
+        return self.execute(*args) is not None
+
+    def delete(self, *keys: str) -> int:
+        return self.execute("DEL", *keys) if keys else 0
+
+    def scan_iter(self, match: str, count: int = 500):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", match, "COUNT", count)
+            yield from keys
+            if cursor in (b"0", 0):
+                break
+
+
+class RemoteCacheManager:
+    """
+    Cache manager met een gedeelde RESP server als opslag
+
+    Reads gaan eerst naar de lokale L1 (een gewone CacheManager), dan naar
+    de server. Als de server onbereikbaar is werkt de cache als L1-only en
+    wordt de server een oplopende tijd overgeslagen, zodat een server die
+    niet antwoordt niet elke cache call een socket timeout kost.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        namespace: str = "cache",
+        max_age_hours: int = 24,
+        l1: Optional[CacheManager] = None,
+        client: Optional[RespClient] = None,
+    ):
+        self.url = url
+        self.namespace = namespace
+        self.max_age_hours = max_age_hours
+        self.l1 = l1
+        self.client = client or RespClient(url)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # Circuit breaker: tot dit moment (monotonic) geen remote calls
+        self._down_until = 0.0
+        self._retry_seconds = REMOTE_RETRY_SECONDS
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @property
+    def ttl_seconds(self) -> int:
+        return max(1, int(self.max_age_hours * 3600))
+
+    @property
+    def available(self) -> bool:
+        """False zolang de server na een verbindingsfout overgeslagen wordt"""
+        return time.monotonic() >= self._down_until
+
+    def _call(self, func: Callable[[], Any], default: Any = None) -> Any:
+        """Remote call via de circuit breaker; `default` als de server (recent) onbereikbaar is"""
+        if not self.available:
+            return default
+        try:
+            result = func()
+        except (OSError, ConnectionError) as e:
+            self.errors += 1
+            logger.warning(
+                f"Gedeelde cache niet bereikbaar ({self.url}), {self._retry_seconds:.0f}s alleen L1: {e}"
+            )
+            self._down_until = time.monotonic() + self._retry_seconds
+            self._retry_seconds = min(self._retry_seconds * 2, REMOTE_RETRY_MAX_SECONDS)
+            return default
+        except RespError as e:
+            self.errors += 1
+            logger.warning(f"Gedeelde cache fout ({self.url}): {e}")
+            return default
+        self._retry_seconds = REMOTE_RETRY_SECONDS
+        return result
+
+    def _remote(self, *args: Any) -> Any:
+        return self._call(lambda: self.client.execute(*args))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Haal data op uit L1 of de gedeelde cache"""
+        if self.l1 is not None:
+            data = self.l1.get(key)
+            if data is not None:
+                self.hits += 1
+                return data
+
+        raw = self._remote("GET", self._key(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if self.l1 is not None:
+            self.l1.set(key, data)
+        return data
+
+    def set(self, key: str, data: Any) -> None:
+        """Sla data op in L1 en de gedeelde cache (met TTL)"""
+        try:
+            payload = json.dumps(data)
+        except (TypeError, ValueError):
+            return
+        if self.l1 is not None:
+            self.l1.set(key, data)
+        self._remote("SET", self._key(key), payload, "EX", self.ttl_seconds)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Single-flight over replica's: wie de lock (SET NX) krijgt rekent, de
+        rest wacht op het resultaat. Geeft (waarde, uit_cache); None wordt
+        niet opgeslagen.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data, True
+
+        lock_key = self._key(f"lock:{key}")
+        token = uuid.uuid4().hex
+        owns_lock = False
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while True:
+            acquired = self._call(lambda: self.client.set(lock_key, token, ex=LOCK_SECONDS, nx=True))
+            if acquired is None:
+                # Zonder server geen coördinatie: zelf berekenen
+                break
+            if not acquired:
+                # Na een time-out herhaalt de client de SET NX; die vindt dan onze eigen lock
+                acquired = self._call(lambda: self.client.get(lock_key)) == token.encode()
+            if acquired:
+                owns_lock = True
+                break
+            time.sleep(LOCK_POLL_SECONDS)
+            data = self.get(key)
+            if data is not None:
+                return data, True
+            if time.monotonic() > deadline:
+                logger.warning(f"Wachten op {key} duurt te lang, zelf berekenen")
+                break
+
+        try:
+            data = compute()
+            if data is not None:
+                self.set(key, data)
+            return data, False
+        finally:
+            if owns_lock:
+                # Alleen onze eigen lock vrijgeven (verloopt anders vanzelf na LOCK_SECONDS)
+                self._remote("EVAL", RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    def clear(self) -> None:
+        """Leeg L1 en alle keys van deze namespace"""
+        if self.l1 is not None:
+            self.l1.clear()
+
+        def delete_namespace() -> None:
+            keys = list(self.client.scan_iter(self._key("*")))
+            for start in range(0, len(keys), 500):
+                self.client.delete(*keys[start:start + 500])
+
+        self._call(delete_namespace)
+
+    def clear_expired(self) -> None:
+        """De server laat keys zelf verlopen (EX); alleen L1 opruimen"""
+        if self.l1 is not None:
+            self.l1.clear_expired()
+
+    def stats(self) -> Dict[str, int]:
+        """Hits/misses van dit proces en het aantal gedeelde keys"""
+        entries = self._call(lambda: sum(1 for _ in self.client.scan_iter(self._key("*"))), default=0)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+# --------------------------
+# Stand-in server
+# --------------------------
+class _Store:
+    """Key/value opslag met verloop, voor de stand-in server"""
+
+    def __init__(self):
+        self.data: Dict[bytes, tuple[bytes, Optional[float]]] = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+
+def _reply(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_reply(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self) -> Optional[list]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline commando (bijv. via telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self) -> None:
+        while True:
+            try:
+                args = self._read_command()
+            except (OSError, ValueError):
+                return
+            if not args:
+                return
+            try:
+                result = self.server.dispatch(args)
+            except Exception as e:
+                result = RespError(f"ERR {e}")
+            self.wfile.write(_reply(result))
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    """
+    In-process RESP server met de commando's die RemoteCacheManager gebruikt
+    (PING, AUTH, SELECT, GET, SET [EX|PX] [NX], DEL, EXISTS, SCAN, DBSIZE, FLUSHDB,
+    en EVAL van RELEASE_LOCK_SCRIPT)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _RespHandler)
+        self.store = _Store()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "StandInServer":
+        """Start in een achtergrond thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def dispatch(self, args: list) -> Any:
+        command = args[0].upper().decode()
+        store = self.store
+        with store.lock:
+            if command in ("PING", "AUTH", "SELECT"):
+                return "PONG" if command == "PING" else "OK"
+            if command == "GET":
+                return store._alive(args[1])
+            if command == "SET":
+                return self._set(args[1], args[2], args[3:])
+            if command == "DEL":
+                return sum(store.data.pop(key, None) is not None for key in args[1:])
+            if command == "EXISTS":
+                return sum(store._alive(key) is not None for key in args[1:])
+            if command == "SCAN":
+                options = {args[i].upper(): args[i + 1] for i in range(2, len(args) - 1, 2)}
+                pattern = options.get(b"MATCH", b"*").decode()
+                keys = [
+                    key for key in list(store.data)
+                    if store._alive(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)
+                ]
+                return [b"0", keys]
+            if command == "DBSIZE":
+                return sum(store._alive(key) is not None for key in list(store.data))
+            if command == "FLUSHDB":
+                store.data.clear()
+                return "OK"
+            if command == "EVAL" and args[1].decode() == RELEASE_LOCK_SCRIPT:
+                key, token = args[3], args[4]
+                if store._alive(key) != token:
+                    return 0
+                del store.data[key]
+                return 1
+        return RespError(f"ERR unknown command '{command}'")
+
+    def _set(self, key: bytes, value: bytes, options: list) -> Any:
+        expires_at = None
+        nx = xx = False
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option in (b"EX", b"PX"):
+                seconds = int(options[i + 1]) / (1 if option == b"EX" else 1000)
+                expires_at = time.monotonic() + seconds
+                i += 1
+            nx = nx or option == b"NX"
+            xx = xx or option == b"XX"
+            i += 1
+
+        exists = self.store._alive(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.store.data[key] = (value, expires_at)
+        return "OK"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokale RESP stand-in voor de gedeelde cache")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port)
+    print(f"Stand-in cache server op {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,261 @@
+"""
+Segment index voor Cryptoriez Shorts Helper
+
+Shorts worden meestal uit een handvol lange livestreams geknipt. Van elke
+getranscribeerde audio worden de Whisper segmenten (met tijden) en een audio
+fingerprint in SQLite opgeslagen. Valt de audio van een nieuwe clip binnen een
+al getranscribeerde bron, dan wordt het transcript uit de segmenten van dat
+stuk samengesteld en is er geen Whisper call nodig.
+
+Fingerprint: per frame 16 bits uit het teken van het energieverschil tussen
+naburige frequentiebanden, vergeleken met het vorige frame. Dat overleeft
+hercodering en volumeverschillen. Een clip wordt gevonden door per gedeelde
+hash de tijdsverschuiving te tellen (offset voting); de winnende verschuiving
+moet bovendien over (vrijwel) de hele clip terugkomen.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from audio_extraction import SAMPLE_RATE
+from transcription import Segment
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SEGMENT_INDEX = os.getenv("SEGMENT_INDEX", "1") == "1"
+SEGMENT_INDEX_PATH = os.getenv("SEGMENT_INDEX_PATH", "cache/segments/segments.sqlite3")
+SEGMENT_INDEX_HOURS = int(os.getenv("SEGMENT_INDEX_HOURS", str(24 * 7)))
+BUSY_TIMEOUT_SECONDS = 10
+
+# 128 ms frames om de 16 ms (bij 16 kHz); 17 banden tussen 300 en 3000 Hz -> 16 bits
+FRAME_SAMPLES = 2048
+HOP_SAMPLES = 256
+BAND_EDGES_HZ = (300.0, 3000.0)
+BANDS = 17
+FFT_BLOCK_FRAMES = 2048
+# Stille frames geven geen bruikbare hash (alle banden even leeg)
+SILENT_DB = -50.0
+
+# Match: genoeg stemmen op één verschuiving, verspreid over de hele clip
+MIN_VOTES = 20
+MIN_VOTE_RATIO = 0.05
+COVERAGE_SECONDS = 2.0
+MIN_COVERAGE = 0.8
+# Marge (seconden) waarmee een clip buiten de bekende bron mag vallen
+EDGE_TOLERANCE = 0.5
+CANDIDATES = 20
+
+HOP_SECONDS = HOP_SAMPLES / SAMPLE_RATE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL,
+    language TEXT NOT NULL,
+    duration REAL NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (digest, language)
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    source_id INTEGER NOT NULL REFERENCES sources (id) ON DELETE CASCADE,
+    frame INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+CREATE INDEX IF NOT EXISTS hashes_source ON hashes (source_id);
+CREATE TABLE IF NOT EXISTS segments (
+    source_id INTEGER NOT NULL REFERENCES sources (id) ON DELETE CASCADE,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_source ON segments (source_id, start);
+"""
+
+
+def fingerprint(samples: "np.ndarray", sample_rate: int = SAMPLE_RATE) -> "np.ndarray":
+    """16-bit hash per frame (int64, -1 voor stille frames)"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    if len(samples) < FRAME_SAMPLES + HOP_SAMPLES:
+        return np.zeros(0, dtype=np.int64)
+    frames = sliding_window_view(samples, FRAME_SAMPLES)[::HOP_SAMPLES]
+    count = len(frames)
+
+    freqs = np.fft.rfftfreq(FRAME_SAMPLES, 1 / sample_rate)
+    edges = np.geomspace(*BAND_EDGES_HZ, BANDS + 1)
+    # (bins, banden) matrix: energie per band in één matrixvermenigvuldiging
+    bands = ((freqs[:, None] >= edges[None, :-1]) & (freqs[:, None] < edges[None, 1:])).astype(np.float32)
+    window = np.hanning(FRAME_SAMPLES).astype(np.float32)
+    scale = 2.0 / (FRAME_SAMPLES * np.sum(window ** 2))
+
+    energy = np.empty((count, BANDS), dtype=np.float32)
+    for offset in range(0, count, FFT_BLOCK_FRAMES):
+        block = frames[offset:offset + FFT_BLOCK_FRAMES] * window
+        energy[offset:offset + len(block)] = (np.abs(np.fft.rfft(block, axis=1)) ** 2) @ bands
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    hashes = np.concatenate(([-1], bits.astype(np.int64) @ (1 << np.arange(BANDS - 1, dtype=np.int64))))
+
+    loudness = 10 * np.log10(energy.sum(axis=1) * scale + 1e-10)
+    hashes[loudness < SILENT_DB] = -1
+    return hashes
+
+
+@dataclass(frozen=True)
+class SourceMatch:
+    """Een clip gevonden in een eerder getranscribeerde bron"""
+
+    source_id: int
+    offset: float  # start van de clip in de bron, in seconden
+    votes: int
+    coverage: float
+
+
+class SegmentIndex:
+    """Fingerprints en Whisper segmenten van getranscribeerde audio, in SQLite"""
+
+    def __init__(self, db_path: str = SEGMENT_INDEX_PATH, max_age_hours: int = SEGMENT_INDEX_HOURS):
+        self.db_path = Path(db_path)
+        self.max_age_hours = max_age_hours
+        # sqlite3 connecties mogen niet tussen threads gedeeld worden
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Pas bij het eerste gebruik: het bestand hoeft bij het starten nog niet te bestaan
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, frame INTEGER)")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """Transactie; alleen-lezen (plus de temp tabel) zonder schrijflock"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def add(
+        self,
+        digest: str,
+        language: str,
+        hashes: "np.ndarray",
+        duration: float,
+        segments: list[Segment],
+    ) -> None:
+        """Registreer een getranscribeerde bron (vervangt een eerdere met dezelfde digest)"""
+        if not segments:
+            return
+        cutoff = time.time() - self.max_age_hours * 3600
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sources WHERE created_at < ?", (cutoff,))
+            conn.execute("DELETE FROM sources WHERE digest = ? AND language = ?", (digest, language))
+            source_id = conn.execute(
+                "INSERT INTO sources (digest, language, duration, created_at) VALUES (?, ?, ?, ?)",
+                (digest, language, duration, time.time()),
+            ).lastrowid
+            frames = [(int(h), source_id, i) for i, h in enumerate(hashes.tolist()) if h >= 0]
+            conn.executemany("INSERT INTO hashes (hash, source_id, frame) VALUES (?, ?, ?)", frames)
+            conn.executemany(
+                "INSERT INTO segments (source_id, start, end, text) VALUES (?, ?, ?, ?)",
+                [(source_id, s.start, s.end, s.text) for s in segments],
+            )
+
+    def match(self, hashes: "np.ndarray", language: str) -> Optional[SourceMatch]:
+        """Zoek de bron en verschuiving waar deze clip in past (None als er geen is)"""
+        query = [(int(h), i) for i, h in enumerate(hashes.tolist()) if h >= 0]
+        if len(query) < MIN_VOTES:
+            return None
+        with self._transaction(immediate=False) as conn:
+            conn.execute("DELETE FROM query")
+            conn.executemany("INSERT INTO query (hash, frame) VALUES (?, ?)", query)
+            rows = conn.execute(
+                "SELECT h.source_id, h.frame - q.frame AS delta, COUNT(*) AS votes "
+                "FROM query q JOIN hashes h ON h.hash = q.hash "
+                "JOIN sources s ON s.id = h.source_id AND s.language = ? "
+                "GROUP BY h.source_id, delta ORDER BY votes DESC LIMIT ?",
+                (language, CANDIDATES),
+            ).fetchall()
+            if not rows:
+                return None
+
+            # Een halve hop verschil tussen clip en bron verdeelt de stemmen over buren
+            votes = {(source, delta): count for source, delta, count in rows}
+            (source_id, delta), total = max(
+                (((source, delta), sum(votes.get((source, delta + d), 0) for d in (-1, 0, 1)))
+                 for source, delta in votes),
+                key=lambda item: item[1],
+            )
+            if total < max(MIN_VOTES, MIN_VOTE_RATIO * len(query)):
+                return None
+
+            matched = {
+                frame for (frame,) in conn.execute(
+                    "SELECT DISTINCT q.frame FROM query q JOIN hashes h ON h.hash = q.hash "
+                    "WHERE h.source_id = ? AND h.frame - q.frame BETWEEN ? AND ?",
+                    (source_id, delta - 1, delta + 1),
+                )
+            }
+            duration = conn.execute(
+                "SELECT duration FROM sources WHERE id = ?", (source_id,)
+            ).fetchone()[0]
+
+        bucket_frames = max(1, int(COVERAGE_SECONDS / HOP_SECONDS))
+        buckets = {frame // bucket_frames for _, frame in query}
+        coverage = len({frame // bucket_frames for frame in matched}) / len(buckets)
+        offset = delta * HOP_SECONDS
+        clip_seconds = len(hashes) * HOP_SECONDS
+        if coverage < MIN_COVERAGE:
+            return None
+        if offset < -EDGE_TOLERANCE or offset + clip_seconds > duration + EDGE_TOLERANCE:
+            return None
+        return SourceMatch(source_id, max(0.0, offset), total, coverage)
+
+    def transcript_for(self, match: SourceMatch, duration: float) -> Optional[str]:
+        """Tekst van de segmenten waarvan het midden binnen de clip valt"""
+        rows = self._connect().execute(
+            "SELECT text FROM segments WHERE source_id = ? AND (start + end) / 2 BETWEEN ? AND ? "
+            "ORDER BY start",
+            (match.source_id, match.offset, match.offset + duration),
+        ).fetchall()
+        text = " ".join(text.strip() for (text,) in rows if text.strip())
+        return text or None
+
+    def lookup(self, hashes: "np.ndarray", duration: float, language: str) -> Optional[str]:
+        """Transcript uit een bekende bron, of None"""
+        match = self.match(hashes, language)
+        return self.transcript_for(match, duration) if match else None
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        sources, seconds = conn.execute("SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM sources").fetchone()
+        return {"sources": sources, "source_seconds": seconds}
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sources")
+
+
+# Globale segment index
+segment_index = SegmentIndex()
@@ -0,0 +1,438 @@
+"""
+Gedeelde kern van Cryptoriez Shorts Helper (zonder UI)
+
+Generatie requests en prompts, de OpenAI client, de generatie cache en de
+transcriptie stappen rond Whisper (segment index, inkorten). app.py (de
+Streamlit UI), de async pipeline, batch.py en de bulk generatie importeren dit,
+zodat de CLI en benchmarks Streamlit niet hoeven te laden.
+"""
+
+import os
+import re
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+from audio_extraction import SAMPLE_RATE
+from cache_config import create_cache_manager, stable_hash
+from logging_config import get_logger
+from metrics import record_cache, record_tokens, timed
+from openai_pool import create_client
+from progress import ProgressCallback, emit
+from singleflight import SingleFlight, coalesce
+from segment_index import SEGMENT_INDEX, fingerprint, segment_index
+from speech_trim import TrimResult, decode_pcm, trim_audio
+from transcript_compaction import compact_transcript
+from transcription import Segment, Transcript
+
+# Load environment variables
+load_dotenv()
+# Leeg = de echte API; bijv. http://127.0.0.1:8089/v1 voor openai_standin.py
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+logger = get_logger(__name__)
+
+# --------------------------
+# Configuration & Constants
+# --------------------------
+PLATFORMS = ["YouTube Shorts", "Instagram Reels", "TikTok", "Alle"]
+DEFAULT_HASHTAGS = ["#crypto", "#bitcoin", "#altcoins", "#forex", "#trading", "#marktupdate", "#technischeanalyse"]
+EXTRACTION_ENGINE = os.getenv("EXTRACTION_ENGINE", "auto")
+GENERATION_MODEL = "gpt-4o-mini"
+GENERATION_TEMPERATURE = 0.7
+
+# --------------------------
+# Long-lived resources
+# --------------------------
+# Eén keer per proces, pas bij het eerste gebruik gemaakt. Streamlit voert
+# app.py bij elke interactie opnieuw uit, maar geïmporteerde modules blijven
+# staan: deze resources overleven dus ook reruns.
+@lru_cache(maxsize=None)
+def get_client():
+    """Shared OpenAI client (connection pool, rate limits per model, retries), created on first use"""
+    return create_client(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL)
+
+@lru_cache(maxsize=None)
+def get_generation_cache():
+    """Cache for generated titles/descriptions (stable keys), one per process"""
+    return create_cache_manager(
+        cache_dir=os.getenv("GENERATION_CACHE_DIR", "cache/generations"),
+        max_age_hours=int(os.getenv("GENERATION_CACHE_HOURS", "24"))
+    )
+
+@lru_cache(maxsize=None)
+def shared_flight(name: str) -> SingleFlight:
+    """Single-flight group shared by all sessions (and reruns) in this process"""
+    return SingleFlight()
+
+class GenerationRequest(BaseModel):
+    transcript: str
+    language: str = Field(default="nl")
+    topic_hint: Optional[str] = Field(default="Crypto/Forex marktupdate of trade breakdown")
+    clickbait_level: int = Field(ge=0, le=10, default=5)
+    allow_emojis: bool = True
+    include_hashtags: bool = True
+    platforms: list[str] = Field(default_factory=lambda: ["Alle"])
+    # Variant-modus: meerdere titels/beschrijvingen in één request
+    variant_levels: list[Annotated[int, Field(ge=0, le=10)]] = Field(default_factory=list)
+    variant_platforms: list[str] = Field(default_factory=list)
+    # Transcript compactie vóór het prompten (stopwoorden, herhalingen, budget)
+    compact: bool = False
+    token_budget: Optional[int] = Field(default=None, ge=100)
+    
+    @property
+    def is_variant(self) -> bool:
+        return bool(self.variant_levels or self.variant_platforms)
+    
+    def title_levels(self) -> list[int]:
+        """Clickbait levels to generate a title for (variant mode)"""
+        return list(dict.fromkeys(self.variant_levels)) or [self.clickbait_level]
+    
+    def description_platforms(self) -> list[str]:
+        """Platforms that each get their own description ('Alle' expands to all)"""
+        platforms = []
+        for platform in self.variant_platforms:
+            if platform == "Alle":
+                platforms.extend(p for p in PLATFORMS if p != "Alle")
+            else:
+                platforms.append(platform)
+        return list(dict.fromkeys(platforms)) or ["Alle"]
+
+SYSTEM_PROMPT = """Je bent een ervaren Nederlandstalige content-editor voor Cryptoriez (focus: trading, crypto & forex, marktbreakdowns, updates).
+
+Stijl:
+- Duidelijk, concreet, "no nonsense"
+- Geen overbodige vakjargon; leg kort uit voor niet-technische kijkers
+- Houd het geloofwaardig: prikkelende titels zijn oké, maar geen misleiding
+- Zet inhoud voorop; clickbait-intensiteit bepaalt scherpte/urgentie, niet de waarheid
+- Respecteer voorkeuren voor emoji's en hashtags
+
+Taken:
+1) Bedenk 1 sterke, platform-agnostische titel op basis van transcript + topic_hint
+2) Schrijf een beschrijving met:
+   - 2–5 kerninzichten of takeaways
+   - Korte context "wat betekent dit voor markt/risico/sentiment"
+   - Call-to-action (bv. volg voor meer breakdowns)
+3) Voeg optioneel hashtags toe (relevant, 5–10 max)
+
+Uitvoer in JSON met velden: title, description, hashtags (array).
+"""
+
+# Vaste schaal: staat vóór de instellingen zodat hij in de cachebare prefix valt
+CLICKBAIT_SCALE = """Schaal clickbait-intensiteit:
+- 0–2: informatief, neutraal
+- 3–5: prikkelend, concreet
+- 6–8: urgent, sterk hook
+- 9–10: zeer agressief (maar geloofwaardig, geen sensationalisme/garanties)"""
+
+def build_user_prompt(req: GenerationRequest) -> str:
+    """
+    User message with the stable part first (transcript, clickbait scale) and the
+    per-click settings last, so regenerations share a cacheable prompt prefix
+    """
+    emoji_rule = "Je mag emoji's gebruiken waar relevant." if req.allow_emojis else "Gebruik geen emoji's."
+    hashtag_rule = "Sluit af met 5–10 relevante hashtags." if req.include_hashtags else "Voeg géén hashtags toe."
+
+    return f"""Transcript (ruw, samenvatten & opschonen):
+\"\"\"{prompt_transcript(req)}\"\"\"
+
+{CLICKBAIT_SCALE}
+
+Instellingen voor deze generatie:
+Taal: {req.language}
+Platforms: {', '.join(req.platforms)}
+Topic hint: {req.topic_hint}
+{emoji_rule}
+{hashtag_rule}
+Clickbait-intensiteit: {req.clickbait_level} op 10.
+{build_variant_instructions(req)}"""
+
+def prompt_transcript(req: GenerationRequest) -> str:
+    """The transcript as it goes into the prompt (compacted when requested)"""
+    if not req.compact:
+        return req.transcript.strip()
+    return compact_transcript(req.transcript, req.language, req.token_budget).text
+
+def build_variant_instructions(req: GenerationRequest) -> str:
+    """Extra instructions for variant mode (empty for a single title)"""
+    if not req.is_variant:
+        return ""
+    levels = ", ".join(str(level) for level in req.title_levels())
+    platforms = ", ".join(req.description_platforms())
+    return f"""
+Variant-modus (vervangt het uitvoerformaat hierboven):
+- Geef voor elke clickbait-intensiteit in [{levels}] precies één titel, volgens dezelfde schaal.
+- Schrijf per platform een eigen beschrijving, afgestemd op dat platform: {platforms}.
+- Eén gedeelde lijst hashtags.
+Uitvoer in JSON met velden: titles (array van {{clickbait_level, title}}), descriptions (array van {{platform, description}}), hashtags (array).
+"""
+
+def whisper_transcript(response) -> Transcript:
+    """Text and segment timestamps of a (verbose_json) Whisper response"""
+    segments = [
+        Segment(float(segment.start), float(segment.end), segment.text.strip())
+        for segment in getattr(response, "segments", None) or []
+    ]
+    return Transcript(response.text, segments)
+
+def transcribe_file(audio_path: Path, language_hint: str = "nl") -> Transcript:
+    """Transcribe a single audio file (one Whisper request), with segment timestamps"""
+    with open(audio_path, "rb") as f:
+        response = get_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=f,
+            language=language_hint,
+            response_format="verbose_json"
+        )
+    return whisper_transcript(response)
+
+def audio_samples(audio_path: Path):
+    """Decoded PCM for trimming and fingerprinting (None when it can't be decoded)"""
+    try:
+        return decode_pcm(audio_path)
+    except Exception as e:
+        logger.warning(f"Audio decoderen mislukt: {e}")
+        return None
+
+def lookup_segments(samples, language_hint: str = "nl") -> tuple[Optional[str], object]:
+    """
+    Transcript assembled from the segment index when this audio is a region of
+    an already-transcribed source. Returns (transcript or None, fingerprint);
+    the fingerprint is needed again to index the audio after transcription.
+    """
+    if samples is None or not SEGMENT_INDEX:
+        return None, None
+    try:
+        with timed("segment_lookup"):
+            hashes = fingerprint(samples)
+            text = segment_index.lookup(hashes, len(samples) / SAMPLE_RATE, language_hint)
+    except Exception as e:
+        logger.warning(f"Segment index niet beschikbaar: {e}")
+        return None, None
+    record_cache("segments", text is not None)
+    return text, hashes
+
+def index_transcript(
+    audio_digest: str,
+    language_hint: str,
+    samples,
+    hashes,
+    transcript: Transcript,
+    trimmed: Optional[TrimResult] = None
+) -> None:
+    """Store the segments (in original audio time) so later clips of this source skip Whisper"""
+    if hashes is None or not transcript.segments:
+        return
+    segments = trimmed.time_map.segments_to_original(transcript.segments) if trimmed else transcript.segments
+    try:
+        segment_index.add(audio_digest, language_hint, hashes, len(samples) / SAMPLE_RATE, segments)
+    except Exception as e:
+        logger.warning(f"Segmenten niet opgeslagen: {e}")
+
+def trim_for_transcription(
+    audio_path: Path,
+    on_progress: Optional[ProgressCallback] = None,
+    samples=None
+) -> Optional[TrimResult]:
+    """
+    Drop non-speech (and optionally speed up) before Whisper, which bills per
+    second. Returns None when the original should be uploaded as is.
+    """
+    try:
+        with timed("trim", size=audio_path.stat().st_size):
+            return trim_audio(audio_path, samples=samples, on_progress=on_progress)
+    except Exception as e:
+        # Inkorten is een besparing, geen voorwaarde: dan het origineel
+        logger.warning(f"Audio inkorten overgeslagen: {e}")
+        return None
+
+def merge_hashtags(hashtags: list[str], extra: list[str]) -> list[str]:
+    """Combine generated and extra hashtags: '#'-prefixed, case-insensitive unique"""
+    all_hashtags = []
+    seen = set()
+    for h in (hashtags + extra):
+        if not h.startswith("#"):
+            h = "#" + h
+        if h.lower() not in seen:
+            all_hashtags.append(h)
+            seen.add(h.lower())
+    return all_hashtags
+
+def parse_hashtag_list(text: str) -> list[str]:
+    """Split a comma separated hashtag string"""
+    return [h.strip() for h in text.split(",") if h.strip()]
+
+def generation_cache_key(req: GenerationRequest) -> str:
+    """Stable cache key for a generation: prompt, model, temperature and request"""
+    return "generation_" + stable_hash(
+        SYSTEM_PROMPT,
+        GENERATION_MODEL,
+        GENERATION_TEMPERATURE,
+        req.model_dump(mode="json")
+    )
+
+def prompt_cache_key(req: GenerationRequest) -> str:
+    """Routing hint for provider prompt caching: same transcript, same cache key"""
+    return "shorts_" + stable_hash(SYSTEM_PROMPT, GENERATION_MODEL, prompt_transcript(req))[:32]
+
+def build_generation_params(req: GenerationRequest) -> dict:
+    """Chat completion parameters for a generation request (shared by sync and async clients)"""
+    return {
+        "model": GENERATION_MODEL,
+        "temperature": GENERATION_TEMPERATURE,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_prompt(req)}
+        ],
+        "response_format": {"type": "json_object"},
+        # Via extra_body zodat oudere SDK versies het veld gewoon doorsturen
+        "extra_body": {"prompt_cache_key": prompt_cache_key(req)}
+    }
+
+def usage_summary(response) -> Optional[dict]:
+    """Token usage of a chat completion, including provider-cached prompt tokens"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+def format_usage(usage: Optional[dict]) -> str:
+    """Short, human readable usage line for logs and the UI"""
+    if not usage:
+        return "Uit cache (geen API call)"
+    prompt = usage["prompt_tokens"]
+    cached = usage["cached_tokens"]
+    share = f" ({cached / prompt:.0%})" if prompt else ""
+    return f"Prompt tokens: {prompt}, waarvan gecached: {cached}{share} · output: {usage['completion_tokens']}"
+
+# Titel in een (nog onvolledig) JSON antwoord, zodra de string is afgesloten
+PARTIAL_TITLE = re.compile(r'"title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# Meld niet elk gestreamd token apart
+STREAM_EVENT_TOKENS = 8
+
+def partial_title(content: str) -> Optional[str]:
+    """The first complete "title" value in a partially streamed JSON answer"""
+    match = PARTIAL_TITLE.search(content)
+    if match is None:
+        return None
+    try:
+        return json.loads(f'"{match.group(1)}"').strip() or None
+    except ValueError:
+        return None
+
+def stream_completion(params: dict, on_progress: ProgressCallback) -> tuple[str, Optional[dict]]:
+    """Streaming chat completion: reports tokens and the title as soon as it is complete"""
+    stream = get_client().chat.completions.create(
+        **params,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    parts = []
+    title = None
+    usage = None
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            usage = usage_summary(chunk)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        parts.append(chunk.choices[0].delta.content)
+        tokens = len(parts)
+        
+        if title is None:
+            title = partial_title("".join(parts))
+            if title:
+                emit(on_progress, "generate", "Titel ontvangen, beschrijving volgt...",
+                     current=tokens, unit="tokens", data={"title": title})
+                continue
+        if tokens % STREAM_EVENT_TOKENS == 0:
+            emit(on_progress, "generate", f"{tokens} tokens ontvangen",
+                 current=tokens, unit="tokens", data={"title": title} if title else None)
+    return "".join(parts), usage
+
+def parse_generation(content: str) -> dict:
+    """Parse the JSON answer of the model into title, description and hashtags"""
+    data = json.loads(content)
+    return {
+        "title": data.get("title", "").strip(),
+        "description": data.get("description", "").strip(),
+        "hashtags": data.get("hashtags", [])
+    }
+
+def parse_variants(content: str, req: GenerationRequest) -> dict:
+    """Parse a variant-mode answer into titles per clickbait level and descriptions per platform"""
+    data = json.loads(content)
+    titles = {}
+    for item in data.get("titles", []):
+        try:
+            level = int(item.get("clickbait_level"))
+        except (TypeError, ValueError):
+            continue
+        titles.setdefault(level, str(item.get("title", "")).strip())
+    descriptions = {}
+    for item in data.get("descriptions", []):
+        platform = str(item.get("platform", "")).strip()
+        descriptions.setdefault(platform, str(item.get("description", "")).strip())
+    
+    # In de gevraagde volgorde; ontbrekende varianten blijven leeg
+    return {
+        "titles": [
+            {"clickbait_level": level, "title": titles.get(level, "")}
+            for level in req.title_levels()
+        ],
+        "descriptions": [
+            {"platform": platform, "description": descriptions.get(platform, "")}
+            for platform in req.description_platforms()
+        ],
+        "hashtags": data.get("hashtags", [])
+    }
+
+# Identieke generatie tegelijk aangevraagd: één chat completion voor allemaal
+@coalesce(
+    lambda req, use_cache=True, on_progress=None: (generation_cache_key(req), use_cache),
+    group=shared_flight("generate")
+)
+def request_generation(
+    req: GenerationRequest,
+    use_cache: bool = True,
+    on_progress: Optional[ProgressCallback] = None
+) -> dict:
+    """
+    One chat completion (or cache hit) for a request, parsed to a dict.
+    The "usage" key holds the token usage of the API call (None on a cache hit).
+    With on_progress the completion is streamed and the title reported early.
+    """
+    cache_key = generation_cache_key(req)
+    usage = None
+    
+    def call_model() -> dict:
+        nonlocal usage
+        params = build_generation_params(req)
+        with timed("generate"):
+            if on_progress is None:
+                response = get_client().chat.completions.create(**params)
+                content = response.choices[0].message.content
+                usage = usage_summary(response)
+            else:
+                content, usage = stream_completion(params, on_progress)
+        record_tokens(usage)
+        if usage:
+            logger.info(format_usage(usage))
+        return parse_variants(content, req) if req.is_variant else parse_generation(content)
+    
+    if use_cache:
+        # Bij een gedeelde cache doet maar één replica de call voor deze key
+        result, from_cache = get_generation_cache().get_or_compute(cache_key, call_model)
+        record_cache("generation", from_cache)
+    else:
+        # Ook bij een bypass wordt het nieuwe resultaat de cached versie
+        result = call_model()
+        get_generation_cache().set(cache_key, result)
+    return {**result, "usage": usage}
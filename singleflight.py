@@ -0,0 +1,96 @@
+"""
+Single-flight voor Cryptoriez Shorts Helper
+
+Gelijktijdige aanroepen met dezelfde key delen één uitvoering: de eerste
+aanroeper rekent, de rest wacht op dezelfde future en krijgt hetzelfde
+resultaat (of dezelfde exception). Zo levert dezelfde clip of dezelfde
+generatie-instelling binnen één proces maar één betaalde API call op.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """Coalescing voor threads (Streamlit sessies, thread pools)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        # Aantal aanroepen dat op een lopende call heeft meegelift
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Voer `func` uit, of wacht op de lopende uitvoering voor `key`"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Coalescing voor coroutines binnen één event loop"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(
+        self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        """Await `func`, of de lopende task voor `key`"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # shield: een geannuleerde wachter annuleert de gedeelde task niet
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+def coalesce(
+    key_func: Callable[..., Hashable], group: Optional[SingleFlight] = None
+) -> Callable:
+    """Decorator: gelijktijdige aanroepen met dezelfde key_func(*args) delen één uitvoering"""
+    def decorator(func: Callable) -> Callable:
+        flight = group or SingleFlight()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return flight.do(key_func(*args, **kwargs), func, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
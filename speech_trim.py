@@ -0,0 +1,282 @@
+"""
+Spraakdetectie en inkorten van audio voor Cryptoriez Shorts Helper
+
+Whisper rekent (en wacht) per seconde audio. Tussen extractie en transcriptie
+worden stukken zonder spraak (muziek-intro's, stiltes, B-roll) eruit geknipt
+met een gevectoriseerde energie-analyse per frame, en kan de rest optioneel
+versneld worden (ffmpeg atempo). Een TimeMap rekent tijden in de ingekorte
+audio terug naar het origineel.
+"""
+
+import bisect
+import os
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from audio_extraction import AUDIO_FORMATS, CHANNELS, SAMPLE_RATE, find_ffmpeg, make_output_path
+from error_handling import TranscriptionError
+from metrics import registry
+from progress import ProgressCallback, emit
+from transcription import Segment
+
+if TYPE_CHECKING:
+    import numpy as np
+
+TRIM_SILENCE = os.getenv("TRANSCRIBE_TRIM_SILENCE", "1") == "1"
+# 1.0 = niet versnellen; Whisper blijft tot ongeveer 1.5x goed verstaanbaar
+TEMPO = float(os.getenv("TRANSCRIBE_TEMPO", "1.0"))
+
+FRAME_SECONDS = 0.03
+FFT_BLOCK_FRAMES = 4096
+# Ruisvloer: het stilste aaneengesloten stuk (gemiddelde over NOISE_WINDOW_SECONDS),
+# maar nooit hoger dan NOISE_FLOOR_MAX_DB; zonder echte stilte telt dat absolute niveau
+NOISE_WINDOW_SECONDS = 0.5
+NOISE_FLOOR_MAX_DB = -50.0
+# Spraak begint zoveel dB boven de ruisvloer (nooit onder het absolute minimum) en
+# loopt door tot het niveau HYSTERESIS_DB onder die drempel zakt
+THRESHOLD_MARGIN_DB = 12.0
+MIN_THRESHOLD_DB = -50.0
+HYSTERESIS_DB = 6.0
+# Aandeel van de energie in de spraakband; filtert brom, rumble en sis
+SPEECH_BAND = (80.0, 4000.0)
+MIN_BAND_RATIO = 0.5
+# Pauzes tussen woorden/zinnen blijven, korte tikken tellen niet als spraak
+MIN_GAP_SECONDS = 0.5
+MIN_SPEECH_SECONDS = 0.2
+PADDING_SECONDS = 0.15
+# Korte stilte tussen samengevoegde stukken, zodat Whisper zinsgrenzen ziet
+JOIN_GAP_SECONDS = 0.2
+# Alleen inkorten als het echt iets scheelt
+MIN_SAVINGS = 0.05
+# Minder spraak dan dit aandeel van een clip is eerder een misser van de detectie
+MIN_KEEP_RATIO = 0.25
+
+AUDIO_SECONDS = registry.counter(
+    "shorts_audio_seconds_total", "Audio seconden vóór en na inkorten (original/uploaded)"
+)
+
+
+@dataclass(frozen=True)
+class Span:
+    """Een stuk spraak: start in de ingekorte audio (vóór tempo) en in het origineel"""
+
+    out_start: float
+    src_start: float
+    duration: float
+
+
+class TimeMap:
+    """Rekent tijden in de ingekorte (en versnelde) audio terug naar het origineel"""
+
+    def __init__(self, spans: list[Span], tempo: float = 1.0):
+        self.spans = spans
+        self.tempo = tempo
+        self._starts = [span.out_start for span in spans]
+
+    def to_original(self, seconds: float) -> float:
+        """Tijd in de upload -> tijd in het origineel (in een join-pauze: einde van het vorige stuk)"""
+        if not self.spans:
+            return seconds
+        position = max(0.0, seconds * self.tempo)
+        span = self.spans[max(0, bisect.bisect_right(self._starts, position) - 1)]
+        return span.src_start + min(max(position - span.out_start, 0.0), span.duration)
+
+    def segments_to_original(self, segments: list[Segment]) -> list[Segment]:
+        """Whisper segmenten van de upload met tijden in het origineel"""
+        return [
+            Segment(self.to_original(s.start), self.to_original(s.end), s.text) for s in segments
+        ]
+
+
+@dataclass
+class TrimResult:
+    """Ingekorte audio plus de weg terug naar de tijden van het origineel"""
+
+    path: Path
+    time_map: TimeMap
+    original_seconds: float
+    seconds: float
+
+
+def _run_ffmpeg(args: list, input: Optional[bytes] = None) -> subprocess.CompletedProcess:
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise TranscriptionError("FFmpeg niet beschikbaar voor het inkorten van audio")
+    return subprocess.run(
+        [ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", *args],
+        input=input,
+        capture_output=True,
+    )
+
+
+def decode_pcm(audio_path: Path, sample_rate: int = SAMPLE_RATE) -> "np.ndarray":
+    """Decodeer audio naar mono float32 samples in [-1, 1]"""
+    import numpy as np
+
+    result = _run_ffmpeg([
+        "-i", str(audio_path),
+        "-vn", "-ac", str(CHANNELS), "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ])
+    if result.returncode != 0:
+        raise TranscriptionError(f"Audio decoderen mislukt: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def detect_speech(
+    samples: "np.ndarray",
+    sample_rate: int = SAMPLE_RATE,
+    frame_seconds: float = FRAME_SECONDS,
+    min_gap: float = MIN_GAP_SECONDS,
+    min_speech: float = MIN_SPEECH_SECONDS,
+    padding: float = PADDING_SECONDS,
+) -> list[tuple[float, float]]:
+    """
+    Vind stukken spraak als (start, einde) in seconden.
+
+    Alle frames worden in één keer geanalyseerd: energie in de spraakband (dB)
+    tegen een drempel boven de ruisvloer, plus het aandeel van de totale
+    energie dat in die band valt. De ruisvloer komt uit het stilste
+    aaneengesloten stuk, zodat doorlopende spraak niet tegen zichzelf gemeten
+    wordt. Korte gaten worden gedicht, te korte stukken vallen weg en elk stuk
+    krijgt wat marge.
+    """
+    import numpy as np
+
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(samples) // frame
+    if count == 0:
+        return []
+    frames = samples[:count * frame].reshape(count, frame)
+
+    freqs = np.fft.rfftfreq(frame, 1 / sample_rate)
+    in_band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    window = np.hanning(frame).astype(np.float32)
+    # Eenzijdig spectrum -> gemiddeld kwadraat van de samples (Parseval)
+    scale = 2.0 / (frame * np.sum(window ** 2))
+    band_power = np.empty(count)
+    total_power = np.empty(count)
+    # FFT in blokken frames, zodat een uur audio niet in één keer in het geheugen hoeft
+    for offset in range(0, count, FFT_BLOCK_FRAMES):
+        power = np.abs(np.fft.rfft(frames[offset:offset + FFT_BLOCK_FRAMES] * window, axis=1)) ** 2
+        band_power[offset:offset + len(power)] = power[:, in_band].sum(axis=1) * scale
+        total_power[offset:offset + len(power)] = power.sum(axis=1) * scale
+
+    # Energie in de spraakband, zodat brom en rumble de ruisvloer niet optillen
+    energy_db = 10 * np.log10(band_power + 1e-10)
+    window_frames = min(count, max(1, int(NOISE_WINDOW_SECONDS / frame_seconds)))
+    sustained = np.convolve(band_power, np.ones(window_frames) / window_frames, mode="valid")
+    noise_floor = min(10 * np.log10(sustained.min() + 1e-10), NOISE_FLOOR_MAX_DB)
+    threshold = max(noise_floor + THRESHOLD_MARGIN_DB, MIN_THRESHOLD_DB)
+    in_speech_band = band_power / (total_power + 1e-10) >= MIN_BAND_RATIO
+
+    # Hysterese: een stuk boven de lage drempel telt mee als het ergens de hoge haalt
+    loud = (energy_db > threshold) & in_speech_band
+    voiced = (energy_db > threshold - HYSTERESIS_DB) & in_speech_band
+    run_ids = np.cumsum(np.diff(np.concatenate(([0], voiced.astype(np.int8)))) == 1) * voiced
+    speech = voiced & np.isin(run_ids, np.unique(run_ids[loud]))
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+
+    # Gaten korter dan min_gap dichten, daarna te korte stukken weglaten
+    keep_gap = (starts[1:] - ends[:-1]) * frame_seconds >= min_gap
+    starts = starts[np.concatenate(([True], keep_gap))]
+    ends = ends[np.concatenate((keep_gap, [True]))]
+    long_enough = (ends - starts) * frame_seconds >= min_speech
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    total = count * frame_seconds
+    regions: list[tuple[float, float]] = []
+    for start, end in zip(starts * frame_seconds, ends * frame_seconds):
+        start, end = max(0.0, start - padding), min(total, end + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((float(start), float(end)))
+    return regions
+
+
+def atempo_filter(tempo: float) -> Optional[str]:
+    """ffmpeg atempo keten (elke stap tussen 0.5 en 2.0)"""
+    if abs(tempo - 1.0) < 1e-3:
+        return None
+    steps = []
+    while tempo > 2.0:
+        steps.append(2.0)
+        tempo /= 2.0
+    while tempo < 0.5:
+        steps.append(0.5)
+        tempo /= 0.5
+    steps.append(tempo)
+    return ",".join(f"atempo={step:.4f}" for step in steps)
+
+
+def trim_audio(
+    audio_path: Path,
+    output_dir: Optional[Path] = None,
+    tempo: float = TEMPO,
+    drop_silence: bool = TRIM_SILENCE,
+    sample_rate: int = SAMPLE_RATE,
+    samples: Optional["np.ndarray"] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Optional[TrimResult]:
+    """
+    Knip alles zonder spraak weg (drop_silence) en versnel eventueel (tempo).
+
+    Geeft None als inkorten niets oplevert (vrijwel alles is spraak, of er is
+    geen spraak gevonden); dan gaat het origineel ongewijzigd naar Whisper.
+    Al gedecodeerde samples (zie decode_pcm) scheelen een tweede decode.
+    """
+    tempo_filter = atempo_filter(tempo)
+    if not drop_silence and tempo_filter is None:
+        return None
+    import numpy as np
+
+    emit(on_progress, "trim", "Stukken zonder spraak zoeken..." if drop_silence else "Audio versnellen...")
+    if samples is None:
+        samples = decode_pcm(Path(audio_path), sample_rate)
+    original = len(samples) / sample_rate
+    regions = detect_speech(samples, sample_rate) if drop_silence else [(0.0, original)]
+    speech = sum(end - start for start, end in regions)
+    if regions and speech < original * MIN_KEEP_RATIO:
+        # Onwaarschijnlijk weinig spraak: liever het hele origineel dan een kapot transcript
+        emit(on_progress, "trim", f"Maar {speech:.0f}s van {original:.0f}s spraak gevonden, niet inkorten")
+        regions, speech = [(0.0, original)], original
+    if not regions or (speech > original * (1 - MIN_SAVINGS) and tempo_filter is None):
+        AUDIO_SECONDS.inc(original, kind="original")
+        AUDIO_SECONDS.inc(original, kind="uploaded")
+        return None
+
+    gap = np.zeros(int(JOIN_GAP_SECONDS * sample_rate), dtype=np.float32)
+    parts, spans = [], []
+    out_start = 0.0
+    for start, end in regions:
+        if parts:
+            parts.append(gap)
+            out_start += JOIN_GAP_SECONDS
+        parts.append(samples[int(start * sample_rate):int(end * sample_rate)])
+        spans.append(Span(out_start, start, end - start))
+        out_start += end - start
+    pcm = (np.clip(np.concatenate(parts), -1.0, 1.0) * 32767).astype(np.int16)
+
+    suffix, codec_args = AUDIO_FORMATS["opus"]
+    out = make_output_path(suffix, output_dir)
+    result = _run_ffmpeg([
+        "-y", "-f", "s16le", "-ar", str(sample_rate), "-ac", str(CHANNELS), "-i", "pipe:0",
+        *(["-af", tempo_filter] if tempo_filter else []),
+        *codec_args,
+        str(out),
+    ], input=pcm.tobytes())
+    if result.returncode != 0:
+        out.unlink(missing_ok=True)
+        raise TranscriptionError(f"Ingekorte audio schrijven mislukt: {result.stderr.decode(errors='replace').strip()}")
+
+    seconds = len(pcm) / sample_rate / tempo
+    AUDIO_SECONDS.inc(original, kind="original")
+    AUDIO_SECONDS.inc(seconds, kind="uploaded")
+    emit(on_progress, "trim", f"Audio ingekort van {original:.0f}s naar {seconds:.0f}s")
+    return TrimResult(out, TimeMap(spans, tempo), original, seconds)
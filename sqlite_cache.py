@@ -0,0 +1,263 @@
+"""
+SQLite cache backend voor Cryptoriez Shorts Helper
+
+Alternatief voor de JSON-bestanden van CacheManager met dezelfde interface
+(get/set/clear/clear_expired/stats): één SQLite bestand in WAL modus. Writes
+zijn atomair (een transactie per set), meerdere sessies, processen en
+replica's op hetzelfde volume kunnen tegelijk lezen en schrijven, en de
+hit/miss/bytes tellers staan in de database zelf.
+
+Een get leest zonder schrijflock. De LRU tijd en de hit/miss tellers worden
+per proces verzameld en in één keer weggeschreven: bij een set, bij stats, of
+na ACCESS_FLUSH_SECONDS, en dan alleen als de schrijflock direct vrij is.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from cache_config import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES
+
+SQLITE_FILENAME = "cache.sqlite3"
+# Hoe lang een schrijver wacht op een lock van een ander proces
+BUSY_TIMEOUT_SECONDS = 10
+# Toegangstijden en tellers van reads hooguit zo lang (of zoveel keys) in het geheugen
+ACCESS_FLUSH_SECONDS = 5.0
+ACCESS_FLUSH_KEYS = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    written_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_written_at ON entries (written_at);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('bytes', 0);
+
+-- Totaal aantal bytes bijhouden zonder SUM() over de hele tabel
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE counters SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE counters SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE counters SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+
+class SQLiteCacheManager:
+    """Cache manager met één SQLite bestand als opslag"""
+
+    def __init__(
+        self,
+        cache_dir: str = "cache",
+        max_age_hours: int = 24,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        db_path: Optional[str] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) if db_path else self.cache_dir / SQLITE_FILENAME
+        self.max_age_hours = max_age_hours
+        self.max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        # sqlite3 connecties mogen niet tussen threads gedeeld worden
+        self._local = threading.local()
+        # Nog niet weggeschreven toegangstijden (key -> tijd) en hit/miss tellers
+        self._access_lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._counts: Counter = Counter()
+        self._flushed_at = time.monotonic()
+
+        # Idempotent; executescript draait buiten een eigen transactie
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Schrijftransactie; alles of niets (verzamelde toegangstijden gaan mee)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_access(conn)
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _record_access(self, key: Optional[str], counter: str) -> None:
+        with self._access_lock:
+            if key is not None:
+                self._accessed[key] = time.time()
+            self._counts[counter] += 1
+            due = (
+                len(self._accessed) >= ACCESS_FLUSH_KEYS
+                or time.monotonic() - self._flushed_at >= ACCESS_FLUSH_SECONDS
+            )
+        if due:
+            self._flush_access()
+
+    def _write_access(self, conn: sqlite3.Connection) -> None:
+        """Schrijf verzamelde toegangstijden en tellers weg binnen een lopende transactie"""
+        with self._access_lock:
+            accessed, self._accessed = self._accessed, {}
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        try:
+            conn.executemany(
+                "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(at, key) for key, at in accessed.items()],
+            )
+            conn.executemany(
+                "UPDATE counters SET value = value + ? WHERE name = ?",
+                [(value, name) for name, value in counts.items()],
+            )
+        except BaseException:
+            # Terugzetten, zodat een volgende poging ze alsnog meeneemt
+            with self._access_lock:
+                for key, at in accessed.items():
+                    self._accessed.setdefault(key, at)
+                self._counts.update(counts)
+            raise
+
+    def _flush_access(self) -> None:
+        """Wegschrijven vanuit een read: alleen als de schrijflock direct vrij is"""
+        conn = self._connect()
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            with self._transaction():
+                pass
+        except sqlite3.Error:
+            # Een ander proces schrijft: volgende keer
+            pass
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_SECONDS * 1000}")
+
+    def _cutoff(self) -> float:
+        return time.time() - self.max_age_hours * 3600
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Verwijder de minst recent gebruikte entries tot we binnen budget zijn"""
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            excess = self._counter(conn, "bytes") - self.max_bytes
+            if excess <= 0:
+                return
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if excess <= 0:
+                    break
+                victims.append((key,))
+                excess -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    @staticmethod
+    def _counter(conn: sqlite3.Connection, name: str) -> int:
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Haal data op uit cache (zonder schrijflock; verlopen entries ruimt clear_expired op)"""
+        try:
+            row = self._connect().execute(
+                "SELECT data, written_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < self._cutoff():
+                self._record_access(None, "misses")
+                return None
+            data = json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            return None
+        self._record_access(key, "hits")
+        return data
+
+    def set(self, key: str, data: Any) -> None:
+        """Sla data op in cache (atomair)"""
+        try:
+            payload = json.dumps(data)
+        except (TypeError, ValueError):
+            return
+        size = len(payload.encode("utf-8"))
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        now = time.time()
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO entries (key, data, size, written_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET data = excluded.data, size = excluded.size, "
+                    "written_at = excluded.written_at, accessed_at = excluded.accessed_at",
+                    (key, payload, size, now, now),
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            # Net als de bestand-backend: cache fouten breken de app niet
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> tuple[Any, bool]:
+        """Haal op of bereken en sla op; geeft (waarde, uit_cache). None wordt niet opgeslagen"""
+        data = self.get(key)
+        if data is not None:
+            return data, True
+        data = compute()
+        if data is not None:
+            self.set(key, data)
+        return data, False
+
+    def clear(self) -> None:
+        """Leeg alle cache (inclusief tellers)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+
+    def clear_expired(self) -> None:
+        """Verwijder verlopen entries (via de index op schrijftijd)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE written_at < ?", (self._cutoff(),))
+
+    def stats(self) -> Dict[str, int]:
+        """Entries, bytes en hits/misses over alle processen die dit bestand delen"""
+        # Eerst de verzamelde reads van dit proces wegschrijven
+        with self._transaction() as conn:
+            pass
+        counters = dict(conn.execute("SELECT name, value FROM counters"))
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": counters["bytes"],
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+        }
@@ -0,0 +1,111 @@
+"""
+Gedeelde fixtures en helpers voor de tests
+"""
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from audio_extraction import find_ffmpeg
+
+FFMPEG = find_ffmpeg()
+requires_ffmpeg = pytest.mark.skipif(FFMPEG is None, reason="ffmpeg niet beschikbaar")
+
+
+def make_video(
+    path: Path, with_audio: bool = True, duration: int = 2, faststart: bool = False
+) -> Path:
+    """Genereer een kleine synthetische video met ffmpeg"""
+    command = [
+        FFMPEG, "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={duration}",
+    ]
+    if with_audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}"]
+        command += ["-c:a", "aac", "-shortest"]
+    command += ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    if faststart:
+        command += ["-movflags", "+faststart"]
+    command.append(str(path))
+    subprocess.run(command, check=True)
+    return path
+
+
+def make_speech(seconds: float, seed: int = 0, sample_rate: int = 16000):
+    """Spraak-achtige samples: lettergrepen met steeds een andere toonhoogte (niet periodiek)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    syllable = sample_rate // 4
+    t = np.arange(syllable) / sample_rate
+    envelope = np.sin(np.pi * np.arange(syllable) / syllable) ** 0.5
+    parts = []
+    for _ in range(int(seconds * 4)):
+        pitch = rng.uniform(100, 220)
+        voice = sum(
+            np.sin(2 * np.pi * pitch * k * t + rng.uniform(0, 6)) * rng.uniform(0.2, 1) / k
+            for k in range(1, 15)
+        )
+        parts.append(0.1 * voice * envelope)
+    samples = np.concatenate(parts)
+    return (samples + rng.normal(0, 0.003, len(samples))).astype(np.float32)
+
+
+def write_wav(path: Path, samples, sample_rate: int = 16000) -> Path:
+    """Schrijf float samples in [-1, 1] als 16-bit mono WAV"""
+    import wave
+
+    import numpy as np
+
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return path
+
+
+class FakeAsyncOpenAI:
+    """Minimale async stand-in voor Whisper en chat completions"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.transcribe))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.complete))
+
+    async def transcribe(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(text="Bitcoin test de weerstand")
+
+    async def complete(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        content = '{"title": "BTC op weerstand", "description": "Uitleg", "hashtags": ["btc"]}'
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def fake_openai(monkeypatch, tmp_path):
+    """Fake async OpenAI client plus lege caches en segment index"""
+    import pipeline
+    import shorts_core
+    from cache_config import CacheManager
+    from segment_index import SegmentIndex
+    from transcript_cache import TranscriptCache
+
+    client = FakeAsyncOpenAI()
+    monkeypatch.setattr(pipeline, "get_async_client", lambda: client)
+    generation_cache = CacheManager(cache_dir=str(tmp_path / "gen"))
+    monkeypatch.setattr(shorts_core, "get_generation_cache", lambda: generation_cache)
+    monkeypatch.setattr(
+        pipeline, "transcript_cache", TranscriptCache(CacheManager(cache_dir=str(tmp_path / "tr")))
+    )
+    monkeypatch.setattr(shorts_core, "segment_index", SegmentIndex(str(tmp_path / "segments.sqlite3")))
+    return client
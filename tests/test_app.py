@@ -2,14 +2,74 @@
 Tests voor Cryptoriez Shorts Helper
 """
 
+import json
 import pytest
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 
 # Voeg project root toe aan Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app import GenerationRequest, build_user_prompt, SYSTEM_PROMPT
+import app
+import shorts_core
+from app import (
+    generate_title_description,
+    generate_variants,
+    generation_job,
+)
+from shorts_core import (
+    GenerationRequest,
+    build_generation_params,
+    build_user_prompt,
+    generation_cache_key,
+    SYSTEM_PROMPT,
+)
+from cache_config import CacheManager
+from conftest import make_video, requires_ffmpeg
+
+class FakeCompletions:
+    """Fake chat completions die het aantal calls telt"""
+    
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+        self.delay = 0.0
+    
+    def create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        usage = SimpleNamespace(
+            prompt_tokens=1200,
+            completion_tokens=80,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=1024)
+        )
+        if kwargs.get("stream"):
+            return self.stream(usage)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+    
+    def stream(self, usage):
+        """Stukjes van 4 tekens, met usage in de laatste chunk (zoals include_usage)"""
+        for start in range(0, len(self.content), 4):
+            delta = SimpleNamespace(content=self.content[start:start + 4])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+@pytest.fixture
+def fake_chat(monkeypatch, tmp_path):
+    """Vervang de OpenAI client en generatie cache"""
+    completions = FakeCompletions(
+        '{"title": "BTC breekt uit", "description": "Uitleg", "hashtags": ["#btc"]}'
+    )
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    generation_cache = CacheManager(cache_dir=str(tmp_path))
+    monkeypatch.setattr(shorts_core, "get_client", lambda: fake_client)
+    monkeypatch.setattr(shorts_core, "get_generation_cache", lambda: generation_cache)
+    return completions
 
 class TestGenerationRequest:
     """Tests voor GenerationRequest model"""
@@ -96,6 +156,32 @@ class TestPromptBuilding:
         
         assert "Voeg géén hashtags toe" in prompt
 
+    def test_stable_prefix_first(self):
+        """Test dat het transcript vóór de instellingen per klik staat"""
+        base = build_user_prompt(GenerationRequest(transcript="Lang transcript"))
+        other = build_user_prompt(GenerationRequest(
+            transcript="Lang transcript",
+            clickbait_level=9,
+            language="en",
+            allow_emojis=False,
+            topic_hint="Forex"
+        ))
+        
+        assert base.startswith("Transcript")
+        prefix = base[:base.index("Instellingen voor deze generatie")]
+        assert other.startswith(prefix)
+        assert "Lang transcript" in prefix
+    
+    def test_same_cache_key_per_transcript(self):
+        """Test dat de prompt cache key alleen van het transcript afhangt"""
+        first = build_generation_params(GenerationRequest(transcript="Test", clickbait_level=1))
+        second = build_generation_params(GenerationRequest(transcript="Test", clickbait_level=9))
+        third = build_generation_params(GenerationRequest(transcript="Ander"))
+        
+        assert first["extra_body"] == second["extra_body"]
+        assert first["extra_body"] != third["extra_body"]
+        assert first["messages"][0]["content"] == SYSTEM_PROMPT
+
 class TestSystemPrompt:
     """Tests voor system prompt"""
     
@@ -106,6 +192,208 @@ class TestSystemPrompt:
         assert "trading, crypto & forex" in SYSTEM_PROMPT
         assert "JSON" in SYSTEM_PROMPT
 
+class TestGenerationCache:
+    """Tests voor de generatie cache"""
+    
+    def test_key_is_stable(self):
+        """Test dat identieke requests dezelfde key geven"""
+        assert generation_cache_key(GenerationRequest(transcript="Test")) == \
+            generation_cache_key(GenerationRequest(transcript="Test"))
+    
+    def test_key_depends_on_settings(self):
+        """Test dat elke instelling meetelt in de key"""
+        base = generation_cache_key(GenerationRequest(transcript="Test"))
+        
+        assert generation_cache_key(GenerationRequest(transcript="Test", clickbait_level=9)) != base
+        assert generation_cache_key(GenerationRequest(transcript="Test", language="en")) != base
+    
+    def test_second_call_hits_cache(self, fake_chat):
+        """Test dat een identieke request geen API call doet"""
+        req = GenerationRequest(transcript="Test")
+        
+        first = generate_title_description(req)
+        second = generate_title_description(req)
+        
+        assert first == second == ("BTC breekt uit", "Uitleg", ["#btc"])
+        assert fake_chat.calls == 1
+    
+    def test_usage_reported(self, fake_chat):
+        """Test dat gecachte prompt tokens uit de API usage worden gerapporteerd"""
+        req = GenerationRequest(transcript="Test")
+        usage = {}
+        
+        generate_title_description(req, usage=usage)
+        cached = {}
+        generate_title_description(req, usage=cached)
+        
+        assert usage == {"prompt_tokens": 1200, "cached_tokens": 1024, "completion_tokens": 80}
+        assert "gecached: 1024 (85%)" in shorts_core.format_usage(usage)
+        assert cached == {}
+    
+    def test_concurrent_requests_coalesced(self, fake_chat):
+        """Test dat gelijktijdige identieke requests één API call doen"""
+        fake_chat.delay = 0.2
+        req = GenerationRequest(transcript="Tegelijk")
+        
+        with ThreadPoolExecutor(3) as pool:
+            results = list(pool.map(lambda _: generate_title_description(req), range(3)))
+        
+        assert results == [("BTC breekt uit", "Uitleg", ["#btc"])] * 3
+        assert fake_chat.calls == 1
+    
+    def test_generation_job(self, fake_chat):
+        """Test de achtergrond job voor één titel (met voortgangsmelding)"""
+        messages = []
+        
+        partials = []
+        
+        def report(message, progress=None, partial=None):
+            messages.append(message)
+            if partial:
+                partials.append(partial)
+        
+        result = generation_job(report, GenerationRequest(transcript="Test"))
+        
+        assert result["title"] == "BTC breekt uit"
+        assert messages[0] == "Genereren..."
+        assert partials[0] == {"title": "BTC breekt uit"}
+    
+    def test_streaming_reports_title_early(self, fake_chat):
+        """Test dat de titel gemeld wordt voordat het antwoord compleet is"""
+        events = []
+        usage = {}
+        
+        result = generate_title_description(
+            GenerationRequest(transcript="Stream"), usage=usage, on_progress=events.append
+        )
+        
+        titles = [event for event in events if event.data and event.data.get("title")]
+        assert result == ("BTC breekt uit", "Uitleg", ["#btc"])
+        assert titles[0].data == {"title": "BTC breekt uit"}
+        assert titles[0].current < len(fake_chat.content) / 4
+        assert usage["cached_tokens"] == 1024
+    
+    def test_partial_title(self):
+        """Test het uitlezen van de titel uit een onvolledig JSON antwoord"""
+        assert shorts_core.partial_title('{"title": "Half') is None
+        assert shorts_core.partial_title('{"title": "BTC \\"nu\\"", "desc') == 'BTC "nu"'
+        assert shorts_core.partial_title('{"titles": [{"clickbait_level": 2, "title": "Rustig"}') == "Rustig"
+    
+    def test_bypass_cache(self, fake_chat):
+        """Test dat opnieuw genereren de cache overslaat"""
+        req = GenerationRequest(transcript="Test")
+        
+        generate_title_description(req)
+        generate_title_description(req, use_cache=False)
+        
+        assert fake_chat.calls == 2
+
+class TestSubmitTranscription:
+    """Tests voor backpressure bij het indienen van transcripties"""
+
+    def test_rejected_when_extraction_queue_full(self, tmp_path, monkeypatch):
+        """Test dat de app geen transcriptie meer inplant dan de media pool kan draaien en laten wachten"""
+        import job_queue
+        from media_pool import MediaPool
+
+        monkeypatch.setattr(job_queue, "JOB_STATE_DIR", str(tmp_path))
+        monkeypatch.setattr(app, "media_pool", MediaPool(workers=1, max_queue=1))
+        release = threading.Event()
+        monkeypatch.setattr(app, "transcription_job", lambda report, video, language_hint: release.wait(5))
+        app.get_job_queue.clear()
+        try:
+            accepted = [app.submit_transcription(b"video") for _ in range(2)]
+            rejected = app.submit_transcription(b"video")
+        finally:
+            release.set()
+            app.get_job_queue().shutdown()
+            app.get_job_queue.clear()
+
+        assert all(accepted)
+        assert rejected is None
+
+class TestExtractAudio:
+    """Tests voor audio extractie vanuit de app"""
+
+    @requires_ffmpeg
+    def test_bytes_upload(self, tmp_path, monkeypatch):
+        """Test dat een upload als bytes (niet alleen memoryview) geëxtraheerd wordt"""
+        errors = []
+        monkeypatch.setattr(app, "report_error", errors.append)
+        video = make_video(tmp_path / "clip.mp4").read_bytes()
+
+        audio = app.extract_audio_from_video(video)
+
+        assert errors == []
+        assert audio is not None and audio.stat().st_size > 0
+        audio.unlink()
+
+class TestTranscribeAudio:
+    """Tests voor de foutafhandeling van transcribe_audio"""
+
+    def test_missing_file_reports_error(self, tmp_path, monkeypatch):
+        """Test dat een ontbrekend bestand een fout meldt en een leeg transcript geeft"""
+        errors = []
+        monkeypatch.setattr(app, "report_error", errors.append)
+
+        transcript = app.transcribe_audio(str(tmp_path / "weg.opus"))
+
+        assert transcript.text == ""
+        assert len(errors) == 1
+
+    def test_key_uses_known_digest(self, tmp_path):
+        """Test dat een meegegeven digest de key bepaalt zonder het bestand te lezen"""
+        key = app.transcription_key(str(tmp_path / "weg.opus"), "nl", audio_digest="abc")
+
+        assert key == ("transcribe", "abc", "nl")
+
+class TestVariants:
+    """Tests voor de variant-modus"""
+    
+    def test_variant_prompt(self):
+        """Test dat niveaus en platforms in de prompt staan"""
+        req = GenerationRequest(
+            transcript="Test",
+            variant_levels=[2, 8],
+            variant_platforms=["Alle"]
+        )
+        
+        prompt = build_user_prompt(req)
+        
+        assert "[2, 8]" in prompt
+        assert "YouTube Shorts, Instagram Reels, TikTok" in prompt
+        assert "Variant-modus" not in build_user_prompt(GenerationRequest(transcript="Test"))
+    
+    def test_variant_level_validation(self):
+        """Test dat variant niveaus binnen 0-10 moeten vallen"""
+        with pytest.raises(ValueError):
+            GenerationRequest(transcript="Test", variant_levels=[11])
+    
+    def test_single_round_trip(self, fake_chat):
+        """Test dat alle varianten uit één API call komen, in gevraagde volgorde"""
+        fake_chat.content = json.dumps({
+            "titles": [
+                {"clickbait_level": 8, "title": "NU kopen?!"},
+                {"clickbait_level": 2, "title": "Bitcoin update"}
+            ],
+            "descriptions": [{"platform": "TikTok", "description": "Kort"}],
+            "hashtags": ["#btc"]
+        })
+        req = GenerationRequest(
+            transcript="Test",
+            variant_levels=[2, 8],
+            variant_platforms=["TikTok", "YouTube Shorts"]
+        )
+        
+        result = generate_variants(req)
+        
+        assert fake_chat.calls == 1
+        assert [t["title"] for t in result["titles"]] == ["Bitcoin update", "NU kopen?!"]
+        assert result["descriptions"] == [
+            {"platform": "TikTok", "description": "Kort"},
+            {"platform": "YouTube Shorts", "description": ""}
+        ]
+
 if __name__ == "__main__":
     # Run tests
     pytest.main([__file__])
@@ -0,0 +1,148 @@
+"""
+Tests voor de audio extractie engines
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from audio_extraction import (
+    FFmpegEngine,
+    buffer_as_path,
+    extract_audio,
+    get_engine,
+    is_streamable,
+)
+from conftest import make_video, requires_ffmpeg
+from error_handling import VideoProcessingError
+
+
+class TestFFmpegEngine:
+    """Tests voor het ffmpeg commando"""
+
+    def test_transcode_command(self, tmp_path):
+        """Test dat er geen video wordt gedecodeerd en naar 16 kHz mono wordt omgezet"""
+        command = FFmpegEngine().build_command(
+            Path("in.mp4"), tmp_path / "out.ogg", "opus"
+        )
+
+        assert "-vn" in command
+        assert command[command.index("-ar") + 1] == "16000"
+        assert command[command.index("-ac") + 1] == "1"
+        assert "libopus" in command
+
+    def test_copy_command(self, tmp_path):
+        """Test stream copy zonder resampling"""
+        command = FFmpegEngine().build_command(
+            Path("in.mp4"), tmp_path / "out.m4a", "copy"
+        )
+
+        assert command[command.index("-c:a") + 1] == "copy"
+        assert "-ar" not in command
+
+    def test_pipe_command(self, tmp_path):
+        """Test dat een buffer via stdin wordt gelezen"""
+        command = FFmpegEngine().build_command(
+            memoryview(b"data"), tmp_path / "out.ogg", "opus"
+        )
+
+        assert command[command.index("-i") + 1] == "pipe:0"
+        assert "-nostdin" not in command
+
+    def test_unknown_engine(self):
+        """Test onbekende engine naam"""
+        with pytest.raises(ValueError):
+            get_engine("gstreamer")
+
+
+class TestBufferHandoff:
+    """Tests voor het doorgeven van uploads zonder kopie op disk"""
+
+    def test_non_mp4_is_streamable(self):
+        """Test dat niet-MP4 containers via een pipe mogen"""
+        assert is_streamable(memoryview(b"\x1aE\xdf\xa3" + b"\x00" * 16))
+
+    def test_mp4_atom_order(self):
+        """Test detectie van faststart (moov vóór mdat)"""
+        ftyp = b"\x00\x00\x00\x10ftypisom\x00\x00\x00\x00"
+        moov = b"\x00\x00\x00\x08moov"
+        mdat = b"\x00\x00\x00\x08mdat"
+
+        assert is_streamable(memoryview(ftyp + moov + mdat))
+        assert not is_streamable(memoryview(ftyp + mdat + moov))
+
+    def test_buffer_as_path(self):
+        """Test dat de buffer als leesbaar pad beschikbaar komt"""
+        with buffer_as_path(memoryview(b"cryptoriez")) as path:
+            assert path.read_bytes() == b"cryptoriez"
+
+
+@requires_ffmpeg
+class TestExtraction:
+    """Integratietests met een echte (synthetische) video"""
+
+    @pytest.mark.parametrize("audio_format,suffix", [
+        ("opus", ".ogg"),
+        ("flac", ".flac"),
+        ("wav", ".wav"),
+        ("copy", ".m4a"),
+    ])
+    def test_extract_formats(self, tmp_path, audio_format, suffix):
+        """Test extractie naar elk ondersteund formaat"""
+        video = make_video(tmp_path / "clip.mp4")
+
+        out = extract_audio(video, audio_format, engine="ffmpeg", output_dir=tmp_path)
+
+        assert out.suffix == suffix
+        assert out.stat().st_size > 0
+
+    def test_opus_smaller_than_wav(self, tmp_path):
+        """Test dat Opus output veel kleiner is dan PCM"""
+        video = make_video(tmp_path / "clip.mp4", duration=4)
+
+        opus = extract_audio(video, "opus", engine="ffmpeg", output_dir=tmp_path)
+        wav = extract_audio(video, "wav", engine="ffmpeg", output_dir=tmp_path)
+
+        assert opus.stat().st_size * 4 < wav.stat().st_size
+
+    def test_video_without_audio(self, tmp_path):
+        """Test video zonder audio track"""
+        video = make_video(tmp_path / "silent.mp4", with_audio=False)
+
+        with pytest.raises(VideoProcessingError):
+            extract_audio(video, engine="ffmpeg", output_dir=tmp_path)
+
+    @pytest.mark.parametrize("faststart", [True, False])
+    def test_extract_from_buffer(self, tmp_path, faststart):
+        """Test extractie vanuit een upload buffer (pipe of memfd)"""
+        video = make_video(tmp_path / "clip.mp4", faststart=faststart)
+        data = video.read_bytes()
+        video.unlink()
+
+        out = extract_audio(data, "opus", engine="ffmpeg", output_dir=tmp_path)
+
+        assert out.stat().st_size > 0
+        assert not list(tmp_path.glob("cryptoriez_input_*"))
+
+    def test_progress_events(self, tmp_path):
+        """Test voortgang: gelezen bytes (pipe) en geëxtraheerde seconden audio"""
+        video = make_video(tmp_path / "clip.mp4", duration=4, faststart=True)
+        data = video.read_bytes()
+        events = []
+
+        extract_audio(data, "opus", engine="ffmpeg", output_dir=tmp_path, on_progress=events.append)
+
+        read = [event for event in events if event.unit == "bytes"]
+        extracted = [event for event in events if event.unit == "s"]
+        assert read[-1].current == read[-1].total == len(data)
+        assert read[-1].fraction == 1.0
+        assert extracted and extracted[-1].current > 3
+
+    def test_missing_file(self, tmp_path):
+        """Test niet bestaand bestand"""
+        with pytest.raises(VideoProcessingError):
+            extract_audio(tmp_path / "bestaat_niet.mp4")
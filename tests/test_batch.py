@@ -0,0 +1,98 @@
+"""
+Tests voor de batch CLI
+"""
+
+import csv
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import batch
+import shorts_core
+from conftest import make_video, requires_ffmpeg
+from openai_pool import RateLimiter, create_client
+from openai_standin import OpenAIStandInServer, StandInConfig
+
+
+class TestCollectVideos:
+    """Tests voor het verzamelen van input bestanden"""
+
+    def test_directory_and_glob(self, tmp_path):
+        """Test mappen, globs en extensie filter"""
+        for name in ["a.mp4", "b.MOV", "c.txt"]:
+            (tmp_path / name).write_bytes(b"x")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "d.m4v").write_bytes(b"x")
+
+        assert [p.name for p in batch.collect_videos([str(tmp_path)])] == ["a.mp4", "b.MOV"]
+        assert len(batch.collect_videos([str(tmp_path)], recursive=True)) == 3
+        assert [p.name for p in batch.collect_videos([str(tmp_path / "*.mp4")])] == ["a.mp4"]
+
+
+@requires_ffmpeg
+class TestMain:
+    """Tests voor het controleren van de opties"""
+
+    def test_invalid_settings_before_processing(self, tmp_path, monkeypatch):
+        """Test dat ongeldige instellingen afgewezen worden voordat er iets verwerkt wordt"""
+        (tmp_path / "clip.mp4").write_bytes(b"x")
+        monkeypatch.setattr(batch, "run_batch", lambda *args, **kwargs: pytest.fail("verwerkt"))
+
+        code = batch.main([str(tmp_path), "-o", str(tmp_path / "out.jsonl"), "--compact", "--token-budget", "50"])
+
+        assert code == 1
+        assert not (tmp_path / "out.jsonl").exists()
+
+
+class TestRunBatch:
+    """End-to-end test met synthetische video's en een fake OpenAI client"""
+
+    @pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+    def test_batch_output(self, tmp_path, fake_openai, suffix):
+        """Test dat elke video een resultaatregel krijgt"""
+        videos = tmp_path / "videos"
+        videos.mkdir()
+        for i in range(3):
+            make_video(videos / f"clip{i}.mp4", duration=1)
+        output = tmp_path / f"out{suffix}"
+
+        code = batch.main([str(videos), "-o", str(output), "--workers", "2"])
+
+        assert code == 0
+        if suffix == ".jsonl":
+            rows = [json.loads(line) for line in output.read_text().splitlines()]
+            assert rows[0]["hashtags"][0] == "#btc"
+        else:
+            rows = list(csv.DictReader(output.open()))
+            assert rows[0]["hashtags"].startswith("#btc")
+        assert len(rows) == 3
+        assert {row["title"] for row in rows} == {"BTC op weerstand"}
+        assert not any(row["error"] for row in rows)
+
+    def test_bulk_output(self, tmp_path, fake_openai, monkeypatch):
+        """Test dat --bulk alle generaties in één batch indient en per video terugschrijft"""
+        server = OpenAIStandInServer(StandInConfig(seed=1)).start()
+        monkeypatch.setattr(shorts_core, "get_client", lambda: create_client("sk-test", server.url, limiter=RateLimiter({})))
+        videos = tmp_path / "videos"
+        videos.mkdir()
+        for i in range(3):
+            make_video(videos / f"clip{i}.mp4", duration=1)
+        output = tmp_path / "out.jsonl"
+
+        try:
+            code = batch.main([str(videos), "-o", str(output), "--bulk", "--poll-seconds", "0.02"])
+        finally:
+            server.stop()
+
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert code == 0
+        assert len(rows) == 3
+        assert all(row["title"] and not row["error"] for row in rows)
+        # Zelfde transcript en instellingen: één request in één batch
+        assert len(server.batches) == 1
+        assert server.responses(200) > 0
@@ -0,0 +1,96 @@
+"""
+Tests voor bulk generatie via de Batch API (tegen de lokale stand-in)
+"""
+
+import json
+
+import pytest
+
+import shorts_core
+from bulk_generation import batch_line, generate_bulk
+from openai_pool import RateLimiter, create_client
+from openai_standin import OpenAIStandInServer, StandInConfig
+
+
+@pytest.fixture
+def standin():
+    server = OpenAIStandInServer(StandInConfig(seed=1)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(standin, fake_openai):
+    """Sync client tegen de stand-in, met lege generatie cache (via fake_openai)"""
+    return create_client("sk-test", standin.url, limiter=RateLimiter({}))
+
+
+def input_lines(server) -> list[dict]:
+    """Alle regels van de ingediende batch bestanden"""
+    return [
+        json.loads(line)
+        for batch in server.batches.values()
+        for line in server.files[batch["input_file_id"]]["data"].decode().splitlines()
+    ]
+
+
+class TestBatchFile:
+    """Tests voor het invoerbestand"""
+
+    def test_batch_line(self):
+        """Test dat een regel dezelfde parameters heeft als een gewone call, met extra_body in de body"""
+        req = shorts_core.GenerationRequest(transcript="Bitcoin breekt uit")
+
+        line = batch_line("clip", req)
+
+        assert line["url"] == "/v1/chat/completions"
+        assert line["body"]["messages"] == shorts_core.build_generation_params(req)["messages"]
+        assert line["body"]["prompt_cache_key"] == shorts_core.prompt_cache_key(req)
+        assert "extra_body" not in line["body"]
+
+
+class TestGenerateBulk:
+    """Tests voor indienen, pollen en terugkoppelen naar de clips"""
+
+    def test_maps_results_back(self, standin, client):
+        """Test dat elke clip zijn eigen resultaat krijgt en dubbele requests één regel zijn"""
+        requests = {
+            "a.mp4": shorts_core.GenerationRequest(transcript="Bitcoin test de weerstand"),
+            "b.mp4": shorts_core.GenerationRequest(transcript="Ethereum zakt door de steun"),
+            "kopie.mp4": shorts_core.GenerationRequest(transcript="Bitcoin test de weerstand"),
+            "varianten.mp4": shorts_core.GenerationRequest(
+                transcript="Solana", variant_levels=[2, 8], variant_platforms=["TikTok"]
+            ),
+        }
+
+        results = generate_bulk(requests, client=client, poll_seconds=0.02)
+
+        assert set(results) == set(requests)
+        assert all(item.error is None and item.usage for item in results.values())
+        assert results["a.mp4"] is results["kopie.mp4"]
+        assert results["a.mp4"].result["title"]
+        assert [item["platform"] for item in results["varianten.mp4"].result["descriptions"]] == ["TikTok"]
+        assert len(standin.batches) == 1
+        assert len(input_lines(standin)) == 3
+
+    def test_cache_skips_batch(self, standin, client):
+        """Test dat een tweede run uit de generatie cache komt zonder nieuwe batch"""
+        requests = {"a.mp4": shorts_core.GenerationRequest(transcript="Bitcoin test de weerstand")}
+        first = generate_bulk(requests, client=client, poll_seconds=0.02)
+
+        second = generate_bulk(requests, client=client, poll_seconds=0.02)
+
+        assert second["a.mp4"].from_cache
+        assert second["a.mp4"].result == first["a.mp4"].result
+        assert len(standin.batches) == 1
+
+    def test_failed_requests(self, standin, client):
+        """Test dat mislukte regels een fout geven en niet gecached worden"""
+        standin.config.error_rate = 1.0
+        requests = {"a.mp4": shorts_core.GenerationRequest(transcript="Bitcoin test de weerstand")}
+
+        results = generate_bulk(requests, client=client, poll_seconds=0.02)
+
+        assert results["a.mp4"].result is None
+        assert results["a.mp4"].error == "Stand-in server fout"
+        assert shorts_core.get_generation_cache().get(shorts_core.generation_cache_key(requests["a.mp4"])) is None
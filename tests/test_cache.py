@@ -0,0 +1,225 @@
+"""
+Tests voor caching (cache_config en transcript cache)
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache_config import (
+    CacheManager,
+    create_cache_manager,
+    digest_buffer,
+    digest_file,
+    stable_hash,
+)
+from sqlite_cache import SQLiteCacheManager
+from transcript_cache import TranscriptCache
+
+
+class TestDigest:
+    """Tests voor de streamende fingerprints"""
+
+    def test_buffer_and_file_match(self, tmp_path):
+        """Test dat buffer- en bestand-hash gelijk zijn"""
+        data = b"cryptoriez" * 500_000
+        path = tmp_path / "video.mp4"
+        path.write_bytes(data)
+
+        expected = hashlib.sha256(data).hexdigest()
+        assert digest_buffer(memoryview(data), chunk_size=4096) == expected
+        assert digest_file(path, chunk_size=4096) == expected
+
+
+class TestStableHash:
+    """Tests voor stabiele cache keys"""
+
+    def test_stable_across_processes(self):
+        """Test dat de key niet van de hash-seed van het proces afhangt"""
+        expected = hashlib.sha256(b'[{"a": 1, "b": [2, 3]}]').hexdigest()
+
+        assert stable_hash({"b": [2, 3], "a": 1}) == expected
+
+    def test_different_input(self):
+        """Test dat verschillende input een andere key geeft"""
+        assert stable_hash("a", 1) != stable_hash("a", 2)
+
+
+class TestCacheManager:
+    """Tests voor de begrensde LRU cache"""
+
+    def test_lru_eviction_by_entries(self, tmp_path):
+        """Test dat de minst recent gebruikte entry eerst verdwijnt"""
+        cache = CacheManager(cache_dir=str(tmp_path), max_entries=2)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(list(tmp_path.glob("*.json"))) == 2
+
+    def test_eviction_by_bytes(self, tmp_path):
+        """Test dat het bytes budget wordt gerespecteerd"""
+        cache = CacheManager(cache_dir=str(tmp_path), max_bytes=3000)
+
+        for i in range(5):
+            cache.set(f"k{i}", "x" * 900)
+
+        assert cache.stats()["bytes"] <= 3000
+        assert cache.get("k0") is None
+        assert cache.get("k4") == "x" * 900
+        assert cache.stats()["bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+
+    def test_hot_tier_skips_disk(self, tmp_path):
+        """Test dat een recente hit uit het geheugen komt"""
+        cache = CacheManager(cache_dir=str(tmp_path))
+        cache.set("a", {"title": "BTC"})
+
+        (tmp_path / "a.json").write_text("kapot")
+
+        assert cache.get("a") == {"title": "BTC"}
+
+    def test_index_rebuilt_from_disk(self, tmp_path):
+        """Test dat een nieuwe instance bestaande entries via stat() oppikt"""
+        CacheManager(cache_dir=str(tmp_path)).set("a", "waarde")
+
+        cache = CacheManager(cache_dir=str(tmp_path), memory_entries=0)
+
+        assert cache.stats()["entries"] == 1
+        assert cache.get("a") == "waarde"
+
+    def test_expiry_uses_mtime(self, tmp_path):
+        """Test dat verlopen entries op basis van mtime worden opgeruimd"""
+        CacheManager(cache_dir=str(tmp_path)).set("oud", 1)
+        old = time.time() - 3 * 3600
+        os.utime(tmp_path / "oud.json", (old, old))
+
+        cache = CacheManager(cache_dir=str(tmp_path), max_age_hours=1)
+        cache.set("nieuw", 2)
+        cache.clear_expired()
+
+        assert not (tmp_path / "oud.json").exists()
+        assert cache.get("nieuw") == 2
+
+
+class TestSQLiteCacheManager:
+    """Tests voor de SQLite backend"""
+
+    def test_roundtrip_and_stats(self, tmp_path):
+        """Test get/set en de hit/miss/bytes tellers"""
+        cache = SQLiteCacheManager(cache_dir=str(tmp_path))
+
+        assert cache.get("a") is None
+        cache.set("a", {"title": "BTC"})
+        cache.set("a", {"title": "ETH"})
+
+        assert cache.get("a") == {"title": "ETH"}
+        stats = cache.stats()
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["bytes"] == len('{"title": "ETH"}')
+
+    def test_lru_and_expiry(self, tmp_path):
+        """Test LRU eviction en het opruimen van verlopen entries"""
+        cache = SQLiteCacheManager(cache_dir=str(tmp_path), max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+        cache.max_age_hours = 0
+        cache.clear_expired()
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["bytes"] == 0
+
+    def test_read_during_write_lock(self, tmp_path, monkeypatch):
+        """Test dat een read niet op de schrijflock van een ander proces wacht"""
+        import sqlite3
+
+        import sqlite_cache
+
+        monkeypatch.setattr(sqlite_cache, "ACCESS_FLUSH_SECONDS", 0)
+        cache = SQLiteCacheManager(cache_dir=str(tmp_path))
+        cache.set("a", 1)
+        writer = sqlite3.connect(cache.db_path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+
+        started = time.monotonic()
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert time.monotonic() - started < 1
+
+        writer.execute("ROLLBACK")
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_concurrent_processes(self, tmp_path):
+        """Test dat meerdere processen en threads tegelijk kunnen schrijven en lezen"""
+        root = Path(__file__).parent.parent
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[1]);"
+            "from sqlite_cache import SQLiteCacheManager;"
+            "c = SQLiteCacheManager(cache_dir=sys.argv[2]);"
+            "[c.set(f'{sys.argv[3]}_{i}', 'x' * 1000) for i in range(50)]"
+        )
+        workers = [
+            subprocess.Popen([sys.executable, "-c", script, str(root), str(tmp_path), f"p{n}"])
+            for n in range(3)
+        ]
+        cache = SQLiteCacheManager(cache_dir=str(tmp_path))
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda i: cache.set(f"t_{i}", i), range(50)))
+
+        assert all(worker.wait(timeout=30) == 0 for worker in workers)
+        assert cache.stats()["entries"] == 200
+        assert cache.get("p2_49") == "x" * 1000
+        assert cache.get("t_7") == 7
+
+    def test_factory_selects_backend(self, tmp_path):
+        """Test dat create_cache_manager de juiste backend kiest"""
+        assert isinstance(create_cache_manager(str(tmp_path), backend="sqlite"), SQLiteCacheManager)
+        assert isinstance(create_cache_manager(str(tmp_path), backend="file"), CacheManager)
+
+
+class TestTranscriptCache:
+    """Tests voor de transcript cache"""
+
+    def test_miss_then_hit(self, tmp_path):
+        """Test opslaan en ophalen via video en audio fingerprint"""
+        cache = TranscriptCache(CacheManager(cache_dir=str(tmp_path)))
+
+        assert cache.get_by_video("abc", "nl") is None
+
+        cache.store("Bitcoin breekt uit", "nl", video_digest="abc", audio_digest="def")
+
+        assert cache.get_by_video("abc", "nl") == "Bitcoin breekt uit"
+        assert cache.get_by_audio("def", "nl") == "Bitcoin breekt uit"
+
+    def test_language_is_part_of_key(self, tmp_path):
+        """Test dat de taal hint meetelt in de key"""
+        cache = TranscriptCache(CacheManager(cache_dir=str(tmp_path)))
+
+        cache.store("Bitcoin breaks out", "en", video_digest="abc")
+
+        assert cache.get_by_video("abc", "nl") is None
+
+    def test_empty_transcript_not_stored(self, tmp_path):
+        """Test dat een leeg transcript niet wordt gecachet"""
+        cache = TranscriptCache(CacheManager(cache_dir=str(tmp_path)))
+
+        cache.store("", "nl", video_digest="abc")
+
+        assert cache.get_by_video("abc", "nl") is None
@@ -0,0 +1,163 @@
+"""
+Tests voor de achtergrond job queue
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache_config import CacheManager
+from job_queue import DONE, FAILED, JobQueue, JobQueueFull
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    """Wacht tot een job klaar is"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+class TestJobQueue:
+    """Tests voor indienen, voortgang en bewaarde status"""
+
+    def test_result_and_progress(self, tmp_path):
+        """Test dat een job in de achtergrond draait en voortgang rapporteert"""
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)))
+        release = threading.Event()
+
+        def work(report, value):
+            report("Bezig...", 0.5)
+            release.wait()
+            return {"value": value * 2}
+
+        job_id = queue.submit("test", work, 21)
+        deadline = time.monotonic() + 5
+        while queue.get(job_id).message != "Bezig..." and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        running = queue.get(job_id)
+        assert (running.status, running.progress) == ("running", 0.5)
+
+        release.set()
+        job = wait_for(queue, job_id)
+        assert job.status == DONE
+        assert job.result == {"value": 42}
+
+    def test_partial_result_kept(self, tmp_path):
+        """Test dat een deelresultaat blijft staan bij latere voortgang zonder deelresultaat"""
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)))
+
+        def work(report):
+            report("Titel ontvangen", 0.3, {"title": "BTC breekt uit"})
+            report("16 tokens ontvangen", 0.6)
+            return {}
+
+        job = wait_for(queue, queue.submit("test", work))
+
+        assert job.partial == {"title": "BTC breekt uit"}
+        assert queue.store.get(f"job_{job.id}")["partial"] == {"title": "BTC breekt uit"}
+
+    def test_failure_recorded(self, tmp_path):
+        """Test dat een exception de job laat falen met foutmelding"""
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)))
+
+        def fail(report):
+            raise RuntimeError("Whisper onbereikbaar")
+
+        job = wait_for(queue, queue.submit("test", fail))
+
+        assert job.status == FAILED
+        assert job.error == "Whisper onbereikbaar"
+
+    def test_state_visible_to_other_process(self, tmp_path):
+        """Test dat de bewaarde status ook zonder het geheugen van de queue leesbaar is"""
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)))
+        job_id = queue.submit("test", lambda report: "klaar")
+        wait_for(queue, job_id)
+        queue.forget(job_id)
+
+        other = JobQueue(store=CacheManager(cache_dir=str(tmp_path)))
+
+        assert other.get(job_id).result == "klaar"
+        assert other.get("onbekend") is None
+
+    def test_finished_only_after_saved(self, tmp_path):
+        """Test dat een job pas afgerond lijkt als die status ook bewaard is"""
+        class SlowStore(CacheManager):
+            def set(self, key, data):
+                if data["status"] == DONE:
+                    time.sleep(0.2)
+                super().set(key, data)
+
+        store = SlowStore(cache_dir=str(tmp_path))
+        queue = JobQueue(store=store)
+        job_id = queue.submit("test", lambda report: "klaar")
+        wait_for(queue, job_id)
+
+        assert store.get(f"job_{job_id}")["status"] == DONE
+
+    def test_stale_job_marked_failed(self, tmp_path, monkeypatch):
+        """Test dat een job die nergens meer loopt als onderbroken geldt"""
+        store = CacheManager(cache_dir=str(tmp_path))
+        store.set("job_weg", {"id": "weg", "kind": "test", "status": "running", "updated_at": 0})
+
+        job = JobQueue(store=store).get("weg")
+
+        assert job.status == FAILED
+        assert "onderbroken" in job.error
+
+    def test_unpolled_jobs_evicted(self, tmp_path, monkeypatch):
+        """Test dat afgeronde jobs die niemand ophaalt niet in het geheugen blijven"""
+        import job_queue
+
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)), max_finished=2)
+        job_ids = [queue.submit("test", lambda report, i=i: i) for i in range(4)]
+        for job_id in job_ids:
+            wait_for(queue, job_id)
+
+        assert sum(queue.stats().values()) == 2
+        assert not queue._saved_at
+        # Uit het geheugen, maar nog steeds via de bewaarde status
+        assert queue.get(job_ids[0]).result == 0
+
+        monkeypatch.setattr(job_queue, "JOB_STATE_HOURS", 0)
+        queue.get(job_ids[-1])
+        assert sum(queue.stats().values()) == 0
+
+    def test_kinds_do_not_block_each_other(self, tmp_path):
+        """Test dat een generatie niet wacht op een volle rij transcripties"""
+        queue = JobQueue(max_workers=1, store=CacheManager(cache_dir=str(tmp_path)))
+        release = threading.Event()
+        transcriptions = [queue.submit("transcribe", lambda report: release.wait(5)) for _ in range(3)]
+
+        job = wait_for(queue, queue.submit("generate", lambda report: "titel"), timeout=1.0)
+
+        assert job.result == "titel"
+        assert all(not queue.get(job_id).finished for job_id in transcriptions)
+        release.set()
+        queue.shutdown()
+
+    def test_max_pending_per_kind(self, tmp_path):
+        """Test dat een soort met een limiet geweigerd wordt zodra die vol is, andere soorten niet"""
+        queue = JobQueue(store=CacheManager(cache_dir=str(tmp_path)), max_pending={"transcribe": 2})
+        release = threading.Event()
+        first = [queue.submit("transcribe", lambda report: release.wait(5)) for _ in range(2)]
+
+        with pytest.raises(JobQueueFull):
+            queue.submit("transcribe", lambda report: None)
+        queue.submit("generate", lambda report: None)
+
+        release.set()
+        for job_id in first:
+            wait_for(queue, job_id)
+        assert wait_for(queue, queue.submit("transcribe", lambda report: "weer ruimte")).result == "weer ruimte"
@@ -0,0 +1,111 @@
+"""
+Tests voor de media worker pool
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from media_pool import MediaPool, MediaPoolFull, available_cpus, cgroup_cpu_limit
+
+
+class TestCpuLimits:
+    """Tests voor het bepalen van het aantal bruikbare CPU's"""
+
+    def test_cgroup_v2_quota(self, tmp_path):
+        """Test dat een cgroup v2 quota wordt gelezen en naar boven afgerond"""
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) == 1.5
+        assert available_cpus(tmp_path) <= 2
+
+    def test_cgroup_v1_quota(self, tmp_path):
+        """Test de cgroup v1 bestanden"""
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("100000")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000")
+
+        assert available_cpus(tmp_path) == 1
+
+    def test_no_limit(self, tmp_path):
+        """Test dat 'max' of ontbrekende bestanden geen limiet betekenen"""
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) is None
+        assert available_cpus(tmp_path) >= 1
+
+
+class TestMediaPool:
+    """Tests voor begrenzing, wachtrij en backpressure"""
+
+    def test_concurrency_capped(self):
+        """Test dat nooit meer dan `workers` jobs tegelijk draaien"""
+        pool = MediaPool(workers=2, max_queue=10)
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def work():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        with ThreadPoolExecutor(6) as executor:
+            list(executor.map(lambda _: pool.run(work), range(6)))
+
+        assert max(peak) == 2
+        assert pool.stats()["running"] == 0
+
+    def test_queue_positions_and_backpressure(self):
+        """Test wachtrij posities en weigeren als de wachtrij vol is"""
+        pool = MediaPool(workers=1, max_queue=1)
+        release = threading.Event()
+        positions = []
+
+        with ThreadPoolExecutor(2) as executor:
+            running = executor.submit(pool.run, release.wait)
+            while pool.stats()["running"] == 0:
+                time.sleep(0.01)
+            queued = executor.submit(pool.run, lambda: "klaar", on_wait=positions.append)
+            while pool.stats()["waiting"] == 0:
+                time.sleep(0.01)
+
+            assert pool.is_full()
+            with pytest.raises(MediaPoolFull):
+                pool.run(lambda: None)
+
+            release.set()
+            running.result()
+            assert queued.result() == "klaar"
+
+        assert positions == [1]
+
+    def test_failing_on_wait_leaves_queue(self):
+        """Test dat een fout in on_wait het ticket uit de wachtrij haalt"""
+        pool = MediaPool(workers=1, max_queue=2)
+        release = threading.Event()
+
+        def fail(position):
+            raise RuntimeError("sessie weg")
+
+        with ThreadPoolExecutor(1) as executor:
+            running = executor.submit(pool.run, release.wait)
+            while pool.stats()["running"] == 0:
+                time.sleep(0.01)
+            with pytest.raises(RuntimeError):
+                pool.run(lambda: None, on_wait=fail)
+            release.set()
+            running.result()
+
+        assert pool.stats()["waiting"] == 0
+        assert pool.run(lambda: 42) == 42
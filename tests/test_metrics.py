@@ -0,0 +1,109 @@
+"""
+Tests voor de metrics en timing instrumentatie
+"""
+
+import logging
+import sys
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import metrics
+from metrics import Registry, job_timings, record_tokens, start_metrics_server, timed
+
+
+class TestRegistry:
+    """Tests voor counters, histogrammen en het Prometheus formaat"""
+
+    def test_counter_render(self):
+        """Test counters per label combinatie, met escaping"""
+        registry = Registry()
+        counter = registry.counter("test_total", "Test teller")
+
+        counter.inc(stage="extract")
+        counter.inc(2, stage="extract")
+        counter.inc(stage='a"b')
+
+        text = registry.render()
+        assert counter.value(stage="extract") == 3
+        assert "# TYPE test_total counter" in text
+        assert 'test_total{stage="extract"} 3' in text
+        assert 'test_total{stage="a\\"b"} 1' in text
+
+    def test_histogram_buckets(self):
+        """Test cumulatieve buckets, som en aantal"""
+        registry = Registry()
+        histogram = registry.histogram("test_seconds", "Test duur", buckets=(0.1, 1))
+
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, stage="x")
+
+        text = registry.render()
+        assert 'test_seconds_bucket{stage="x",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{stage="x",le="1"} 2' in text
+        assert 'test_seconds_bucket{stage="x",le="+Inf"} 3' in text
+        assert histogram.count(stage="x") == 3
+        assert histogram.sum(stage="x") == pytest.approx(5.55)
+
+
+class TestTiming:
+    """Tests voor stage timing en de breakdown per job"""
+
+    def test_job_breakdown(self, caplog):
+        """Test dat stages binnen een job opgeteld en gelogd worden"""
+        before = metrics.STAGE_SECONDS.count(stage="test_stage")
+
+        with caplog.at_level(logging.INFO, logger="metrics"):
+            with job_timings("test", "clip.mp4") as timings:
+                with timed("test_stage", size=100):
+                    pass
+                with timed("test_stage"):
+                    pass
+
+        assert metrics.STAGE_SECONDS.count(stage="test_stage") == before + 2
+        assert list(timings.stages) == ["test_stage"]
+        assert "test clip.mp4: test_stage" in caplog.text
+
+    def test_error_counted(self):
+        """Test dat een mislukte stage geteld wordt en de fout doorgaat"""
+        before = metrics.STAGE_ERRORS.value(stage="test_fail")
+
+        with pytest.raises(RuntimeError):
+            with timed("test_fail"):
+                raise RuntimeError("ffmpeg stuk")
+
+        assert metrics.STAGE_ERRORS.value(stage="test_fail") == before + 1
+
+    def test_tokens(self):
+        """Test het tellen van tokens uit de API usage"""
+        before = metrics.TOKENS.value(kind="cached")
+
+        record_tokens({"prompt_tokens": 1200, "cached_tokens": 1024, "completion_tokens": 80})
+        record_tokens(None)
+
+        assert metrics.TOKENS.value(kind="cached") == before + 1024
+
+
+class TestEndpoint:
+    """Tests voor het /metrics endpoint"""
+
+    def test_metrics_endpoint(self):
+        """Test dat /metrics de registry serveert en andere paden 404 geven"""
+        server = start_metrics_server(port=0, host="127.0.0.1")
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with timed("test_endpoint"):
+                pass
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+                body = response.read().decode()
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{base}/anders", timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'shorts_stage_seconds_count{stage="test_endpoint"} 1' in body
@@ -0,0 +1,162 @@
+"""
+Tests voor de gedeelde OpenAI client laag (rate limits en retries)
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import openai
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import openai_pool
+from openai_pool import (
+    ModelLimits,
+    RateLimiter,
+    TokenBucket,
+    create_async_client,
+    create_client,
+    parse_rate_limits,
+)
+from openai_standin import OpenAIStandInServer, StandInConfig
+
+MESSAGES = [{"role": "user", "content": "Test"}]
+
+
+@pytest.fixture
+def standin():
+    server = OpenAIStandInServer(StandInConfig(seed=3)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    """Korte backoff zonder server hint, zodat de tests snel blijven"""
+    monkeypatch.setattr(openai_pool, "RETRY_BASE_SECONDS", 0.01)
+
+
+class TestRateLimiter:
+    """Tests voor de token buckets"""
+
+    def test_parse_limits(self):
+        """Test het formaat van OPENAI_RATE_LIMITS"""
+        assert parse_rate_limits("whisper-1=50, gpt-4o-mini=500:200000,") == {
+            "whisper-1": ModelLimits(50, 0),
+            "gpt-4o-mini": ModelLimits(500, 200000),
+        }
+
+    def test_bucket_reservations(self):
+        """Test dat reserveringen na de burst in volgorde oplopend wachten"""
+        bucket = TokenBucket(per_minute=60, burst_seconds=2)
+
+        waits = [bucket.reserve() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(1.0, abs=0.05)
+        assert waits[3] == pytest.approx(2.0, abs=0.05)
+
+    def test_limits_per_model(self):
+        """Test dat elk model een eigen budget heeft en onbekende modellen vrij zijn"""
+        limiter = RateLimiter({"whisper-1": ModelLimits(rpm=60)}, burst_seconds=1)
+
+        assert limiter.reserve("whisper-1") == 0.0
+        assert limiter.reserve("whisper-1") > 0.5
+        assert limiter.reserve("gpt-4o-mini", tokens=10**6) == 0.0
+
+    def test_pause(self):
+        """Test dat een server hint alle aanroepers voor dat model pauzeert"""
+        limiter = RateLimiter({"gpt-4o-mini": ModelLimits(rpm=6000)})
+
+        limiter.pause("gpt-4o-mini", 2)
+
+        assert limiter.reserve("gpt-4o-mini") > 1.5
+
+
+class TestPooledClient:
+    """Tests tegen de OpenAI stand-in"""
+
+    def test_throttles_instead_of_429(self, standin):
+        """Test dat de eigen limiter wacht, zodat de server geen 429 hoeft te geven"""
+        limiter = RateLimiter({"gpt-4o-mini": ModelLimits(rpm=600)}, burst_seconds=0.1)
+        client = create_client("sk-test", standin.url, limiter=limiter)
+
+        started = time.perf_counter()
+        for _ in range(6):
+            client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+        assert time.perf_counter() - started >= 0.45
+        assert standin.responses(429) == 0
+
+    def test_retries_rate_limits(self, standin):
+        """Test retries op 429's met de Retry-After van de server"""
+        standin.config.rate_limit_rate = 0.5
+        standin.config.retry_after = 0.05
+        client = create_client("sk-test", standin.url, limiter=RateLimiter({}))
+        before = openai_pool.RETRIES.value(model="gpt-4o-mini", reason="429")
+
+        for _ in range(6):
+            client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+        retried = openai_pool.RETRIES.value(model="gpt-4o-mini", reason="429") - before
+        assert retried == standin.responses(429) > 0
+
+    def test_transcription_retry_rewinds_file(self, standin, tmp_path):
+        """Test dat een Whisper upload na een server fout opnieuw volledig verstuurd wordt"""
+        standin.config.error_rate = 0.5
+        audio = tmp_path / "audio.ogg"
+        audio.write_bytes(b"\1" * 5000)
+        client = create_client("sk-test", standin.url, limiter=RateLimiter({}))
+
+        with open(audio, "rb") as f:
+            for _ in range(4):
+                f.seek(0)
+                assert client.audio.transcriptions.create(model="whisper-1", file=f).text
+
+        assert standin.responses(500) > 0
+
+    def test_gives_up(self, standin):
+        """Test dat de fout na max_retries doorgaat"""
+        standin.config.error_rate = 1.0
+        client = create_client("sk-test", standin.url, limiter=RateLimiter({}))
+        client.max_retries = 2
+
+        with pytest.raises(openai.InternalServerError):
+            client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+        assert standin.responses(500) == 3
+
+    def test_server_limit_pauses_model(self, standin):
+        """Test dat een 429 met Retry-After ook zonder retry het model pauzeert"""
+        standin.config.rpm = 1
+        limiter = RateLimiter({})
+        client = create_client("sk-test", standin.url, limiter=limiter)
+        client.max_retries = 0
+
+        client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+        with pytest.raises(openai.RateLimitError):
+            client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+        assert limiter.reserve("gpt-4o-mini") > 20
+        assert limiter.reserve("whisper-1") == 0.0
+
+    def test_async_client(self, standin):
+        """Test de async client met retries op 429's"""
+        standin.config.rate_limit_rate = 0.5
+        standin.config.retry_after = 0.05
+        client = create_async_client("sk-test", standin.url, limiter=RateLimiter({}))
+
+        async def run():
+            return await asyncio.gather(*(
+                client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+                for _ in range(5)
+            ))
+
+        responses = asyncio.run(run())
+
+        assert all(response.choices[0].message.content for response in responses)
+        assert standin.responses(200) == 5
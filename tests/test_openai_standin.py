@@ -0,0 +1,195 @@
+"""
+Tests voor de lokale OpenAI stand-in
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import openai
+import pytest
+from openai import OpenAI
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import monitor
+from openai_standin import OpenAIStandInServer, StandInConfig
+
+
+@pytest.fixture
+def standin():
+    server = OpenAIStandInServer(StandInConfig(seed=1)).start()
+    yield server
+    server.stop()
+
+
+def make_client(server, retries: int = 0) -> OpenAI:
+    return OpenAI(api_key="sk-test", base_url=server.url, max_retries=retries)
+
+
+class TestEndpoints:
+    """Tests voor de endpoints die de app gebruikt"""
+
+    def test_chat_completion(self, standin):
+        """Test een gewone chat completion met usage"""
+        response = make_client(standin).chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "x" * 8000}],
+        )
+
+        data = json.loads(response.choices[0].message.content)
+        assert data["title"]
+        assert response.usage.prompt_tokens == 2000
+        assert response.usage.prompt_tokens_details.cached_tokens == 1920
+
+    def test_variant_answer(self, standin):
+        """Test dat de variant-modus uit de prompt van de app gevolgd wordt"""
+        import shorts_core
+
+        req = shorts_core.GenerationRequest(
+            transcript="Test", variant_levels=[2, 8], variant_platforms=["TikTok"]
+        )
+        response = make_client(standin).chat.completions.create(**shorts_core.build_generation_params(req))
+
+        result = shorts_core.parse_variants(response.choices[0].message.content, req)
+        assert all(item["title"] for item in result["titles"])
+        assert [item["platform"] for item in result["descriptions"]] == ["TikTok"]
+        assert result["descriptions"][0]["description"]
+
+    def test_streaming(self, standin):
+        """Test streaming met usage in de laatste chunk"""
+        stream = make_client(standin).chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Test"}],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        chunks = list(stream)
+        content = "".join(chunk.choices[0].delta.content for chunk in chunks if chunk.choices)
+        assert json.loads(content)["title"]
+        assert chunks[-1].usage.completion_tokens > 0
+
+    def test_transcription(self, standin, tmp_path):
+        """Test een Whisper upload"""
+        audio = tmp_path / "audio.ogg"
+        audio.write_bytes(b"\0" * 1000)
+
+        with open(audio, "rb") as f:
+            transcript = make_client(standin).audio.transcriptions.create(
+                model="whisper-1", file=f, language="nl"
+            )
+
+        assert transcript.text
+
+    def test_verbose_transcription(self, standin, tmp_path):
+        """Test verbose_json met opeenvolgende segmenten over de geschatte duur"""
+        standin.config.segment_seconds = 2.0
+        audio = tmp_path / "audio.ogg"
+        audio.write_bytes(b"\0" * 40000)
+
+        with open(audio, "rb") as f:
+            transcript = make_client(standin).audio.transcriptions.create(
+                model="whisper-1", file=f, response_format="verbose_json"
+            )
+
+        assert len(transcript.segments) == 5
+        assert [s.start for s in transcript.segments] == [0.0, 2.0, 4.0, 6.0, 8.0]
+        assert transcript.text.startswith("(0) Bitcoin")
+
+    def test_batch(self, standin):
+        """Test de Batch API: upload, verwerking en output- en error bestand per custom_id"""
+        client = make_client(standin)
+        lines = [
+            {"custom_id": "goed", "method": "POST", "url": "/v1/chat/completions",
+             "body": {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Test"}]}},
+            {"custom_id": "fout", "method": "POST", "url": "/v1/embeddings", "body": {}},
+        ]
+        upload = client.files.create(
+            file=("batch.jsonl", "".join(json.dumps(line) + "\n" for line in lines).encode()),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+
+        deadline = time.monotonic() + 5
+        while batch.status != "completed" and time.monotonic() < deadline:
+            time.sleep(0.02)
+            batch = client.batches.retrieve(batch.id)
+
+        assert batch.status == "completed"
+        assert (batch.request_counts.completed, batch.request_counts.failed) == (1, 1)
+        output = json.loads(client.files.content(batch.output_file_id).text)
+        error = json.loads(client.files.content(batch.error_file_id).text)
+        assert output["custom_id"] == "goed"
+        assert json.loads(output["response"]["body"]["choices"][0]["message"]["content"])["title"]
+        assert (error["custom_id"], error["response"]["status_code"]) == ("fout", 400)
+
+    def test_monitor_check(self, standin, monkeypatch):
+        """Test dat monitor.check_openai_api de stand-in kan controleren"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setenv("OPENAI_BASE_URL", standin.url)
+
+        ok, message = monitor.check_openai_api()
+
+        assert ok, message
+        assert standin.url in message
+
+
+class TestFaults:
+    """Tests voor latency, rate limits en fouten"""
+
+    def test_latency(self, standin):
+        """Test de ingestelde latency"""
+        standin.config.latency = 0.2
+        started = time.perf_counter()
+
+        make_client(standin).chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": "Test"}]
+        )
+
+        assert time.perf_counter() - started >= 0.2
+
+    def test_rpm_limit(self, standin):
+        """Test een 429 met Retry-After zodra de requests per minuut op zijn"""
+        standin.config.rpm = 2
+        client = make_client(standin)
+        messages = [{"role": "user", "content": "Test"}]
+
+        client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+        client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+        with pytest.raises(openai.RateLimitError) as error:
+            client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+
+        headers = error.value.response.headers
+        assert 50 < int(headers["retry-after"]) <= 60
+        assert headers["x-ratelimit-remaining-requests"] == "0"
+        # Limieten gelden per model
+        with open(__file__, "rb") as f:
+            client.audio.transcriptions.create(model="whisper-1", file=f)
+
+    def test_random_rate_limit_retried(self, standin):
+        """Test dat willekeurige 429's met een korte Retry-After door de SDK worden herhaald"""
+        standin.config.rate_limit_rate = 0.5
+        standin.config.retry_after = 0.05
+        client = make_client(standin, retries=10)
+
+        for _ in range(5):
+            client.chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "Test"}]
+            )
+
+        assert standin.responses(429) > 0
+        assert standin.responses(200) == 5
+
+    def test_error_rate(self, standin):
+        """Test een server fout bij error_rate 1"""
+        standin.config.error_rate = 1.0
+
+        with pytest.raises(openai.InternalServerError):
+            make_client(standin).chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "Test"}]
+            )
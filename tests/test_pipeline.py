@@ -0,0 +1,77 @@
+"""
+Tests voor de async pipeline
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline import AsyncPipeline, PipelineJob
+from conftest import make_video, requires_ffmpeg
+
+
+async def collect(pipeline, jobs):
+    return [job async for job in pipeline.run(jobs)]
+
+
+@requires_ffmpeg
+class TestAsyncPipeline:
+    """Tests voor overlap en foutafhandeling van de stages"""
+
+    def test_stages_overlap_across_jobs(self, tmp_path, fake_openai):
+        """Test dat de API stages van meerdere jobs gelijktijdig lopen"""
+        fake_openai.delay = 0.3
+        videos = [make_video(tmp_path / f"clip{i}.mp4", duration=1) for i in range(4)]
+        jobs = [PipelineJob(video=v, name=v.name) for v in videos]
+        pipe = AsyncPipeline(extract_workers=2, transcribe_workers=4, generate_workers=4)
+
+        started = time.perf_counter()
+        done = asyncio.run(collect(pipe, jobs))
+        elapsed = time.perf_counter() - started
+
+        assert len(done) == 4
+        assert all(job.error is None and job.title == "BTC op weerstand" for job in done)
+        # Serieel zou dit minstens 4 x (0.3 + 0.3) = 2.4 seconden duren
+        assert elapsed < 2.0
+
+    def test_failed_job_does_not_stop_others(self, tmp_path, fake_openai):
+        """Test dat een kapotte video alleen zijn eigen job laat falen"""
+        good = make_video(tmp_path / "good.mp4", duration=1)
+        bad = tmp_path / "bad.mp4"
+        bad.write_bytes(b"geen video")
+        jobs = [PipelineJob(video=good, name="good"), PipelineJob(video=bad, name="bad")]
+
+        events = []
+        pipe = AsyncPipeline(on_progress=events.append)
+
+        done = {job.name: job for job in asyncio.run(collect(pipe, jobs))}
+
+        assert done["good"].error is None
+        assert done["bad"].error.startswith("extract")
+        stages = {(event.data["job"], event.stage) for event in events}
+        assert ("good", "generate") in stages
+        assert ("bad", "transcribe") not in stages
+
+
+class TestHeadless:
+    """Tests voor de CLI modules buiten Streamlit"""
+
+    def test_no_streamlit(self):
+        """Test dat pipeline, batch en bulk generatie Streamlit (en app.py) niet laden"""
+        root = Path(__file__).parent.parent
+        probe = (
+            f"import sys; sys.path.insert(0, {str(root)!r}); "
+            "import batch, bulk_generation, pipeline, shorts_core; "
+            "print([name for name in ('streamlit', 'app') if name in sys.modules])"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", probe],
+            capture_output=True, text=True, cwd=str(root), timeout=60, check=True,
+        ).stdout
+
+        assert output.strip().splitlines()[-1] == "[]"
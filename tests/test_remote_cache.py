@@ -0,0 +1,188 @@
+"""
+Tests voor de gedeelde (RESP) cache
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import remote_cache
+from cache_config import CacheManager
+from remote_cache import RemoteCacheManager, RespClient, StandInServer
+
+
+@pytest.fixture
+def server():
+    """Stand-in RESP server op een vrije poort"""
+    server = StandInServer().start()
+    yield server
+    server.stop()
+
+
+def make_replica(server, tmp_path, name):
+    """Cache zoals een replica hem gebruikt: eigen L1, gedeelde server"""
+    return RemoteCacheManager(
+        url=server.url,
+        namespace="shorts:test",
+        l1=CacheManager(cache_dir=str(tmp_path / name)),
+    )
+
+
+class TestRespClient:
+    """Tests voor de minimale RESP client"""
+
+    def test_commands(self, server):
+        """Test GET/SET met NX en verloop, DEL en SCAN"""
+        client = RespClient(server.url)
+
+        assert client.execute("PING") == "PONG"
+        assert client.set("a", "één") is True
+        assert client.set("a", "twee", nx=True) is False
+        assert client.get("a").decode() == "één"
+
+        client.set("kort", "x", px=50)
+        time.sleep(0.1)
+        assert client.get("kort") is None
+
+        assert sorted(client.scan_iter("*")) == [b"a"]
+        assert client.delete("a") == 1
+        assert client.get("a") is None
+
+
+class TestRemoteCacheManager:
+    """Tests voor de gedeelde cache tussen replica's"""
+
+    def test_shared_between_replicas(self, server, tmp_path):
+        """Test dat replica B het resultaat van replica A ziet en in L1 zet"""
+        replica_a = make_replica(server, tmp_path, "a")
+        replica_b = make_replica(server, tmp_path, "b")
+
+        replica_a.set("transcript_x", "Bitcoin breekt uit")
+
+        assert replica_b.get("transcript_x") == "Bitcoin breekt uit"
+        assert replica_b.l1.get("transcript_x") == "Bitcoin breekt uit"
+
+    def test_single_flight_across_replicas(self, server, tmp_path, monkeypatch):
+        """Test dat maar één replica dezelfde key berekent"""
+        monkeypatch.setattr(remote_cache, "LOCK_POLL_SECONDS", 0.01)
+        replicas = [make_replica(server, tmp_path, f"r{i}") for i in range(4)]
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "Whisper resultaat"
+
+        def worker(replica):
+            results.append(replica.get_or_compute("audio_x", compute))
+
+        threads = [threading.Thread(target=worker, args=(r,)) for r in replicas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [("Whisper resultaat", False)] + [("Whisper resultaat", True)] * 3
+
+    def test_server_down_falls_back_to_l1(self, tmp_path):
+        """Test dat een onbereikbare server de app niet breekt"""
+        cache = RemoteCacheManager(
+            url="redis://127.0.0.1:1/0",
+            l1=CacheManager(cache_dir=str(tmp_path)),
+        )
+
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get_or_compute("b", lambda: 2) == (2, False)
+        assert cache.errors > 0
+
+    def test_clear_namespace(self, server, tmp_path):
+        """Test dat clear alleen de eigen namespace leegt"""
+        cache = make_replica(server, tmp_path, "a")
+        other = RespClient(server.url)
+        other.set("ander:key", "blijft")
+        cache.set("a", 1)
+
+        cache.clear()
+
+        assert cache.get("a") is None
+        assert other.get("ander:key") == b"blijft"
+
+    def test_unresponsive_server_skipped(self, tmp_path, monkeypatch):
+        """Test dat na een timeout de server een tijd overgeslagen wordt (circuit breaker)"""
+        calls = []
+
+        class Blackhole(RespClient):
+            def execute(self, *args):
+                calls.append(args)
+                raise TimeoutError("timed out")
+
+        cache = RemoteCacheManager(
+            l1=CacheManager(cache_dir=str(tmp_path)), client=Blackhole()
+        )
+        cache.set("a", 1)
+        for _ in range(5):
+            assert cache.get("a") == 1
+            assert cache.get("b") is None
+        assert cache.get_or_compute("c", lambda: 3) == (3, False)
+
+        assert len(calls) == 1
+        assert not cache.available
+
+        monkeypatch.setattr(cache, "_down_until", 0.0)
+        cache.get("b")
+        assert len(calls) == 2
+        assert cache._retry_seconds == remote_cache.REMOTE_RETRY_SECONDS * 4
+
+    def test_lock_release_only_own_token(self, server, tmp_path):
+        """Test dat een lock die inmiddels van een ander is niet vrijgegeven wordt"""
+        cache = make_replica(server, tmp_path, "a")
+        other = RespClient(server.url)
+        lock_key = "shorts:test:lock:audio_x"
+
+        def compute():
+            # Onze lock is verlopen en een andere replica heeft hem
+            other.set(lock_key, "ander", ex=60)
+            return "resultaat"
+
+        cache.get_or_compute("audio_x", compute)
+        assert other.get(lock_key) == b"ander"
+
+        other.delete(lock_key)
+        cache.get_or_compute("audio_y", lambda: "resultaat")
+        assert other.get("shorts:test:lock:audio_y") is None
+
+    def test_lock_after_lost_reply(self, server, tmp_path, monkeypatch):
+        """Test dat een SET NX waarvan het antwoord verloren ging (retry na time-out) toch eigenaar is"""
+        monkeypatch.setattr(remote_cache, "LOCK_POLL_SECONDS", 0.01)
+        monkeypatch.setattr(remote_cache, "LOCK_WAIT_SECONDS", 1.0)
+
+        class LostReply(RespClient):
+            lost = False
+
+            def _call(self, *args):
+                reply = super()._call(*args)
+                if args[0] == "SET" and "NX" in args and not self.lost:
+                    # De server heeft de lock gezet, maar het antwoord komt niet aan
+                    self.lost = True
+                    raise TimeoutError("timed out")
+                return reply
+
+        cache = RemoteCacheManager(
+            url=server.url, namespace="shorts:test",
+            l1=CacheManager(cache_dir=str(tmp_path)), client=LostReply(server.url),
+        )
+        started = time.monotonic()
+
+        assert cache.get_or_compute("audio_x", lambda: "resultaat") == ("resultaat", False)
+        assert time.monotonic() - started < 0.5
+        assert RespClient(server.url).get("shorts:test:lock:audio_x") is None
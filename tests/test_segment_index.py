@@ -0,0 +1,119 @@
+"""
+Tests voor de segment index (transcripts hergebruiken voor clips uit dezelfde bron)
+"""
+
+import asyncio
+import subprocess
+import time
+
+import numpy as np
+import pytest
+
+from conftest import FFMPEG, make_speech, requires_ffmpeg, write_wav
+from openai_pool import RateLimiter, create_async_client
+from openai_standin import OpenAIStandInServer, StandInConfig
+from pipeline import AsyncPipeline, PipelineJob
+from segment_index import SegmentIndex, fingerprint
+from speech_trim import decode_pcm
+from transcription import Segment
+
+RATE = 16000
+SEGMENTS = [Segment(i * 5.0, i * 5.0 + 5.0, f"Zin {i}.") for i in range(24)]
+
+
+def encode(samples, path, codec_args: list):
+    """Hercodeer samples, zoals een clip uit een andere export"""
+    subprocess.run(
+        [FFMPEG, "-loglevel", "error", "-y", "-f", "s16le", "-ar", str(RATE), "-ac", "1",
+         "-i", "pipe:0", *codec_args, str(path)],
+        input=(samples * 32767).astype("int16").tobytes(),
+        check=True,
+    )
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SegmentIndex(str(tmp_path / "segments.sqlite3"))
+
+
+@pytest.fixture(scope="module")
+def source():
+    return make_speech(120, seed=5)
+
+
+@requires_ffmpeg
+class TestMatching:
+    """Tests voor fingerprint en offset voting"""
+
+    def test_clip_found_after_reencode(self, index, source, tmp_path):
+        """Test dat een opnieuw geëncodeerde clip op de juiste plek in de bron gevonden wordt"""
+        index.add("bron", "nl", fingerprint(source), len(source) / RATE, SEGMENTS)
+        clip = decode_pcm(encode(
+            source[int(40.3 * RATE):int(70.1 * RATE)], tmp_path / "clip.m4a", ["-c:a", "aac", "-b:a", "64k"]
+        ))
+
+        match = index.match(fingerprint(clip), "nl")
+
+        assert match is not None
+        assert match.offset == pytest.approx(40.3, abs=0.05)
+        assert match.coverage > 0.9
+        assert index.transcript_for(match, len(clip) / RATE) == " ".join(
+            f"Zin {i}." for i in range(8, 14)
+        )
+
+    def test_unrelated_audio(self, index, source):
+        """Test dat andere audio, een andere taal of een clip half buiten de bron niet matcht"""
+        index.add("bron", "nl", fingerprint(source), len(source) / RATE, SEGMENTS)
+        past_end = np.concatenate([source[100 * RATE:], make_speech(20, seed=9)])
+
+        assert index.match(fingerprint(make_speech(30, seed=6)), "nl") is None
+        assert index.match(fingerprint(source[:30 * RATE]), "en") is None
+        assert index.match(fingerprint(past_end), "nl") is None
+        assert index.lookup(fingerprint(make_speech(5, seed=7)), 5.0, "nl") is None
+
+    def test_replace_and_expire(self, index, source):
+        """Test dat dezelfde bron vervangen wordt en oude bronnen verlopen"""
+        hashes = fingerprint(source)
+        index.add("bron", "nl", hashes, 120.0, SEGMENTS)
+        index.add("bron", "nl", hashes, 120.0, SEGMENTS)
+        assert index.stats() == {"sources": 1, "source_seconds": 120.0}
+
+        index.max_age_hours = 0
+        time.sleep(0.01)
+        index.add("ander", "nl", fingerprint(make_speech(10, seed=8)), 10.0, SEGMENTS[:2])
+
+        assert index.stats()["sources"] == 1
+        assert index.match(fingerprint(source[:30 * RATE]), "nl") is None
+
+
+@requires_ffmpeg
+class TestReuse:
+    """Integratietest: clips uit een getranscribeerde bron zonder Whisper call"""
+
+    def test_clip_skips_whisper(self, tmp_path, fake_openai, source):
+        """Test dat de tweede clip uit dezelfde bron uit de index komt"""
+        server = OpenAIStandInServer(StandInConfig(seed=1)).start()
+        try:
+            client = create_async_client("sk-test", server.url, limiter=RateLimiter({}))
+            stream = write_wav(tmp_path / "stream.wav", source[:60 * RATE])
+            clip = encode(source[int(20 * RATE):int(35 * RATE)], tmp_path / "clip.m4a",
+                          ["-c:a", "aac", "-b:a", "64k"])
+
+            async def run():
+                # Na elkaar: de clip komt pas als de stream getranscribeerd is
+                pipe = AsyncPipeline(client=client)
+                return [
+                    job
+                    for video in (stream, clip)
+                    async for job in pipe.run([PipelineJob(video=video, name=video.name)])
+                ]
+
+            first, second = asyncio.run(run())
+        finally:
+            server.stop()
+
+        assert first.error is None and second.error is None
+        assert server.stats[("/audio/transcriptions", 200)] == 1
+        assert second.transcript
+        assert second.transcript in first.transcript
@@ -0,0 +1,119 @@
+"""
+Tests voor single-flight coalescing
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cache_config
+from cache_config import CacheManager, cache_result
+from singleflight import AsyncSingleFlight, SingleFlight, coalesce
+
+
+class TestSingleFlight:
+    """Tests voor coalescing tussen threads"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test dat gelijktijdige aanroepen met dezelfde key één keer rekenen"""
+        flight = SingleFlight()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.2)
+            return value * 2
+
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(lambda _: flight.do("key", slow, 21), range(5)))
+
+        assert results == [42] * 5
+        assert len(calls) == 1
+        assert flight.coalesced == 4
+        assert flight.in_flight() == 0
+
+    def test_exception_shared(self):
+        """Test dat wachtende aanroepers dezelfde fout krijgen"""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("API fout")
+
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(flight.do, "key", failing)
+            started.wait()
+            follower = pool.submit(flight.do, "key", failing)
+
+            for future in (leader, follower):
+                with pytest.raises(ValueError, match="API fout"):
+                    future.result()
+
+    def test_decorator_keys(self):
+        """Test dat verschillende keys niet op elkaar wachten"""
+        calls = []
+
+        @coalesce(lambda name: name)
+        def work(name):
+            calls.append(name)
+            time.sleep(0.1)
+            return name
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(work, ["a", "a", "b", "b"]))
+
+        assert results == ["a", "a", "b", "b"]
+        assert sorted(calls) == ["a", "b"]
+
+
+class TestAsyncSingleFlight:
+    """Tests voor coalescing binnen een event loop"""
+
+    def test_concurrent_coroutines(self):
+        """Test dat gelijktijdige coroutines één task delen"""
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow(value):
+            calls.append(value)
+            await asyncio.sleep(0.1)
+            return value
+
+        async def run():
+            return await asyncio.gather(*(flight.do("key", slow, 7) for _ in range(3)))
+
+        assert asyncio.run(run()) == [7, 7, 7]
+        assert len(calls) == 1
+        assert flight.coalesced == 2
+
+
+class TestCacheResult:
+    """Tests voor de cache_result decorator"""
+
+    def test_concurrent_calls_computed_once(self, tmp_path, monkeypatch):
+        """Test dat de decorator ook gelijktijdige misses samenvoegt"""
+        monkeypatch.setattr(cache_config, "cache_manager", CacheManager(cache_dir=str(tmp_path)))
+        calls = []
+
+        @cache_result
+        def expensive(data):
+            calls.append(data)
+            time.sleep(0.2)
+            return f"Processed: {data}"
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(expensive, ["x"] * 4))
+
+        assert results == ["Processed: x"] * 4
+        assert expensive("x") == "Processed: x"
+        assert len(calls) == 1
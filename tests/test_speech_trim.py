@@ -0,0 +1,177 @@
+"""
+Tests voor spraakdetectie en het inkorten van audio vóór Whisper
+"""
+
+import numpy as np
+import pytest
+
+import speech_trim
+from conftest import make_speech, requires_ffmpeg, write_wav
+from speech_trim import Span, TimeMap, atempo_filter, decode_pcm, detect_speech, trim_audio
+from transcription import Segment
+
+RATE = 16000
+
+
+def speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    """Stem-achtig signaal: harmonischen van 150 Hz met een lettergreep-ritme van 4 Hz"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    voice = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 12))
+    syllables = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    noise = np.random.default_rng(seed).normal(0, 0.01, len(t))
+    return (0.15 * voice * syllables + noise).astype(np.float32)
+
+
+def silence(seconds: float, seed: int = 1) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, 0.001, int(seconds * RATE)).astype(np.float32)
+
+
+def hum(seconds: float) -> np.ndarray:
+    """Luide netbrom (50 Hz): veel energie, maar niet in de spraakband"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.3 * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+
+
+class TestDetectSpeech:
+    """Tests voor de energie-analyse per frame"""
+
+    def test_finds_speech_regions(self):
+        """Test dat stiltes rond en tussen spraak herkend worden"""
+        samples = np.concatenate([silence(2), speech_like(3), silence(2), speech_like(2)])
+
+        regions = detect_speech(samples, RATE)
+
+        assert len(regions) == 2
+        assert regions[0] == pytest.approx((2.0, 5.0), abs=0.25)
+        assert regions[1] == pytest.approx((7.0, 9.0), abs=0.25)
+
+    def test_hum_is_not_speech(self):
+        """Test dat luide energie buiten de spraakband wegvalt"""
+        samples = np.concatenate([hum(3), speech_like(2)])
+
+        regions = detect_speech(samples, RATE)
+
+        assert len(regions) == 1
+        assert regions[0][0] == pytest.approx(3.0, abs=0.25)
+
+    def test_short_pause_and_click(self):
+        """Test dat korte pauzes dicht gaan en een losse tik geen spraak is"""
+        click = speech_like(0.06)
+        samples = np.concatenate([
+            silence(1), click, silence(2), speech_like(1), silence(0.2), speech_like(1), silence(1),
+        ])
+
+        regions = detect_speech(samples, RATE)
+
+        assert len(regions) == 1
+        assert regions[0] == pytest.approx((3.06, 5.26), abs=0.25)
+
+    def test_continuous_speech(self):
+        """Test dat spraak zonder stiltes niet tegen zichzelf gemeten wordt"""
+        regions = detect_speech(make_speech(10), RATE)
+
+        assert regions == [pytest.approx((0.0, 10.0), abs=0.1)]
+
+    def test_level_changes(self):
+        """Test dat zachtere passages (ook zonder stilte ervoor) spraak blijven"""
+        louder_then_softer = np.concatenate([make_speech(10), make_speech(13, seed=3) * 10 ** (-3 / 20)])
+        steps = np.concatenate([speech_like(3) * 10 ** (-gain / 20) for gain in (0, 2, 6, 10, 0)])
+
+        assert detect_speech(louder_then_softer, RATE) == [pytest.approx((0.0, 23.0), abs=0.1)]
+        assert detect_speech(steps, RATE) == [pytest.approx((0.0, 15.0), abs=0.1)]
+        assert len(detect_speech(np.concatenate([silence(2), steps]), RATE)) == 1
+
+    def test_empty(self):
+        """Test lege en volledig stille audio"""
+        assert detect_speech(np.zeros(0, dtype=np.float32), RATE) == []
+        assert detect_speech(silence(2), RATE) == []
+
+
+class TestTimeMap:
+    """Tests voor het terugrekenen naar tijden in het origineel"""
+
+    def test_to_original(self):
+        """Test tijden binnen stukken, in een join-pauze en met tempo"""
+        time_map = TimeMap([Span(0.0, 2.0, 3.0), Span(3.2, 7.0, 2.0)])
+
+        assert time_map.to_original(1.0) == pytest.approx(3.0)
+        assert time_map.to_original(3.1) == pytest.approx(5.0)
+        assert time_map.to_original(4.2) == pytest.approx(8.0)
+        assert TimeMap(time_map.spans, tempo=1.5).to_original(2.0) == pytest.approx(5.0)
+
+    def test_segments_to_original(self):
+        """Test dat Whisper segmenten van de upload naar het origineel verschuiven"""
+        time_map = TimeMap([Span(0.0, 2.0, 3.0), Span(3.2, 7.0, 2.0)])
+
+        segments = time_map.segments_to_original([Segment(0.0, 2.5, "een"), Segment(3.2, 5.2, "twee")])
+
+        assert segments == [Segment(2.0, 4.5, "een"), Segment(7.0, 9.0, "twee")]
+
+    def test_atempo_chain(self):
+        """Test dat atempo per stap binnen 0.5-2.0 blijft"""
+        assert atempo_filter(1.0) is None
+        assert atempo_filter(1.25) == "atempo=1.2500"
+        assert atempo_filter(3.0) == "atempo=2.0000,atempo=1.5000"
+
+
+@requires_ffmpeg
+class TestTrimAudio:
+    """Tests voor het inkorten via ffmpeg"""
+
+    def test_trims_non_speech(self, tmp_path):
+        """Test dat alleen de spraak (plus pauzes) overblijft, met een kloppende tijdkaart"""
+        audio = write_wav(tmp_path / "clip.wav", np.concatenate([
+            hum(4), silence(2), speech_like(3), silence(3), speech_like(2),
+        ]))
+
+        result = trim_audio(audio, output_dir=tmp_path, tempo=1.0, drop_silence=True)
+
+        assert result is not None
+        assert result.original_seconds == pytest.approx(14.0, abs=0.05)
+        assert result.seconds == pytest.approx(5.8, abs=0.5)
+        assert len(decode_pcm(result.path)) / RATE == pytest.approx(result.seconds, abs=0.1)
+        assert result.time_map.to_original(0.5) == pytest.approx(6.5, abs=0.3)
+        assert result.time_map.to_original(result.seconds - 0.5) == pytest.approx(13.5, abs=0.3)
+
+    def test_tempo(self, tmp_path):
+        """Test de versnelling zonder spraakdetectie"""
+        audio = write_wav(tmp_path / "clip.wav", speech_like(6))
+
+        result = trim_audio(audio, output_dir=tmp_path, tempo=1.5, drop_silence=False)
+
+        assert result.seconds == pytest.approx(4.0, abs=0.05)
+        assert len(decode_pcm(result.path)) / RATE == pytest.approx(4.0, abs=0.15)
+        assert result.time_map.to_original(2.0) == pytest.approx(3.0)
+
+    def test_nothing_to_gain(self, tmp_path):
+        """Test dat audio die vrijwel helemaal spraak is ongewijzigd blijft"""
+        audio = write_wav(tmp_path / "clip.wav", speech_like(5))
+
+        assert trim_audio(audio, output_dir=tmp_path, tempo=1.0, drop_silence=True) is None
+        assert trim_audio(audio, output_dir=tmp_path, tempo=1.0, drop_silence=False) is None
+
+    def test_continuous_speech_untouched(self, tmp_path):
+        """Test dat doorlopende spraak met een niveauverschil niet ingekort wordt"""
+        audio = write_wav(tmp_path / "clip.wav", np.concatenate([
+            make_speech(10), make_speech(13, seed=3) * 10 ** (-3 / 20),
+        ]))
+
+        assert trim_audio(audio, output_dir=tmp_path, tempo=1.0, drop_silence=True) is None
+
+    def test_implausibly_little_speech(self, tmp_path, monkeypatch):
+        """Test dat een detectie die bijna alles weggooit genegeerd wordt"""
+        audio = write_wav(tmp_path / "clip.wav", speech_like(10))
+        monkeypatch.setattr(speech_trim, "detect_speech", lambda samples, rate: [(2.0, 3.0)])
+
+        assert trim_audio(audio, output_dir=tmp_path, tempo=1.0, drop_silence=True) is None
+        result = trim_audio(audio, output_dir=tmp_path, tempo=1.5, drop_silence=True)
+        assert result.seconds == pytest.approx(10 / 1.5, abs=0.05)
+
+    def test_app_falls_back_to_original(self, tmp_path):
+        """Test dat een mislukte analyse de transcriptie niet tegenhoudt"""
+        import shorts_core
+
+        broken = tmp_path / "broken.ogg"
+        broken.write_bytes(b"geen audio")
+
+        assert shorts_core.trim_for_transcription(broken) is None
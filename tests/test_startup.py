@@ -0,0 +1,75 @@
+"""
+Tests voor de opstarttijd van de app (koude import en reruns)
+
+Budgetten zijn ruim gekozen voor trage CI machines en via de omgeving aan te passen.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "1.0"))
+RERUN_BUDGET = float(os.getenv("STARTUP_RERUN_BUDGET", "1.0"))
+
+# Zware modules die pas bij het eerste gebruik geladen mogen worden
+LAZY_MODULES = ["openai", "moviepy", "numpy", "httpx2"]
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import streamlit
+started = time.perf_counter()
+import app
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def cold_import() -> dict:
+    """Importeer app in een schoon proces, zonder API key"""
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=str(ROOT), modules=LAZY_MODULES)],
+        capture_output=True, text=True, env=env, cwd=str(ROOT), timeout=60, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    """Tests voor de koude import van app.py"""
+
+    def test_heavy_modules_lazy(self):
+        """Test dat openai, moviepy en numpy niet bij het importeren geladen worden"""
+        assert cold_import()["loaded"] == []
+
+    def test_import_budget(self):
+        """Test de importtijd van app bovenop streamlit"""
+        seconds = min(cold_import()["seconds"] for _ in range(2))
+
+        assert seconds < IMPORT_BUDGET
+
+
+class TestRerun:
+    """Tests voor een rerun van het script, zoals Streamlit bij elke interactie doet"""
+
+    def test_rerun_budget(self, monkeypatch, tmp_path):
+        """Test dat een rerun de gedeelde resources hergebruikt en binnen het budget blijft"""
+        from streamlit.testing.v1 import AppTest
+
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setenv("GENERATION_CACHE_DIR", str(tmp_path / "gen"))
+        at = AppTest.from_file(str(ROOT / "app.py")).run(timeout=30)
+        assert not at.exception
+
+        started = time.perf_counter()
+        at.run(timeout=30)
+
+        assert not at.exception
+        assert time.perf_counter() - started < RERUN_BUDGET
@@ -0,0 +1,79 @@
+"""
+Tests voor transcript compactie
+"""
+
+import sys
+from pathlib import Path
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shorts_core import GenerationRequest, build_user_prompt
+from transcript_compaction import compact_transcript, dedupe_sentences, remove_fillers
+
+TRANSCRIPT = (
+    "Ehm, dus ja, Bitcoin test de weerstand rond 70k. "
+    "Zeg maar, Bitcoin test de weerstand rond 70k! "
+    "Als die breekt, eh, dan kan het snel gaan richting 75k. "
+    "Het weer is trouwens lekker vandaag. "
+    "Volg voor meer Bitcoin updates."
+)
+
+
+class TestCompaction:
+    """Tests voor de compactie stappen"""
+
+    def test_remove_fillers(self):
+        """Test stopwoorden en herhaalde woorden"""
+        assert remove_fillers("Ehm, de de markt is, eh, groen.") == "De markt is, groen."
+        assert remove_fillers("Um, you know, it is up.", "en") == "It is up."
+
+    def test_grammatical_repeats_kept(self):
+        """Test dat herhalingen die grammaticaal kunnen zijn blijven staan"""
+        assert remove_fillers("Ik zei dat dat klopt.") == "Ik zei dat dat klopt."
+        assert remove_fillers("De munt die die breakout had.") == "De munt die die breakout had."
+        assert remove_fillers("He had had enough, the the bears left.", "en") == "He had had enough, the bears left."
+
+    def test_dedupe_sentences(self):
+        """Test dat herhaalde zinnen één keer overblijven"""
+        sentences = ["Bitcoin test 70k.", "Bitcoin test 70k!", "Altcoins volgen."]
+
+        assert dedupe_sentences(sentences) == ["Bitcoin test 70k.", "Altcoins volgen."]
+
+    def test_token_counts_reported(self):
+        """Test dat de token telling daalt en wordt gerapporteerd"""
+        result = compact_transcript(TRANSCRIPT)
+
+        assert result.tokens_after < result.tokens_before
+        assert result.text.count("weerstand") == 1
+
+    def test_budget_keeps_key_sentences_in_order(self):
+        """Test extractieve selectie binnen het budget"""
+        full = compact_transcript(TRANSCRIPT)
+        result = compact_transcript(TRANSCRIPT, max_tokens=25)
+
+        assert result.tokens_after <= 25 < full.tokens_after
+        assert result.text.startswith("Bitcoin test de weerstand")
+        kept = [full.text.index(s) for s in result.text.split(". ")]
+        assert kept == sorted(kept)
+
+    def test_budget_without_punctuation(self):
+        """Test dat een transcript zonder leestekens (één lange zin) niet leeg wordt"""
+        words = "bitcoin test de weerstand en ethereum volgt de markt met altcoins erachteraan".split()
+        text = " ".join(words[i % len(words)] for i in range(3000))
+
+        result = compact_transcript(text, max_tokens=200)
+        tiny = compact_transcript(text, max_tokens=1)
+
+        assert result.text and 100 < result.tokens_after <= 200
+        assert set(result.text.lower().split()) <= set(words)
+        assert tiny.text
+
+
+class TestPromptCompaction:
+    """Tests voor compactie in de prompt"""
+
+    def test_only_when_requested(self):
+        """Test dat het transcript standaard ongewijzigd blijft"""
+        assert "Ehm, dus ja" in build_user_prompt(GenerationRequest(transcript=TRANSCRIPT))
+        assert "Ehm" not in build_user_prompt(GenerationRequest(transcript=TRANSCRIPT, compact=True))
@@ -0,0 +1,149 @@
+"""
+Tests voor gechunkte transcriptie
+"""
+
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Voeg project root toe aan Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from conftest import FFMPEG, requires_ffmpeg
+from transcription import (
+    Chunk,
+    Segment,
+    Transcript,
+    detect_silences,
+    merge_transcripts,
+    plan_chunks,
+    stitch_texts,
+    transcribe_chunked,
+)
+
+
+def make_speech_like_audio(path: Path, blocks: int = 6, block_seconds: float = 4) -> Path:
+    """Toon-blokken afgewisseld met 1 seconde stilte"""
+    period = block_seconds + 1
+    duration = blocks * period
+    expression = f"volume='if(lt(mod(t,{period}),{block_seconds}),1,0)':eval=frame"
+    subprocess.run([
+        FFMPEG, "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration}",
+        "-af", expression, "-ac", "1", "-ar", "16000", str(path),
+    ], check=True)
+    return path
+
+
+class TestChunkPlanning:
+    """Tests voor het plannen van chunks"""
+
+    def test_short_audio_single_chunk(self):
+        """Test dat korte audio één chunk blijft"""
+        chunks = plan_chunks(30.0, [], max_chunk_seconds=60)
+
+        assert len(chunks) == 1
+        assert (chunks[0].start, chunks[0].end) == (0.0, 30.0)
+
+    def test_cut_on_silence(self):
+        """Test dat er in de laatste stilte vóór de limiet wordt geknipt"""
+        silences = [(20.0, 21.0), (50.0, 52.0), (70.0, 71.0)]
+
+        chunks = plan_chunks(100.0, silences, max_chunk_seconds=60)
+
+        assert chunks[0].end == 51.0
+        assert chunks[1].start == 51.0
+        assert all(chunk.duration <= 60 for chunk in chunks)
+
+    def test_hard_cut_overlaps(self):
+        """Test harde knip met overlap als er geen stilte is"""
+        chunks = plan_chunks(100.0, [], max_chunk_seconds=40, overlap=2.0)
+
+        assert chunks[0].end == 40.0
+        assert chunks[1].start == 38.0
+        assert chunks[-1].end == 100.0
+
+    def test_chunk_not_longer_than_overlap(self):
+        """Test dat een chunk lengte van hooguit de overlap een fout geeft in plaats van eindeloos te plannen"""
+        with pytest.raises(ValueError):
+            plan_chunks(100.0, [], max_chunk_seconds=2.0, overlap=2.0)
+
+
+class TestStitching:
+    """Tests voor het samenvoegen van chunk-teksten"""
+
+    def test_overlap_removed(self):
+        """Test dat dubbele woorden uit de overlap verdwijnen"""
+        text = stitch_texts(["Bitcoin test de weerstand", "de weerstand rond 70k."])
+
+        assert text == "Bitcoin test de weerstand rond 70k."
+
+    def test_no_overlap_when_cut_on_silence(self):
+        """Test dat herhaling zonder overlap behouden blijft"""
+        text = stitch_texts(["heel", "heel belangrijk"], overlapped=[False, False])
+
+        assert text == "heel heel belangrijk"
+
+    def test_segments_shifted_per_chunk(self):
+        """Test dat segmenten naar de tijdlijn van het bestand schuiven, zonder de overlap"""
+        chunks = [Chunk(0, 0.0, 10.0), Chunk(1, 8.0, 15.0)]
+        results = [
+            Transcript("a b", [Segment(0.0, 4.0, "a"), Segment(4.0, 10.0, "b")]),
+            Transcript("b c", [Segment(0.0, 2.0, "b"), Segment(2.0, 7.0, "c")]),
+        ]
+
+        merged = merge_transcripts(chunks, results)
+
+        assert merged.text == "a b c"
+        assert merged.segments == [Segment(0.0, 4.0, "a"), Segment(4.0, 10.0, "b"), Segment(10.0, 15.0, "c")]
+
+
+@requires_ffmpeg
+class TestChunkedTranscription:
+    """Integratietest met synthetische audio en een fake transcriber"""
+
+    def test_chunks_in_order_and_parallel(self, tmp_path):
+        """Test dat chunks parallel gaan en in volgorde worden samengevoegd"""
+        audio = make_speech_like_audio(tmp_path / "long.wav")
+        assert len(detect_silences(audio)) >= 4
+
+        threads = set()
+        calls = []
+
+        def fake_transcribe(path):
+            threads.add(threading.get_ident())
+            calls.append(path)
+            time.sleep(0.05)
+            return f"deel{path.stem.split('_')[-1]}"
+
+        text = transcribe_chunked(audio, fake_transcribe, max_chunk_seconds=12, max_workers=3)
+
+        assert len(calls) >= 3
+        assert text.split() == [f"deel{i:04d}" for i in range(len(calls))]
+        assert len(threads) > 1
+
+    def test_chunk_progress(self, tmp_path):
+        """Test een voortgangsevent per afgeronde chunk"""
+        audio = make_speech_like_audio(tmp_path / "long.wav")
+        events = []
+
+        transcribe_chunked(audio, lambda p: "tekst", max_chunk_seconds=12,
+                           max_workers=3, on_progress=events.append)
+
+        assert events[0].current == 0
+        assert [event.current for event in events[1:]] == list(range(1, events[0].total + 1))
+        assert events[-1].fraction == 1.0
+
+    def test_short_audio_single_call(self, tmp_path):
+        """Test dat korte audio in één call gaat"""
+        audio = make_speech_like_audio(tmp_path / "short.wav", blocks=1)
+        calls = []
+
+        text = transcribe_chunked(audio, lambda p: calls.append(p) or "kort")
+
+        assert text == "kort"
+        assert calls == [audio]
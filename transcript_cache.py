@@ -0,0 +1,78 @@
+"""
+Transcript cache voor Cryptoriez Shorts Helper
+
+Transcripts worden opgeslagen onder een fingerprint van de geüploade bytes én
+van de geëxtraheerde audio (plus de taal hint). Een identieke upload slaat zo
+extractie en Whisper over; een opnieuw geëncodeerde kopie met dezelfde audio
+slaat in elk geval de Whisper call over.
+"""
+
+import os
+from typing import Callable, Optional
+
+from cache_config import CacheManager, create_cache_manager
+
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "cache/transcripts")
+TRANSCRIPT_CACHE_HOURS = int(os.getenv("TRANSCRIPT_CACHE_HOURS", str(24 * 7)))
+
+
+class TranscriptCache:
+    """Transcripts opzoeken op video- of audio fingerprint"""
+
+    def __init__(self, cache: Optional[CacheManager] = None):
+        self.cache = cache or create_cache_manager(
+            cache_dir=TRANSCRIPT_CACHE_DIR, max_age_hours=TRANSCRIPT_CACHE_HOURS
+        )
+
+    @staticmethod
+    def make_key(kind: str, digest: str, language: str) -> str:
+        """Cache key voor een 'video' of 'audio' fingerprint"""
+        return f"transcript_{kind}_{language}_{digest}"
+
+    def get(self, kind: str, digest: Optional[str], language: str) -> Optional[str]:
+        """Haal een transcript op (None bij een miss)"""
+        if not digest:
+            return None
+        return self.cache.get(self.make_key(kind, digest, language))
+
+    def get_by_video(self, digest: Optional[str], language: str) -> Optional[str]:
+        return self.get("video", digest, language)
+
+    def get_by_audio(self, digest: Optional[str], language: str) -> Optional[str]:
+        return self.get("audio", digest, language)
+
+    def get_or_transcribe(
+        self, audio_digest: str, language: str, transcribe: Callable[[], str]
+    ) -> tuple[str, bool]:
+        """
+        Transcript via de audio fingerprint, anders `transcribe()`. Bij een
+        gedeelde cache berekent maar één replica tegelijk dezelfde audio.
+        Geeft (transcript, uit_cache); een leeg transcript wordt niet opgeslagen.
+        """
+        text, from_cache = self.cache.get_or_compute(
+            self.make_key("audio", audio_digest, language),
+            lambda: transcribe() or None,
+        )
+        return text or "", from_cache
+
+    def store(
+        self,
+        transcript: str,
+        language: str,
+        video_digest: Optional[str] = None,
+        audio_digest: Optional[str] = None,
+    ) -> None:
+        """Sla een transcript op onder alle bekende fingerprints"""
+        if not transcript:
+            return
+        if video_digest:
+            self.cache.set(self.make_key("video", video_digest, language), transcript)
+        if audio_digest:
+            self.cache.set(self.make_key("audio", audio_digest, language), transcript)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+# Globale transcript cache
+transcript_cache = TranscriptCache()
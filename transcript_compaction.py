@@ -0,0 +1,226 @@
+"""
+Transcript compactie voor Cryptoriez Shorts Helper
+
+Lokale voorbewerking vóór het prompten: stopwoorden (nl/en) verwijderen,
+herhaalde zinnen ontdubbelen en, als er een token budget is, de belangrijkste
+zinnen extractief selecteren. Zo blijft de prompt klein bij lange breakdowns.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # optionele dependency
+    tiktoken = None
+
+# Stopwoorden en -zinnen die geen inhoud dragen (hele woorden, case-insensitive)
+FILLER_PHRASES = {
+    "nl": [
+        "ehm", "eh", "euh", "uhm", "uh", "hmm",
+        "zeg maar", "weet je wel", "weet je", "snap je", "als het ware",
+        "dus ja", "nou ja", "ja ja",
+    ],
+    "en": [
+        "um", "uhm", "uh", "erm", "hmm",
+        "you know", "i mean", "sort of", "kind of", "you see",
+    ],
+}
+
+# Korte woorden die direct herhaald ('de de', 'the the') een hapering zijn. Niet
+# alle stopwoorden: 'dat dat', 'die die' en 'had had' kunnen gewoon kloppen.
+STUTTER_WORDS = {
+    "nl": set("de het een en ik je jij we ze hij in op aan met voor van naar om maar dus".split()),
+    "en": set("the a an and i you we it in on at with for of to but so".split()),
+}
+
+# Woorden die niet meetellen bij het scoren van zinnen
+STOPWORDS = {
+    "nl": set(
+        "de het een en of maar dat die dit deze is zijn was waren ik je jij we wij "
+        "ze zij hij in op aan met voor van te naar om bij als er ook nog dan niet "
+        "wel heel gewoon echt dus nu al wat hoe hier daar kan kunnen moet gaan gaat".split()
+    ),
+    "en": set(
+        "the a an and or but that this these those is are was were i you we they "
+        "he she it in on at with for of to from as there also still then not so "
+        "now just really very what how here can could should will would going".split()
+    ),
+}
+
+# Fallback schatting als tiktoken ontbreekt (~4 tekens per token)
+CHARS_PER_TOKEN = 4
+TOKEN_ENCODING = "o200k_base"
+# Zinnen die voor ≥ deze fractie dezelfde woorden bevatten gelden als herhaling
+DUPLICATE_THRESHOLD = 0.8
+# Langere stukken (bijv. een transcript zonder leestekens) worden bij selectie opgeknipt
+MAX_SENTENCE_TOKENS = 60
+
+_encoder = None
+
+
+@dataclass
+class CompactionResult:
+    """Resultaat van compactie, met token tellingen voor en na"""
+
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def saved_ratio(self) -> float:
+        if not self.tokens_before:
+            return 0.0
+        return 1 - self.tokens_after / self.tokens_before
+
+
+def count_tokens(text: str) -> int:
+    """Tel tokens met tiktoken, of schat ze als die niet beschikbaar is"""
+    global _encoder
+    if tiktoken is not None:
+        try:
+            if _encoder is None:
+                _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+            return len(_encoder.encode(text))
+        except Exception:
+            pass
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def remove_fillers(text: str, language: str = "nl") -> str:
+    """Verwijder stopwoorden en haperingen ('de de'; 'dat dat' blijft staan)"""
+    phrases = sorted(FILLER_PHRASES.get(language, []), key=len, reverse=True)
+    if phrases:
+        pattern = r"\b(?:" + "|".join(re.escape(p) for p in phrases) + r")\b,?"
+        text = re.sub(pattern, "", text, flags=re.IGNORECASE)
+    # Alleen losse letters en STUTTER_WORDS samenvoegen
+    stutters = sorted(STUTTER_WORDS.get(language, set()), key=len, reverse=True)
+    pattern = r"\b(" + "".join(re.escape(w) + "|" for w in stutters) + r"\w)(\s+\1\b)+"
+    text = re.sub(pattern, r"\1", text, flags=re.IGNORECASE)
+    # Opruimen: dubbele spaties en losse komma's
+    text = re.sub(r"\s+([,.!?])", r"\1", text)
+    text = re.sub(r",\s*([,.!?])", r"\1", text)
+    text = re.sub(r"\s{2,}", " ", text).strip()
+    # Zinnen waarvan het begin is weggevallen weer met een hoofdletter laten starten
+    return re.sub(r"(^|[.!?]\s+)(\w)", lambda m: m.group(1) + m.group(2).upper(), text)
+
+
+def split_sentences(text: str) -> list[str]:
+    """Splits op zinseinde; lange stukken zonder leestekens blijven één zin"""
+    parts = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _words(sentence: str) -> list[str]:
+    return re.findall(r"\w+", sentence.lower())
+
+
+def split_long_sentence(sentence: str, max_tokens: int) -> list[str]:
+    """Knip een te lange zin op woordgrenzen in stukken van hoogstens max_tokens"""
+    pieces: list[str] = []
+    current: list[str] = []
+    for word in sentence.split():
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def dedupe_sentences(sentences: list[str]) -> list[str]:
+    """Verwijder (bijna) letterlijk herhaalde zinnen; de eerste blijft staan"""
+    kept: list[str] = []
+    kept_sets: list[set] = []
+    for sentence in sentences:
+        words = set(_words(sentence))
+        if not words:
+            continue
+        duplicate = any(
+            len(words & other) / max(len(words), len(other)) >= DUPLICATE_THRESHOLD
+            for other in kept_sets
+        )
+        if not duplicate:
+            kept.append(sentence)
+            kept_sets.append(words)
+    return kept
+
+
+def select_key_sentences(
+    sentences: list[str], max_tokens: int, language: str = "nl"
+) -> list[str]:
+    """
+    Kies de zinnen met de meeste inhoud tot het token budget op is.
+
+    Score = gemiddelde frequentie van de inhoudswoorden in het hele transcript;
+    de openingszin krijgt een bonus (daar zit meestal de hook). De gekozen
+    zinnen blijven in hun oorspronkelijke volgorde. Zinnen die niet in het
+    budget passen worden eerst opgeknipt; bij niet-lege invoer is de uitkomst
+    nooit leeg.
+    """
+    piece_tokens = max(1, min(MAX_SENTENCE_TOKENS, max_tokens - 1))
+    sentences = [
+        piece
+        for sentence in sentences
+        for piece in (
+            split_long_sentence(sentence, piece_tokens)
+            if count_tokens(sentence) > piece_tokens else [sentence]
+        )
+    ]
+    stopwords = STOPWORDS.get(language, set())
+    frequencies = Counter(
+        w for s in sentences for w in _words(s) if w not in stopwords and len(w) > 2
+    )
+    if not frequencies:
+        return sentences
+
+    top = max(frequencies.values())
+
+    def score(index: int, sentence: str) -> float:
+        content = [w for w in _words(sentence) if w in frequencies]
+        if not content:
+            return 0.0
+        value = sum(frequencies[w] / top for w in content) / math.sqrt(len(content))
+        return value * (1.5 if index == 0 else 1.0)
+
+    ranked = sorted(
+        range(len(sentences)), key=lambda i: score(i, sentences[i]), reverse=True
+    )
+    chosen = set()
+    used = 0
+    for index in ranked:
+        cost = count_tokens(sentences[index]) + 1
+        if used + cost > max_tokens:
+            continue
+        chosen.add(index)
+        used += cost
+    if not chosen and ranked:
+        # Budget kleiner dan elk stuk: dan de eerste woorden van het beste stuk
+        return split_long_sentence(sentences[ranked[0]], max(1, max_tokens))[:1]
+    return [sentences[i] for i in sorted(chosen)]
+
+
+def compact_transcript(
+    text: str,
+    language: str = "nl",
+    max_tokens: Optional[int] = None,
+    fillers: bool = True,
+    dedupe: bool = True,
+) -> CompactionResult:
+    """Voer alle compactie stappen uit en rapporteer de token tellingen"""
+    tokens_before = count_tokens(text)
+    compacted = remove_fillers(text, language) if fillers else text.strip()
+
+    sentences = split_sentences(compacted)
+    if dedupe:
+        sentences = dedupe_sentences(sentences)
+    compacted = " ".join(sentences)
+
+    if max_tokens is not None and count_tokens(compacted) > max_tokens:
+        compacted = " ".join(select_key_sentences(sentences, max_tokens, language))
+
+    return CompactionResult(compacted, tokens_before, count_tokens(compacted))
@@ -0,0 +1,337 @@
+"""
+Gechunkte transcriptie voor Cryptoriez Shorts Helper
+
+Lange audio wordt op stiltes opgeknipt in begrensde chunks, die parallel naar
+Whisper gaan. De teksten worden daarna in volgorde samengevoegd, waarbij
+dubbele woorden uit een eventuele overlap worden verwijderd. Segmenten met
+tijden (verbose_json) worden naar de tijdlijn van het hele bestand verschoven.
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+from audio_extraction import AUDIO_FORMATS, CHANNELS, SAMPLE_RATE, find_ffmpeg
+from error_handling import TranscriptionError
+from progress import ProgressCallback, emit
+
+# Whisper accepteert maximaal 25 MB per request
+MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+MAX_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+MAX_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+
+# Stilte detectie
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+
+# Overlap bij een harde knip zonder stilte in de buurt
+HARD_CUT_OVERLAP = 2.0
+# Maximaal aantal woorden dat bij het samenvoegen als overlap wordt gezocht
+MAX_OVERLAP_WORDS = 40
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """Een stuk audio in seconden t.o.v. het origineel"""
+
+    index: int
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(frozen=True)
+class Segment:
+    """Een Whisper segment, tijden in seconden"""
+
+    start: float
+    end: float
+    text: str
+
+
+@dataclass
+class Transcript:
+    """Tekst plus de segmenten met tijden (leeg als Whisper die niet gaf)"""
+
+    text: str
+    segments: list[Segment] = field(default_factory=list)
+
+
+TranscribeResult = Union[str, Transcript]
+
+
+def as_transcript(result: TranscribeResult) -> Transcript:
+    return result if isinstance(result, Transcript) else Transcript(result or "")
+
+
+def merge_transcripts(chunks: list[Chunk], results: list[TranscribeResult]) -> Transcript:
+    """
+    Voeg chunk resultaten samen: teksten via stitch_texts, segmenten verschoven
+    naar de tijdlijn van het bestand. Segmenten die beginnen in de overlap met
+    de vorige chunk (harde knip) vallen weg.
+    """
+    transcripts = [as_transcript(result) for result in results]
+    overlapped = [False] + [
+        chunk.start < previous.end for previous, chunk in zip(chunks, chunks[1:])
+    ]
+    segments: list[Segment] = []
+    for chunk, transcript in zip(chunks, transcripts):
+        for segment in transcript.segments:
+            start = chunk.start + segment.start
+            if segments and start < segments[-1].end - 0.05:
+                continue
+            segments.append(Segment(start, chunk.start + segment.end, segment.text))
+    return Transcript(stitch_texts([t.text for t in transcripts], overlapped), segments)
+
+
+def _run_ffmpeg(args: list) -> subprocess.CompletedProcess:
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise TranscriptionError("FFmpeg niet beschikbaar voor het opknippen van audio")
+    return subprocess.run(
+        [ffmpeg, "-hide_banner", "-nostdin", *args],
+        capture_output=True,
+        text=True,
+        errors="replace",
+    )
+
+
+def probe_duration(audio_path: Path) -> float:
+    """Duur van een audio bestand in seconden"""
+    result = _run_ffmpeg(["-i", str(audio_path)])
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        raise TranscriptionError(f"Kon de duur van {audio_path} niet bepalen")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def detect_silences(
+    audio_path: Path,
+    noise_db: float = SILENCE_NOISE_DB,
+    min_silence: float = SILENCE_MIN_SECONDS,
+) -> list[tuple[float, float]]:
+    """Vind stiltes met ffmpeg's silencedetect filter"""
+    result = _run_ffmpeg([
+        "-i", str(audio_path),
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        "-f", "null", "-",
+    ])
+    starts = [float(v) for v in re.findall(r"silence_start: (-?[\d.]+)", result.stderr)]
+    ends = [float(v) for v in re.findall(r"silence_end: ([\d.]+)", result.stderr)]
+    return [(max(start, 0.0), end) for start, end in zip(starts, ends)]
+
+
+def plan_chunks(
+    duration: float,
+    silences: list[tuple[float, float]],
+    max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+    overlap: float = HARD_CUT_OVERLAP,
+) -> list[Chunk]:
+    """
+    Verdeel de audio in chunks van maximaal max_chunk_seconds.
+
+    Er wordt zo laat mogelijk in een stilte geknipt (maar niet in de eerste
+    helft van de chunk). Zonder geschikte stilte volgt een harde knip met
+    overlap, die bij het samenvoegen weer wordt weggefilterd.
+    """
+    if max_chunk_seconds <= overlap:
+        # Anders schuift het begin van de volgende chunk nooit op
+        raise ValueError(
+            f"Chunk lengte ({max_chunk_seconds}s) moet groter zijn dan de overlap ({overlap}s)"
+        )
+    cut_points = sorted((start + end) / 2 for start, end in silences)
+    chunks = []
+    start = 0.0
+    while duration - start > max_chunk_seconds:
+        limit = start + max_chunk_seconds
+        candidates = [p for p in cut_points if start + max_chunk_seconds / 2 < p <= limit]
+        if candidates:
+            end = candidates[-1]
+            next_start = end
+        else:
+            end = limit
+            next_start = end - overlap
+        chunks.append(Chunk(len(chunks), start, end))
+        start = next_start
+    chunks.append(Chunk(len(chunks), start, duration))
+    return chunks
+
+
+def cut_chunk(audio_path: Path, chunk: Chunk, output_dir: Path) -> Path:
+    """Knip één chunk uit als 16 kHz mono Opus"""
+    suffix, codec_args = AUDIO_FORMATS["opus"]
+    out = Path(output_dir) / f"chunk_{chunk.index:04d}{suffix}"
+    result = _run_ffmpeg([
+        "-loglevel", "error", "-y",
+        "-ss", f"{chunk.start:.3f}",
+        "-t", f"{chunk.duration:.3f}",
+        "-i", str(audio_path),
+        "-vn", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE),
+        *codec_args,
+        str(out),
+    ])
+    if result.returncode != 0:
+        raise TranscriptionError(f"Chunk {chunk.index} knippen mislukt: {result.stderr.strip()}")
+    return out
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def stitch_texts(
+    texts: list[str],
+    overlapped: Optional[list[bool]] = None,
+    max_overlap_words: int = MAX_OVERLAP_WORDS,
+) -> str:
+    """
+    Voeg chunk-teksten samen in volgorde.
+
+    Als het begin van een chunk overeenkomt met het einde van de vorige
+    (overlap van een harde knip), wordt dat deel maar één keer opgenomen.
+    overlapped[i] geeft aan of chunk i met de vorige overlapt; standaard
+    wordt bij elke overgang naar overlap gezocht.
+    """
+    words: list[str] = []
+    for i, text in enumerate(texts):
+        new_words = text.split()
+        if not new_words:
+            continue
+        if overlapped is not None and not overlapped[i]:
+            words.extend(new_words)
+            continue
+        tail = [_normalize(w) for w in words[-max_overlap_words:]]
+        head = [_normalize(w) for w in new_words[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                overlap = size
+                break
+        words.extend(new_words[overlap:])
+    return " ".join(words)
+
+
+class _ChunkCounter:
+    """Telt afgeronde chunks (vanuit meerdere threads) en meldt de voortgang"""
+
+    def __init__(self, total: int, on_progress: Optional[ProgressCallback]):
+        self.total = total
+        self.finished = 0
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+        emit(on_progress, "transcribe", f"Transcriberen in {total} chunks...",
+             current=0, total=total, unit="chunks")
+
+    def done(self) -> None:
+        with self._lock:
+            self.finished += 1
+            finished = self.finished
+        emit(self.on_progress, "transcribe", f"{finished} van {self.total} chunks getranscribeerd",
+             current=finished, total=self.total, unit="chunks")
+
+
+def transcribe_segments(
+    audio_path: Path,
+    transcribe_file: Callable[[Path], TranscribeResult],
+    max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+    max_workers: int = MAX_WORKERS,
+    max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    duration: Optional[float] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Transcript:
+    """
+    Transcribeer een audio bestand, zo nodig in parallelle chunks.
+
+    transcribe_file krijgt een pad en geeft de tekst of een Transcript terug
+    (één Whisper call). Korte, kleine bestanden gaan ongewijzigd in één call.
+    on_progress krijgt per afgeronde chunk een 'transcribe' event.
+    """
+    audio_path = Path(audio_path)
+    if duration is None:
+        duration = probe_duration(audio_path)
+
+    if duration <= max_chunk_seconds and audio_path.stat().st_size <= max_upload_bytes:
+        emit(on_progress, "transcribe", f"Transcriberen ({duration:.0f}s audio)...",
+             current=0, total=1, unit="chunks")
+        result = as_transcript(transcribe_file(audio_path))
+        emit(on_progress, "transcribe", "Transcript gereed", current=1, total=1, unit="chunks")
+        return result
+
+    chunks = plan_chunks(duration, detect_silences(audio_path), max_chunk_seconds)
+    counter = _ChunkCounter(len(chunks), on_progress)
+    with tempfile.TemporaryDirectory(prefix="cryptoriez_chunks_") as tmp:
+
+        def process(chunk: Chunk) -> TranscribeResult:
+            # Knippen en transcriberen per chunk, zodat beide overlappen
+            result = transcribe_file(cut_chunk(audio_path, chunk, Path(tmp)))
+            counter.done()
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            results = list(pool.map(process, chunks))
+
+    return merge_transcripts(chunks, results)
+
+
+def transcribe_chunked(audio_path: Path, transcribe_file: Callable[[Path], str], **options) -> str:
+    """Als transcribe_segments, maar alleen de tekst"""
+    return transcribe_segments(audio_path, transcribe_file, **options).text
+
+
+async def transcribe_segments_async(
+    audio_path: Path,
+    transcribe_file: Callable[[Path], Awaitable[TranscribeResult]],
+    max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+    max_workers: int = MAX_WORKERS,
+    max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Transcript:
+    """
+    Async variant van transcribe_segments voor een async Whisper client.
+
+    Het ffmpeg werk (duur, stiltes, knippen) draait in een thread; de Whisper
+    calls lopen als coroutines met maximaal max_workers tegelijk.
+    """
+    audio_path = Path(audio_path)
+    duration = await asyncio.to_thread(probe_duration, audio_path)
+
+    if duration <= max_chunk_seconds and audio_path.stat().st_size <= max_upload_bytes:
+        result = as_transcript(await transcribe_file(audio_path))
+        emit(on_progress, "transcribe", "Transcript gereed", current=1, total=1, unit="chunks")
+        return result
+
+    silences = await asyncio.to_thread(detect_silences, audio_path)
+    chunks = plan_chunks(duration, silences, max_chunk_seconds)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    counter = _ChunkCounter(len(chunks), on_progress)
+
+    with tempfile.TemporaryDirectory(prefix="cryptoriez_chunks_") as tmp:
+
+        async def process(chunk: Chunk) -> TranscribeResult:
+            async with semaphore:
+                path = await asyncio.to_thread(cut_chunk, audio_path, chunk, Path(tmp))
+                result = await transcribe_file(path)
+            counter.done()
+            return result
+
+        results = await asyncio.gather(*(process(chunk) for chunk in chunks))
+
+    return merge_transcripts(chunks, list(results))
+
+
+async def transcribe_chunked_async(
+    audio_path: Path, transcribe_file: Callable[[Path], Awaitable[str]], **options
+) -> str:
+    """Als transcribe_segments_async, maar alleen de tekst"""
+    return (await transcribe_segments_async(audio_path, transcribe_file, **options)).text